@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AutomationCore:
+    """監視・商品クリック待機・購入処理を1つのイベントループ上のコルーチンとして実行する
+
+    ドライバーへのコマンドは専用の1スレッドだけで実行するため、ロックなしで順番に処理される。
+    待機はすべてイベントループ上で行い、停止リクエストやキャンセルで即座に中断される。
+    GUIなど他のスレッドからは submit / start_task / cancel を使う（スレッドセーフ）。
+    """
+
+    def __init__(self, automation):
+        self.automation = automation
+        self.loop = asyncio.new_event_loop()
+        self.driver_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mapcamera-driver")
+        self.tasks = {}  # 名前 -> asyncio.Task
+        self._stopped = None
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, name="mapcamera-core", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+        # 停止リクエストをイベントループ側に伝える
+        automation.stop_listeners.append(self._on_stop_changed)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._stopped = asyncio.Event()
+        if self.automation.stop_requested:
+            self._stopped.set()
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def _on_stop_changed(self, stopped):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._stopped.set if stopped else self._stopped.clear)
+
+    # ===== 基本操作（イベントループ内で使用） =====
+
+    async def call(self, func, *args):
+        """ドライバーを使う同期処理をドライバー専用スレッドで実行する"""
+        return await self.loop.run_in_executor(self.driver_executor, func, *args)
+
+    async def sleep(self, seconds):
+        """停止リクエストで即座に中断される待機（停止された場合はTrueを返す）"""
+        if self._stopped.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._stopped.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def poll(self, kind, base):
+        """ポーリングの待機（間隔は状態に応じてガバナーが決める。停止された場合はTrueを返す）"""
+        governor = self.automation.governor
+        interval = governor.interval(kind, base)
+        stopped = await self.sleep(base if interval is None else interval)
+        governor.note_wakeup(kind)
+        return stopped
+
+    async def wait_until(self, predicate, timeout, interval=0.1, kind="wait"):
+        """条件が満たされるまで待機（タイムアウトまたは停止でFalse）"""
+        end_time = time.time() + timeout
+        while True:
+            try:
+                if await self.call(predicate):
+                    return True
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return False
+            if await self.poll(kind, min(interval, remaining)):
+                return False
+
+    # ===== 自動化のコルーチン =====
+
+    async def wait_for_click(self):
+        """商品一覧で商品がクリックされ、新しいタブで開かれるまで待機する"""
+        automation = self.automation
+        state = await self.call(automation._begin_product_click_wait)
+        if state is None:
+            return False
+
+        while True:
+            result = await self.call(automation._poll_product_click, state)
+            if result is not None:
+                if not result:
+                    await self.call(automation.remove_link_conversion)
+                return result
+            await self.poll("click", state.poll_interval)
+
+    async def checkout(self):
+        """現在のページのステップから購入フローを実行する（結果は商品タブに記録する）"""
+        result = False
+        try:
+            result = await self._checkout_steps()
+            return result
+        finally:
+            await self.call(self.automation._end_checkout, result)
+
+    async def _checkout_steps(self):
+        automation = self.automation
+        step = await self.call(automation._begin_checkout)
+        if step is None:
+            return False
+
+        # 1ステップずつドライバー専用スレッドで実行する（ステップ間でキャンセルできる）
+        for _ in range(len(automation.checkout_steps) * 2):
+            outcome, step = await self.call(automation._advance_checkout, step)
+            if step is None:
+                return outcome
+
+        return await self.call(automation._checkout_exhausted)
+
+    async def start_automation(self):
+        """商品詳細（または途中のステップ）から購入処理を実行する"""
+        automation = self.automation
+        tracing = automation.config.get("trace_checkout", False) and automation.tracer is None
+        if tracing:
+            await self.call(automation.start_trace)
+        try:
+            with automation._trace_span("start_automation"):
+                if not await self.call(automation._prepare_automation):
+                    return False
+                return await self.checkout()
+        finally:
+            if tracing:
+                await self.call(automation.stop_trace)
+
+    async def monitor(self):
+        """商品一覧ページの更新を監視する（monitor_page_updates(start_thread=False) で準備してから開始）"""
+        automation = self.automation
+        interval = automation.config.get("monitoring_interval", 10)
+        settle_time = automation.config.get("monitor_settle_time", 1)
+        readiness = automation.config.get("monitor_readiness", "dom")
+        min_wait = min(0.5, interval)
+        consecutive_errors = 0
+
+        while not automation.stop_requested and hasattr(automation, 'monitor_tab'):
+            cycle_start_time = time.time()
+            try:
+                if getattr(automation, 'prevent_tab_switch', False):
+                    await self.sleep(interval)
+                    continue
+
+                # 1サイクルずつドライバー専用スレッドで実行する（サイクル間の待機はイベントループ上）
+                updated = await self.call(automation._run_monitor_cycle, readiness, settle_time)
+                if updated is None:
+                    break
+
+                if updated:
+                    print("商品の更新を検出しました！")
+                    # 通知（音やダイアログ）はイベントループを止めないよう別スレッドで実行
+                    if callable(getattr(automation, 'monitor_callback', None)):
+                        self.loop.run_in_executor(None, automation.monitor_callback)
+                    print("商品更新が検出されたため、監視を自動停止します")
+                    automation.stop_requested = True
+                    return True
+
+                consecutive_errors = 0
+                elapsed_time = time.time() - cycle_start_time
+                automation.metrics.gauge("monitor_cycle_seconds").set(elapsed_time)
+                automation.metrics.counter("monitor_cycles").inc()
+                await self.poll("monitor", max(min_wait, interval - elapsed_time))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                automation.log_error("監視ループでエラーが発生", e, operation="monitor")
+                consecutive_errors += 1
+                await self.sleep(min(5, consecutive_errors))
+        return True
+
+    # ===== 他のスレッドからの操作（スレッドセーフ） =====
+
+    def submit(self, coroutine):
+        """コルーチンをイベントループで実行し、concurrent.futures.Future を返す"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout=None):
+        """コルーチンを実行して結果を待つ（イベントループ以外のスレッドから呼ぶ）"""
+        return self.submit(coroutine).result(timeout)
+
+    def start_task(self, name, coroutine):
+        """名前付きタスクとして開始する（同じ名前の実行中タスクはキャンセル）"""
+        async def launch():
+            previous = self.tasks.get(name)
+            if previous and not previous.done():
+                previous.cancel()
+            task = asyncio.ensure_future(coroutine)
+            self.tasks[name] = task
+            return await task
+        return self.submit(launch())
+
+    def cancel(self, name=None):
+        """タスクをキャンセルする（名前を省略するとすべて）"""
+        # 実行中の同期処理（ドライバー専用スレッド側）は停止リクエストで中断させる
+        self.automation.stop_requested = True
+        self.loop.call_soon_threadsafe(self._cancel_tasks, name)
+
+    def _cancel_tasks(self, name=None):
+        for task_name, task in list(self.tasks.items()):
+            if name is None or task_name == name:
+                task.cancel()
+
+    def queue_depth(self):
+        """ドライバー専用スレッドで実行待ちの処理の数"""
+        return self.driver_executor._work_queue.qsize()
+
+    def is_running(self, name):
+        task = self.tasks.get(name)
+        return task is not None and not task.done()
+
+    def shutdown(self):
+        """すべてのタスクをキャンセルしてイベントループを終了する"""
+        if self._on_stop_changed in self.automation.stop_listeners:
+            self.automation.stop_listeners.remove(self._on_stop_changed)
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._cancel_tasks)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+        self.driver_executor.shutdown(wait=False)
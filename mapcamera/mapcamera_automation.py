@@ -12,14 +12,73 @@ import sys
 import re
 import json
 from datetime import datetime
+import contextlib
 import functools
 import threading
 
+from mapcamera_tabs import TabManager
+from mapcamera_metrics import MetricsRegistry, instrument_driver
+from mapcamera_governor import get_governor
+from mapcamera_watchdog import CommandWatchdog, DEADLINE_MARGIN, command_deadlines
+from mapcamera_selectors import SelectorRegistry
+from mapcamera_journal import SessionJournal, JOURNALED_ATTRS, TAB_ATTRS, TRANSIENT_ATTRS, journal_value
+
 
 # エラーメッセージの出力を抑制
 os.environ['WDM_LOG_LEVEL'] = '0'
 os.environ['WDM_PRINT_FIRST_LINE'] = 'False'
 
+# ChromeDriverのパス（インストール確認は時間がかかるためプロセス内で1回だけ行う）
+_chromedriver_path = None
+
+
+def get_chromedriver_path():
+    """ChromeDriverのパスを取得する（2回目以降はキャッシュを使用）"""
+    global _chromedriver_path
+    if _chromedriver_path is None or not os.path.exists(_chromedriver_path):
+        _chromedriver_path = ChromeDriverManager().install()
+    return _chromedriver_path
+
+
+# タブの役割ごとにブロックするURL（reCAPTCHA（google.com / gstatic.com）は購入に必要なので含めない）
+TRACKER_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googleadservices.com*", "*connect.facebook.net*", "*criteo.com*", "*criteo.net*",
+    "*yjtag.jp*", "*bat.bing.com*", "*clarity.ms*",
+]
+DEFAULT_BLOCK_PROFILES = {
+    # 監視タブは商品情報のテキストだけ読めればよい
+    "monitor": ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg",
+                "*.woff", "*.woff2", "*.ttf", "*.otf"] + TRACKER_PATTERNS,
+    "checkout": TRACKER_PATTERNS,
+}
+
+# ナビゲーション後に待つ準備状態
+#   "load": すべての読み込み完了、"dom": DOMの構築完了、
+#   "selector:<CSS>": 指定したセレクタの要素が現れるまで（画像などの読み込み途中でも進める）
+READINESS_CONDITIONS = {
+    "load": "document.readyState === 'complete'",
+    "dom": "document.readyState !== 'loading'",
+}
+
+# 商品一覧ページの準備状態（検索結果が0件の一覧もあるため、一覧の要素ではなくDOMの構築完了を待つ）
+LIST_READINESS = "dom"
+
+# 遷移前のドキュメントに付ける目印（遷移後の新しいドキュメントと区別するため）
+NAVIGATION_MARKER_JS = "document.__mcNavigating = true;"
+
+
+def readiness_script(readiness):
+    """準備状態を判定するスクリプト（遷移前のドキュメントでは常にfalse）"""
+    if readiness.startswith("selector:"):
+        condition = f"!!document.querySelector({json.dumps(readiness[len('selector:'):])})"
+    elif readiness in READINESS_CONDITIONS:
+        condition = READINESS_CONDITIONS[readiness]
+    else:
+        raise ValueError(f"不明な準備状態です: {readiness}")
+    return f"return !document.__mcNavigating && {condition};"
+
+
 # 文字化け対策
 if hasattr(sys, 'stdout') and sys.stdout is not None:
     if hasattr(sys.stdout, 'encoding') and sys.stdout.encoding != 'utf-8':
@@ -67,18 +126,397 @@ def error_handler(operation=None, include_url=True):
     return decorator
 
 
+# ページ側ヘルパースクリプト（タブごとに1回登録し、以降のページでは自動的に読み込まれる）
+HELPER_BUNDLE_JS = """
+(function() {
+    // 既に読み込み済み、またはフレーム内の場合は何もしない
+    if (window.__mc || window.top !== window) return;
+
+    // マップカメラのドメイン以外では読み込まない
+    if (window.location.hostname.indexOf('mapcamera.com') < 0) return;
+
+    var LINKIFY_KEY = '__mc_linkify';
+    var originalOpen = window.open;
+    var mc = {};
+
+    var linkifyActive = false;
+    var linkObserver = null;
+
+    // 商品リンクかどうかを判定（/item/maker や /item/category を除外）
+    function isProductLink(link) {
+        var href = link.getAttribute('href') || '';
+        return href.indexOf('/item/') >= 0 &&
+            href.indexOf('/item/maker') < 0 &&
+            href.indexOf('/item/category') < 0 &&
+            href.indexOf('/item/list') < 0;
+    }
+
+    // 指定したノード以下の商品リンクにマーキング（追加されたノードのみ走査）
+    function markProductLinks(root) {
+        var links = [];
+        if (root.matches && root.matches('a[href*="/item/"]')) {
+            links.push(root);
+        }
+        if (root.querySelectorAll) {
+            var found = root.querySelectorAll('a[href*="/item/"]');
+            for (var i = 0; i < found.length; i++) {
+                links.push(found[i]);
+            }
+        }
+
+        var modifiedCount = 0;
+        for (var j = 0; j < links.length; j++) {
+            var link = links[j];
+            if (!isProductLink(link) || link.getAttribute('data-modified') === 'true') {
+                continue;
+            }
+            link.setAttribute('data-modified', 'true');
+            link.setAttribute('data-mc-target', link.getAttribute('target') || '');  // 解除時に戻す
+            link.setAttribute('target', '_blank');  // 念のため
+            modifiedCount++;
+        }
+        return modifiedCount;
+    }
+
+    // 商品リンクのクリックをdocumentで一括処理（リンクごとのハンドラは不要）
+    function onDocumentClick(e) {
+        var link = e.target && e.target.closest ? e.target.closest('a[href*="/item/"]') : null;
+        if (!link || !isProductLink(link)) return;
+
+        e.preventDefault();
+        e.stopPropagation();
+
+        // 新しいタブで開く
+        originalOpen.call(window, link.href, '_blank');
+    }
+
+    // リンク変換を有効化（同じタブの以降のページでも自動で継続）
+    mc.linkify = function() {
+        try {
+            sessionStorage.setItem(LINKIFY_KEY, '1');
+        } catch (e) {}
+
+        if (!linkifyActive) {
+            document.addEventListener('click', onDocumentClick, true);
+
+            // 追加された検索結果のみをマーキング
+            linkObserver = new MutationObserver(function(mutations) {
+                for (var i = 0; i < mutations.length; i++) {
+                    var added = mutations[i].addedNodes;
+                    for (var j = 0; j < added.length; j++) {
+                        if (added[j].nodeType === 1) {
+                            markProductLinks(added[j]);
+                        }
+                    }
+                }
+            });
+            linkObserver.observe(document.documentElement, {childList: true, subtree: true});
+            linkifyActive = true;
+        }
+
+        markProductLinks(document);
+        return document.querySelectorAll('a[data-modified="true"]').length;
+    };
+
+    // リンク変換を解除（このタブの以降のページでも再開しない）
+    mc.unlinkify = function() {
+        try {
+            sessionStorage.removeItem(LINKIFY_KEY);
+        } catch (e) {}
+
+        if (linkifyActive) {
+            document.removeEventListener('click', onDocumentClick, true);
+            linkObserver.disconnect();
+            linkObserver = null;
+            linkifyActive = false;
+        }
+
+        var links = document.querySelectorAll('a[data-modified="true"]');
+        for (var i = 0; i < links.length; i++) {
+            var target = links[i].getAttribute('data-mc-target');
+            if (target) {
+                links[i].setAttribute('target', target);
+            } else {
+                links[i].removeAttribute('target');
+            }
+            links[i].removeAttribute('data-modified');
+            links[i].removeAttribute('data-mc-target');
+        }
+        return links.length;
+    };
+
+    // 商品一覧の要素（一覧がないページでは空）
+    function listElements() {
+        var container = document.querySelector('ul.srcitemlist');
+        return container ? container.querySelectorAll('li.item_wrap') : [];
+    }
+
+    // 商品1件の情報を読み取る（IDがない商品は位置で識別）
+    function readItem(item, index) {
+        var nameElem = item.querySelector('.txt > a');
+        var priceElem = item.querySelector('.price > span > span > b');
+        var soldOutElem = item.querySelector('.price');
+        var linkElem = item.querySelector('.itembox > a');
+
+        return {
+            id: item.getAttribute('data-mapcode') || ('#' + index),
+            name: nameElem ? nameElem.textContent.trim() : '',
+            price: priceElem ? priceElem.textContent.trim() : '',
+            soldOut: soldOutElem ? soldOutElem.textContent.includes('SOLD OUT') : false,
+            link: linkElem ? linkElem.getAttribute('href') : ''
+        };
+    }
+
+    // FNV-1a（32bit）で文字列のダイジェストを作る
+    function fnv1a(text) {
+        var hash = 0x811c9dc5;
+        for (var i = 0; i < text.length; i++) {
+            hash ^= text.charCodeAt(i);
+            hash = Math.imul(hash, 0x01000193) >>> 0;
+        }
+        return ('0000000' + hash.toString(16)).slice(-8);
+    }
+
+    function itemDigest(info) {
+        return fnv1a([info.id, info.name, info.price, info.soldOut ? '1' : '0', info.link].join('\u0001'));
+    }
+
+    // 商品リストの情報を取得（すべての商品）
+    mc.listInfo = function() {
+        var items = listElements();
+        var result = {count: items.length, items: []};
+        for (var i = 0; i < items.length; i++) {
+            result.items.push(readItem(items[i], i));
+        }
+        return result;
+    };
+
+    // 商品ごとのダイジェストと一覧全体のダイジェストを取得
+    // 前回の一覧ダイジェストと同じなら商品ごとのダイジェストも返さない
+    mc.listDigest = function(previous) {
+        var items = listElements();
+        var entries = [];
+        for (var i = 0; i < items.length; i++) {
+            var info = readItem(items[i], i);
+            entries.push([info.id, itemDigest(info)]);
+        }
+
+        var digest = fnv1a(entries.map(function(entry) { return entry.join(':'); }).join(','));
+        if (previous && previous === digest) {
+            return {count: items.length, digest: digest, unchanged: true};
+        }
+        return {count: items.length, digest: digest, items: entries};
+    };
+
+    // 指定したIDの商品の詳細を取得（ダイジェストが変わった商品のみ取得するために使う）
+    mc.listItems = function(ids) {
+        var wanted = {};
+        for (var i = 0; i < ids.length; i++) wanted[ids[i]] = true;
+
+        var items = listElements();
+        var result = {};
+        for (var j = 0; j < items.length; j++) {
+            var info = readItem(items[j], j);
+            if (wanted[info.id]) result[info.id] = info;
+        }
+        return result;
+    };
+
+    // ロングタスク（50ms以上メインスレッドを占有した処理）を記録（トレースの書き出し用、最大200件）
+    var longTasks = [];
+    try {
+        new PerformanceObserver(function(list) {
+            var entries = list.getEntries();
+            for (var i = 0; i < entries.length && longTasks.length < 200; i++) {
+                longTasks.push({name: entries[i].name, start: entries[i].startTime, duration: entries[i].duration});
+            }
+        }).observe({type: 'longtask', buffered: true});
+    } catch (e) {}
+
+    // ナビゲーション・通信・ロングタスクの記録（時刻はtimeOriginからのミリ秒）
+    mc.perfEntries = function() {
+        var nav = performance.getEntriesByType('navigation')[0];
+        var resources = performance.getEntriesByType('resource');
+        var result = {
+            url: window.location.href,
+            timeOrigin: performance.timeOrigin,
+            navigation: null,
+            resources: [],
+            longTasks: longTasks.slice()
+        };
+        if (nav) {
+            result.navigation = {
+                start: nav.startTime,
+                duration: nav.duration,
+                responseStart: nav.responseStart,
+                domContentLoaded: nav.domContentLoadedEventEnd,
+                load: nav.loadEventEnd,
+                transferSize: nav.transferSize
+            };
+        }
+        for (var i = 0; i < resources.length; i++) {
+            result.resources.push({
+                name: resources[i].name,
+                type: resources[i].initiatorType,
+                start: resources[i].startTime,
+                duration: resources[i].duration,
+                transferSize: resources[i].transferSize || 0
+            });
+        }
+        return result;
+    };
+
+    // ブラウザ上にメッセージを表示
+    mc.showMessage = function(message, durationMs) {
+        mc.clearMessage();
+
+        var messageDiv = document.createElement('div');
+        messageDiv.id = 'automation-message';
+        messageDiv.style.position = 'fixed';
+        messageDiv.style.top = '50%';
+        messageDiv.style.left = '50%';
+        messageDiv.style.transform = 'translate(-50%, -50%)';
+        messageDiv.style.backgroundColor = 'rgba(0, 0, 0, 0.9)';
+        messageDiv.style.color = 'white';
+        messageDiv.style.padding = '20px';
+        messageDiv.style.borderRadius = '10px';
+        messageDiv.style.zIndex = '9999999';
+        messageDiv.style.fontSize = '18px';
+        messageDiv.style.fontWeight = 'bold';
+        messageDiv.style.maxWidth = '80%';
+        messageDiv.style.textAlign = 'center';
+        messageDiv.innerHTML = message;
+        document.body.appendChild(messageDiv);
+
+        // 指定時間後に自動的に消去
+        if (durationMs !== null && durationMs !== undefined) {
+            setTimeout(mc.clearMessage, durationMs);
+        }
+    };
+
+    // 表示中のメッセージを消去
+    mc.clearMessage = function() {
+        var msg = document.getElementById('automation-message');
+        if (msg) msg.remove();
+    };
+
+    window.__mc = mc;
+
+    // このタブでリンク変換が有効化済みなら、新しいページでも自動で再開
+    var enabled = false;
+    try {
+        enabled = sessionStorage.getItem(LINKIFY_KEY) === '1';
+    } catch (e) {}
+
+    if (enabled) {
+        if (document.readyState === 'loading') {
+            document.addEventListener('DOMContentLoaded', mc.linkify);
+        } else {
+            mc.linkify();
+        }
+    }
+})();
+"""
+
+
+class CheckoutStep:
+    """購入フローの1ステップ（進入条件・処理・完了条件）"""
+
+    def __init__(self, name, label, matches, action, next_step=None, exit_timeout=0, readiness="dom"):
+        self.name = name                  # ステップ名
+        self.label = label                # 表示用の名前
+        self.matches = matches            # URLを受け取り、現在のページがこのステップか判定
+        self.action = action              # ステップの処理（成功時True）
+        self.next_step = next_step        # ページから判定できない場合の次のステップ（Noneなら最終）
+        self.exit_timeout = exit_timeout  # 処理後にページ遷移を待つ秒数（0なら待たずに次へ）
+        self.readiness = readiness        # 処理を始める前に必要なページの準備状態（readiness_script を参照）
+
+
+class ProductClickWait:
+    """商品クリック待機中の状態（wait_for_product_click の1回分の確認で使用）"""
+
+    def __init__(self, initial_tab, initial_url, initial_tabs):
+        self.initial_tab = initial_tab
+        self.initial_url = initial_url
+        self.initial_tabs = initial_tabs
+        now = time.time()
+        self.last_stop_check = now
+        self.last_message_update = now
+        self.last_domain_check = now
+        self.stop_check_interval = 0.05  # 50ミリ秒ごとに停止チェック
+        self.domain_check_interval = 1.0  # 1秒ごとにドメインをチェック
+        self.poll_interval = 0.05
+
+
 class MapCameraAutomation:
 
-    def __init__(self, password, config_file=None, verbose_log=False, gui_handler=None):
-        """マップカメラ自動化クラスの初期化"""
+    def __init__(self, password, config_file=None, verbose_log=False, gui_handler=None, driver=None, journal=True):
+        """マップカメラ自動化クラスの初期化（driverを渡すと既存のドライバーを使用）
+
+        journal=False の場合はセッション状態の読み込み・保存を行わない（使うと決まってから open_journal を呼ぶ）。
+        """
         try:
             print("MapCameraAutomationの初期化を開始します...")
+            # 停止リクエスト用のイベント（すべての待機処理がこれで即座に中断される）
+            self.stop_event = threading.Event()
+            self.stop_listeners = []        # 停止状態の変化を受け取るコールバック（非同期コアなど）
+            self.driver_lock = threading.RLock()  # 監視サイクルと再接続（ドライバーの差し替え）を直列化する
+            self._stop_requested_at = None
+            self.last_stop_latency = None
             self.verbose_log = verbose_log  # 詳細ログフラグ
             self.gui_handler = gui_handler  # GUIハンドラへの参照
             self.is_shutting_down = False   # 追加: 終了中フラグを初期化
-            self.initialize_driver()
+            self._helper_tabs = set()       # ヘルパースクリプト登録済みのタブ
+            self._linkified_tabs = set()    # リンク変換を有効にしたタブ（停止・終了時に解除する）
+            self._blocked_tabs = {}         # リソースブロックを設定したタブ -> 役割
+            self.page_weights = {}          # (役割, ブロック有無, ページ) -> 通信量・読み込み時間の集計
+            self.recorder = None            # セッション記録（記録モード時のみ）
+            self.tracer = None              # Pythonとブラウザのトレース（トレース中のみ）
+            self.last_trace_path = None
+            self.config_file = config_file
             self.password = password
             self.config = self.load_config(config_file)
+            self.metrics = MetricsRegistry()  # GUIのメトリクス表示用
+            self.governor = get_governor()    # 待機ループのポーリング間隔（プロセス全体で共有）
+            self.governor.configure(self.config)
+
+            # 応答しないWebDriverコマンドを期限で中断する
+            self.watchdog = None
+            if self.config.get("command_watchdog", True):
+                # 期限はドライバー自身のタイムアウトより後にする（指定がなければ設定から求める）
+                default_deadline = self.config.get("command_deadline")
+                if default_deadline is None:
+                    default_deadline = self.config.get("script_timeout", 10) + DEADLINE_MARGIN
+                deadlines = self.config.get("command_deadlines")
+                if deadlines is None:
+                    deadlines = command_deadlines(self.config.get("page_load_timeout", 10))
+                self.watchdog = CommandWatchdog(
+                    f"127.0.0.1:{self.config.get('debug_port', '9222')}",
+                    default_deadline=default_deadline,
+                    deadlines=deadlines,
+                    grace=self.config.get("command_abort_grace", 3),
+                    sever=self.release_driver, on_severed=self._reattach_after_deadline,
+                    registry=self.metrics, verbose_log=verbose_log)
+                self.stop_listeners.append(self._interrupt_on_stop)
+            self.selector_registry = SelectorRegistry(
+                self._config_relative_path("selector_stats_file"), verbose_log)
+
+            self.journal = None  # 前回のセッション状態（クラッシュや強制終了からの再開用）
+
+            if driver is not None:
+                self.driver = driver
+            else:
+                self.initialize_driver()
+            self._instrument_driver()
+
+            # 記録モードならドライバーへのコマンドを記録
+            if self.config.get("record_session", False):
+                self.start_recording()
+            self._mark_recording("__init__")
+
+            # 既存のタブはユーザーのタブとして扱い、自動化が開いたタブだけを管理する
+            self.tab_manager = TabManager(self.config.get("max_managed_tabs", 5), verbose_log)
+            self.tab_manager.attach(self.driver.window_handles)
             print("待機時間を設定中...")
 
             # 高負荷環境向けに最適化されたタイムアウト設定とポーリング間隔
@@ -89,8 +527,10 @@ class MapCameraAutomation:
             self.driver.set_script_timeout(self.config.get(
                 "script_timeout", 10))  # 設定ファイルの値を使用、デフォルトは10
 
-            # 初期化時に優先タブを探して設定
-            self.find_best_tab()
+            # 前回の状態を復元できればタブの探索は不要
+            if not (journal and self.open_journal()):
+                # 初期化時に優先タブを探して設定
+                self.find_best_tab()
 
             # 停止フラグの初期化
             self.stop_requested = False
@@ -107,6 +547,58 @@ class MapCameraAutomation:
             # 初期化時はlog_errorメソッドがまだ使えないため、シンプルなエラー処理
             raise
 
+    def open_journal(self):
+        """セッション状態の記録を開始し、前回の状態を復元する（作業中のタブに戻れたらTrue）"""
+        journal_path = self._config_relative_path("session_journal_file")
+        if self.journal is not None or not journal_path:
+            return False
+        self.journal = SessionJournal(journal_path)
+        return self.restore_session(self.journal.load())
+
+    def _journal_state(self, **overrides):
+        """再開に必要な状態をまとめて保存する（状態が切り替わる時点で呼ぶ。変わっていなければ書き込まない）"""
+        if self.journal is None:
+            return False
+        state = {}
+        for name in JOURNALED_ATTRS:
+            if name in overrides:
+                value = overrides[name]
+            elif hasattr(self, name):
+                value = getattr(self, name)
+            else:
+                continue
+            state[name] = journal_value(name, value)
+        return self.journal.save(state)
+
+    def restore_session(self, saved):
+        """保存されたセッション状態を開いているタブと1回で照合して復元する（作業中のタブに戻れたらTrue）"""
+        if not saved or not self.config.get("resume_session", True):
+            return False
+
+        handles = set(self.driver.window_handles)
+        restored = []
+        for name in JOURNALED_ATTRS:
+            if name not in saved or name in TRANSIENT_ATTRS:
+                continue
+            value = saved[name]
+            # 閉じられたタブの参照は復元しない
+            if name in TAB_ATTRS and value not in handles:
+                continue
+            setattr(self, name, value)
+            restored.append(name)
+
+        if saved.get("purchase_in_progress"):
+            print("前回のセッションは購入処理の途中で終了しました。ページを確認してください。")
+            self.update_status("前回は購入処理の途中で終了しました。ページを確認してください。", "warning")
+
+        target = getattr(self, 'product_tab', None) or getattr(self, 'list_tab', None)
+        if not target:
+            return False
+
+        self.driver.switch_to.window(target)
+        print(f"前回のセッション状態を復元しました: {', '.join(restored)}")
+        return True
+
     def log(self, message):
         """簡易ログ機能（update_statusとprintの組み合わせ）"""
         print(message)
@@ -121,7 +613,30 @@ class MapCameraAutomation:
             "payment_method": "daibiki",  # 代金引換
             "debug_mode": False,
             "poll_frequency": 0.2,  # ポーリング間隔のデフォルト値
-            "monitoring_interval": 10  # 監視間隔（秒）を追加
+            "monitoring_interval": 10,  # 監視間隔（秒）を追加
+            "monitor_settle_time": 1,  # リロード完了後の追加待機（秒）
+            "max_managed_tabs": 5,  # 自動化が開いたタブをこの数まで残す（超えたら使い終わったタブを閉じる）
+            "debug_port": "9222",  # 接続先Chromeのリモートデバッグポート（GUIの設定と共通）
+            "engine": "webdriver",  # "webdriver"（ChromeDriver経由）または "cdp"（DevToolsプロトコルで直接操作）
+            "record_session": False,  # WebDriverセッションの記録モード
+            "record_dir": "recordings",  # 記録ファイルの保存先（設定ファイルからの相対パス）
+            "trace_checkout": False,  # 購入処理のPython側とブラウザ側のトレースを保存する
+            "trace_dir": "traces",  # トレースの保存先（設定ファイルからの相対パス）
+            "selector_stats_file": "mapcamera_selector_stats.json",  # セレクタの一致統計（設定ファイルからの相対パス）
+            "resource_blocking": False,  # 自動化が開いたタブで、役割ごとに不要なリソースの読み込みを止める
+            "block_profiles": DEFAULT_BLOCK_PROFILES,  # タブの役割 -> ブロックするURLパターン（*が使える）
+            "page_weight_report": False,  # ページの通信量と読み込み時間を役割ごとに集計する（各ステップで1往復増える）
+            "session_journal_file": "mapcamera_session.json",  # 再開用のセッション状態（設定ファイルからの相対パス）
+            "resume_session": True,  # 起動時に前回のセッション状態を復元する
+            "poll_idle_after": 60,  # GUIの操作がこの秒数なければ待機ループの間隔を広げる
+            "poll_idle_factor": 3,  # アイドル時のポーリング間隔の倍率（種類ごとの上限あり）
+            "poll_paused_factor": 5,  # ウィンドウ最小化時のポーリング間隔の倍率
+            "page_load_strategy": "none",  # ドライバーの読み込み待ち（none: 待たずに navigate() や次のステップで必要な状態だけ待つ）
+            "monitor_readiness": "dom",  # 監視のリロード後に待つ準備状態（load / dom / selector:<CSS>）
+            "command_watchdog": True,  # 応答しないWebDriverコマンドを期限で中断する
+            "command_deadline": None,  # コマンドの期限（秒、Noneなら script_timeout + 5）
+            "command_deadlines": None,  # コマンドごとの期限（秒、Noneならナビゲーションは page_load_timeout + 5）
+            "command_abort_grace": 3  # 中断しても戻らない場合に接続を切るまでの猶予（秒）
         }
 
         if config_file and os.path.exists(config_file):
@@ -135,10 +650,30 @@ class MapCameraAutomation:
 
         return default_config
 
+    def _config_relative_path(self, key):
+        """設定ファイルからの相対パスで指定されたファイルのパス（設定ファイルがない場合はNone）"""
+        path = self.config.get(key)
+        if not path or not self.config_file:
+            return None
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), path)
+        return path
+
     def initialize_driver(self):
         """Chromeドライバーを初期化する"""
         try:
             print("ドライバーの初期化を開始します...")
+
+            # CDPエンジンはChromeDriverを使わず、デバッグポートに直接接続する
+            if self.config.get("engine", "webdriver") == "cdp":
+                from mapcamera_cdp import CdpDriver
+
+                print("DevToolsプロトコルでChromeに接続中...")
+                self.driver = CdpDriver(self.config.get("debug_port", "9222"),
+                                        page_load_strategy=self.config.get("page_load_strategy", "none"))
+                print("ドライバーの初期化が完了しました（CDPエンジン）")
+                return
+
             chrome_options = Options()
 
             # プロファイルの設定
@@ -152,15 +687,18 @@ class MapCameraAutomation:
 
             # デバッグポートを開く
             print("デバッグポート設定中...")
-            chrome_options.add_experimental_option("debuggerAddress",
-                                                   "127.0.0.1:9222")
+            chrome_options.add_experimental_option(
+                "debuggerAddress", f"127.0.0.1:{self.config.get('debug_port', '9222')}")
+
+            # ページの読み込み完了はドライバーに待たせず、navigate() でページごとに必要な状態だけ待つ
+            chrome_options.page_load_strategy = self.config.get("page_load_strategy", "none")
 
             # ログレベルの設定
             chrome_options.add_argument('--log-level=3')
             chrome_options.add_argument('--silent')
 
             print("ChromeDriverのサービスを初期化中...")
-            service = Service(ChromeDriverManager().install())
+            service = Service(get_chromedriver_path())
 
             # Windows環境でのみCREATE_NO_WINDOWフラグを設定
             if os.name == 'nt':  # Windowsの場合
@@ -177,6 +715,96 @@ class MapCameraAutomation:
             # 初期化時はlog_errorメソッドが使えない可能性があるため、シンプルなエラー処理
             raise
 
+    def reattach(self):
+        """インスタンスの状態（タブ参照・URL・キャッシュ）を保ったまま起動中のChromeに再接続する"""
+        start_time = time.time()
+        print("起動中のChromeに再接続しています...")
+
+        old_driver = self.driver
+
+        # 同じdebuggerAddressに新しいセッションを作成
+        self.initialize_driver()
+        self._instrument_driver()
+
+        # 古いセッションのChromeDriverプロセスを終了（ブラウザには影響しない）
+        self.release_driver(old_driver)
+
+        if self.recorder is not None:
+            from mapcamera_recorder import RecordingDriver
+            self.driver = RecordingDriver(self.driver, self.recorder)
+            self.recorder.mark("reattach")
+
+        self.wait = WebDriverWait(self.driver, 5, poll_frequency=0.2)
+        self.driver.set_page_load_timeout(self.config.get("page_load_timeout", 10))
+        self.driver.set_script_timeout(self.config.get("script_timeout", 10))
+
+        # ヘルパースクリプトの登録・リソースブロックはセッションごとなので設定し直す
+        self._helper_tabs.clear()
+        self._blocked_tabs.clear()
+        self.is_shutting_down = False
+        self.stop_requested = False
+
+        # 閉じられたタブの参照だけを外し、残っているタブの参照は維持
+        handles = self.driver.window_handles
+        self.tab_manager.prune(handles)
+        for attr in ['list_tab', 'product_tab', 'monitor_tab']:
+            if hasattr(self, attr) and getattr(self, attr) not in handles:
+                delattr(self, attr)
+
+        # 作業中のタブに戻る（なければ最適なタブを探す）
+        target = getattr(self, 'product_tab', None) or getattr(self, 'list_tab', None)
+        if target:
+            self.driver.switch_to.window(target)
+        else:
+            self.find_best_tab()
+
+        elapsed = time.time() - start_time
+        print(f"Chromeに再接続しました（{elapsed:.2f}秒）")
+        self.update_status("Chromeに再接続しました", "success")
+        return True
+
+    def _instrument_driver(self):
+        """ドライバーにメトリクスの計測とコマンドの期限の監視を付ける"""
+        instrument_driver(self.driver, self.metrics)
+        if self.watchdog is not None:
+            self.watchdog.install(self.driver)
+
+    def _reattach_after_deadline(self, severed_driver):
+        """応答しないコマンドの接続を切った後に再接続する（停止リクエストは引き継ぐ）
+
+        監視スレッドが古いドライバーを使っている間は差し替えないよう、監視サイクルの終了を待ってから再接続する。
+        """
+        with self.driver_lock:
+            # 待っている間に他のスレッドが再接続していれば、そのドライバーを使う
+            if getattr(self.driver, 'wrapped_driver', self.driver) is not severed_driver:
+                return True
+            stop_requested = self.check_stop()
+            self.update_status("応答しないコマンドを中断しました。Chromeに再接続します...", "warning")
+            result = self.reattach()
+            if stop_requested:
+                self.stop_requested = True
+            return result
+
+    def _interrupt_on_stop(self, stopped):
+        """停止リクエストで、実行中のページ読み込みを待たずに止める"""
+        if stopped and self.watchdog is not None:
+            self.watchdog.interrupt()
+
+    def release_driver(self, driver=None):
+        """ブラウザは閉じずに、ChromeDriverの終了（CDPエンジンは接続の切断）だけを行う"""
+        driver = driver or self.driver
+        driver = getattr(driver, 'wrapped_driver', driver)  # 記録中のプロキシは外す
+        try:
+            service = getattr(driver, 'service', None)
+            if service is not None:
+                service.stop()
+            elif hasattr(driver, 'connection'):
+                # CDPエンジンはWebSocket接続を閉じるだけ
+                driver.quit()
+        except Exception as e:
+            if self.verbose_log:
+                print(f"ChromeDriverの終了中にエラー: {str(e)}")
+
     def update_status(self, message, level="info"):
         """GUI側にステータスを更新する"""
         # GUIハンドラが設定されている場合は、そちらに表示を委譲
@@ -189,6 +817,94 @@ class MapCameraAutomation:
         # 常にコンソールにも表示
         print(message)
 
+    def start_recording(self):
+        """WebDriverコマンドとページHTMLの記録を開始する"""
+        from mapcamera_recorder import SessionRecorder, RecordingDriver
+
+        if self.recorder is not None:
+            return self.recorder
+
+        self.recorder = SessionRecorder()
+        self.driver = RecordingDriver(self.driver, self.recorder)
+        print("セッションの記録を開始しました")
+        return self.recorder
+
+    def stop_recording(self):
+        """記録を停止してファイルに保存し、保存先のパスを返す"""
+        if self.recorder is None:
+            return None
+
+        record_dir = self._output_dir("record_dir", "recordings")
+        filename = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+        path = self.recorder.save(os.path.join(record_dir, filename))
+        self.driver = self.driver.wrapped_driver
+        self.recorder = None
+        return path
+
+    def _output_dir(self, key, default):
+        """出力先のディレクトリ（相対パスは設定ファイルのディレクトリから）"""
+        directory = self.config.get(key, default)
+        if not os.path.isabs(directory):
+            base_dir = os.path.dirname(os.path.abspath(self.config_file)) if self.config_file else os.getcwd()
+            directory = os.path.join(base_dir, directory)
+        return directory
+
+    def start_trace(self):
+        """Python側の処理とブラウザのパフォーマンス情報を合わせたトレースを開始する"""
+        from mapcamera_trace import TraceSession
+
+        if self.tracer is not None:
+            return self.tracer
+
+        debug_address = f"127.0.0.1:{self.config.get('debug_port', '9222')}"
+        self.tracer = TraceSession(debug_address).start()
+        self.tracer.instrument(self.driver)
+        source = "DevTools" if self.tracer.uses_devtools else "Performance API"
+        print(f"トレースを開始しました（ブラウザ側: {source}）")
+        return self.tracer
+
+    def stop_trace(self):
+        """トレースを終了してファイルに保存し、保存先のパスを返す"""
+        if self.tracer is None:
+            return None
+
+        tracer = self.tracer
+        self._trace_page()  # 最後に表示していたページの分
+        self.tracer = None
+        tracer.stop()
+
+        filename = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        try:
+            path = tracer.save(os.path.join(self._output_dir("trace_dir", "traces"), filename))
+        except Exception as e:
+            print(f"トレースの保存に失敗しました: {str(e)}")
+            return None
+        self.last_trace_path = path
+        print(f"トレースを保存しました: {path}")
+        return path
+
+    def _trace_span(self, name, **args):
+        """トレース中であれば区間として記録する"""
+        if self.tracer is None:
+            return contextlib.nullcontext()
+        return self.tracer.span(name, **args)
+
+    def _trace_page(self):
+        """DevToolsのトレースが使えない場合に、現在のページのPerformance APIのエントリを記録する"""
+        if self.tracer is None or self.tracer.uses_devtools:
+            return
+        try:
+            self.tracer.add_page_entries(self._call_helper("perfEntries"))
+        except Exception as e:
+            if self.verbose_log:
+                print(f"ページのパフォーマンス情報を取得できませんでした: {str(e)}")
+
+    def _mark_recording(self, name):
+        """記録中であれば処理の区切りを記録する"""
+        if self.recorder is not None:
+            self.recorder.mark(name)
+
     def log_error(self, message, error, operation=None, include_url=True):
         """詳細なエラー情報をログに記録する"""
         error_type = type(error).__name__
@@ -254,6 +970,39 @@ class MapCameraAutomation:
             print(f"セッション状態確認中にエラー: {str(e)}")
             return False  # エラーの場合は安全のためFalseを返す
 
+    def _ensure_helpers(self):
+        """ヘルパースクリプトを現在のタブに登録し、現在のページにも読み込む"""
+        handle = self.driver.current_window_handle
+
+        # 新しいドキュメントごとに自動で評価されるよう、タブごとに1回だけ登録
+        if handle not in self._helper_tabs:
+            try:
+                self.driver.execute_cdp_cmd(
+                    "Page.addScriptToEvaluateOnNewDocument", {"source": HELPER_BUNDLE_JS})
+                self._helper_tabs.add(handle)
+                if self.verbose_log:
+                    print(f"ヘルパースクリプトをタブに登録しました: {handle}")
+            except Exception as e:
+                if self.verbose_log:
+                    print(f"ヘルパースクリプトの登録に失敗しました: {str(e)}")
+
+        # 登録前に読み込まれたページには直接読み込む
+        self.driver.execute_script(HELPER_BUNDLE_JS)
+
+    def _call_helper(self, name, *args):
+        """ページ側ヘルパー（window.__mc）の関数を呼び出す"""
+        script = ("return window.__mc ? [window.__mc['%s'].apply(window.__mc, arguments)] : null;"
+                  % name)
+        result = self.driver.execute_script(script, *args)
+
+        # ヘルパーが未読み込みの場合のみ登録して再実行
+        if result is None:
+            self._ensure_helpers()
+            result = self.driver.execute_script(script, *args)
+
+        # マップカメラ以外のページではヘルパーは読み込まれない
+        return result[0] if result else None
+
     def show_browser_message(self, message, duration=None):
         """ブラウザ上にメッセージを表示する（GUIへの表示が優先）"""
         # 主にGUI側に表示を委託し、ブラウザ上での表示は最小限に
@@ -264,47 +1013,9 @@ class MapCameraAutomation:
             try:
                 if self.verbose_log:
                     print(f"ブラウザメッセージを表示: {message}")
-                escaped_message = message.replace("'",
-                                                  "\\'").replace("\n", "\\n")
-
-                # duration_js変数を定義
-                duration_js = "null" if duration is None else str(duration *
-                                                                  1000)
-
-                js_code = f"""
-                    var messageDiv = document.createElement('div');
-                    messageDiv.id = 'automation-message';
-                    messageDiv.style.position = 'fixed';
-                    messageDiv.style.top = '50%';
-                    messageDiv.style.left = '50%';
-                    messageDiv.style.transform = 'translate(-50%, -50%)';
-                    messageDiv.style.backgroundColor = 'rgba(0, 0, 0, 0.9)';
-                    messageDiv.style.color = 'white';
-                    messageDiv.style.padding = '20px';
-                    messageDiv.style.borderRadius = '10px';
-                    messageDiv.style.zIndex = '9999999';
-                    messageDiv.style.fontSize = '18px';
-                    messageDiv.style.fontWeight = 'bold';
-                    messageDiv.style.maxWidth = '80%';
-                    messageDiv.style.textAlign = 'center';
-                    messageDiv.innerHTML = '{escaped_message}';
-                    
-                    // 既存のメッセージを削除
-                    var oldMsg = document.getElementById('automation-message');
-                    if (oldMsg) oldMsg.remove();
-                    
-                    document.body.appendChild(messageDiv);
-                    
-                    // 指定時間後に自動的に消去（非同期）
-                    if ({duration_js} !== null) {{
-                        setTimeout(function() {{
-                            var msg = document.getElementById('automation-message');
-                            if (msg) msg.remove();
-                        }}, {duration_js});
-                    }}
-                """
-                # メッセージを表示（非同期実行）
-                self.driver.execute_script(js_code)
+                # 表示処理はページ側のヘルパーに委譲（スクリプト本体は送信しない）
+                duration_ms = None if duration is None else duration * 1000
+                self._call_helper("showMessage", message, duration_ms)
 
             except Exception as e:
                 self.log_error("メッセージ表示エラー",
@@ -312,9 +1023,61 @@ class MapCameraAutomation:
                                operation="show_browser_message",
                                include_url=False)
 
+    @property
+    def stop_requested(self):
+        """停止リクエストの有無（stop_eventと連動）"""
+        return self.stop_event.is_set()
+
+    @stop_requested.setter
+    def stop_requested(self, value):
+        if value:
+            if not self.stop_event.is_set():
+                self._stop_requested_at = time.time()
+            self.stop_event.set()
+        else:
+            self.stop_event.clear()
+            self._stop_requested_at = None
+
+        for listener in list(getattr(self, 'stop_listeners', [])):
+            try:
+                listener(bool(value))
+            except Exception as e:
+                print(f"停止通知の処理でエラー: {str(e)}")
+
     def check_stop(self):
         """停止リクエストがあるかどうかを確認"""
-        return self.stop_requested
+        return self.stop_event.is_set()
+
+    def _sleep(self, seconds):
+        """停止リクエストで即座に中断される待機（停止された場合はTrueを返す）"""
+        return self.stop_event.wait(seconds)
+
+    def _poll(self, kind, base):
+        """ポーリングの待機（間隔は状態に応じてガバナーが決める。停止された場合はTrueを返す）"""
+        return self.governor.wait(self.stop_event, kind, base)
+
+    def _wait_until(self, predicate, timeout, interval=0.1, kind="wait"):
+        """条件が満たされるまで待機（停止リクエストで即座に中断）"""
+        end_time = time.time() + timeout
+        while True:
+            try:
+                if predicate():
+                    return True
+            except Exception:
+                pass
+
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return False
+            if self._poll(kind, min(interval, remaining)):
+                return False
+
+    def measure_stop_latency(self):
+        """停止リクエストから現在までの経過時間（秒）を記録して返す"""
+        if self._stop_requested_at is None:
+            return None
+        self.last_stop_latency = time.time() - self._stop_requested_at
+        return self.last_stop_latency
 
     def request_stop(self):
         """停止をリクエスト"""
@@ -333,37 +1096,43 @@ class MapCameraAutomation:
                 return None
 
             try:
-                # 現在のポーリング間隔で要素を探す
-                element = WebDriverWait(self.driver, poll_interval).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, selector)))
+                # 要素がクリック可能かを1回だけ確認（待機は停止イベントで行う）
+                element = EC.element_to_be_clickable(
+                    (By.CSS_SELECTOR, selector))(self.driver)
                 if element:
                     if self.verbose_log:
                         print(
                             f"要素が{time.time() - start_time:.2f}秒で見つかりました: {selector}"
                         )
                     return element
-            except TimeoutException:
-                # 要素が見つからなければポーリング間隔を徐々に長くする
-                attempt += 1
-                # 試行回数に応じてポーリング間隔を調整（最大0.5秒まで）
-                poll_interval = min(0.5, 0.1 + (attempt * 0.05))
-                continue
+            except (NoSuchElementException, StaleElementReferenceException):
+                pass
             except Exception as e:
                 # その他のエラーが発生した場合
                 self.log_error("要素待機中のエラー",
                                e,
                                operation="wait_for_element_with_stop_check")
-                time.sleep(0.05)  # エラー時は短く待機
+
+            # 要素が見つからなければポーリング間隔を徐々に長くする（最大0.5秒まで）
+            attempt += 1
+            poll_interval = min(0.5, 0.1 + (attempt * 0.05))
+            if self._poll("wait", poll_interval):
+                return None
 
         # タイムアウト
         if self.verbose_log:
             print(f"要素が{timeout}秒以内に見つかりませんでした: {selector}")
         return None
 
-    def wait_for_any_element(self, selectors, timeout=5):
-        """複数のセレクタから最初に見つかる要素を待機（停止チェック付き）"""
+    def wait_for_any_element(self, selectors, timeout=5, key=None):
+        """複数のセレクタから最初に見つかる要素を待機（停止チェック付き）
+
+        key を指定すると、その要素でよく一致するセレクタから試し、結果を記録する。
+        """
         if isinstance(selectors, str):
             selectors = [selectors]
+        if key:
+            selectors = self.selector_registry.order(key, selectors)
 
         start_time = time.time()
         while time.time() - start_time < timeout:
@@ -371,20 +1140,24 @@ class MapCameraAutomation:
             if self.check_stop():
                 return None, None
 
-            # 各セレクタをチェック
+            # 各セレクタを1回ずつチェック（見つからないセレクタで待たされない）
             for selector in selectors:
                 try:
-                    element = WebDriverWait(self.driver, 0.5).until(
-                        EC.element_to_be_clickable(
-                            (By.CSS_SELECTOR, selector)))
+                    element = EC.element_to_be_clickable(
+                        (By.CSS_SELECTOR, selector))(self.driver)
                     if element:
+                        if key:
+                            self.selector_registry.record_hit(key, selector, selectors)
                         return element, selector
                 except:
                     continue
 
-            # 短い間隔で再試行
-            time.sleep(0.05)
+            # 短い間隔で再試行（停止リクエストで即座に中断）
+            if self._poll("wait", 0.1):
+                return None, None
 
+        if key:
+            self.selector_registry.record_miss(key, selectors)
         return None, None
 
     def handle_element_action(self,
@@ -392,8 +1165,9 @@ class MapCameraAutomation:
                               action,
                               value=None,
                               timeout=5,
-                              retries=5):
-        """要素に対する様々なアクションを統一的に処理"""
+                              retries=5,
+                              key=None):
+        """要素に対する様々なアクションを統一的に処理（keyはセレクタ統計の要素名）"""
         if isinstance(selector, str):
             selectors = [selector]
         else:
@@ -410,7 +1184,7 @@ class MapCameraAutomation:
 
             # 要素を待機
             element, found_selector = self.wait_for_any_element(
-                selectors, timeout)
+                selectors, timeout, key=key)
 
             if element:
                 try:
@@ -433,7 +1207,7 @@ class MapCameraAutomation:
 
                     # 要素が古くなっているなどのエラーでリトライ
                     if attempt < retries - 1:
-                        time.sleep(0.5)
+                        self._sleep(0.5)
                     continue
 
             # 要素が見つからなかった場合
@@ -441,7 +1215,7 @@ class MapCameraAutomation:
                 if self.verbose_log:
                     print(
                         f"要素が見つかりませんでした。リトライします... ({attempt + 2}/{retries})")
-                time.sleep(0.5)
+                self._sleep(0.5)
             else:
                 self.update_status(f"要素が見つかりませんでした: {selectors}", "error")
                 return False
@@ -488,6 +1262,7 @@ class MapCameraAutomation:
     @error_handler(operation="find_best_tab")
     def find_best_tab(self):
         """利用可能なタブから最適なマップカメラのタブを見つける（エラーハンドリング強化版）"""
+        self._mark_recording("find_best_tab")
         print("最適なマップカメラタブを探しています...")
 
         # 最大試行回数を設定
@@ -711,10 +1486,8 @@ class MapCameraAutomation:
         print(f"商品一覧ページに戻ります: {self.last_product_list_url}")
         self.update_status("商品一覧ページに移動します...", "info")
 
-        # まず「戻る」ボタンで戻ってみる
-        current_url = self.driver.current_url
-        self.driver.back()
-        time.sleep(0.5)
+        # まず「戻る」ボタンで戻ってみる（戻った先のDOMが構築されるまで待つ）
+        self.navigate_back(LIST_READINESS, timeout=5)
 
         # 戻った先が商品一覧ページかチェック
         if self.is_product_list_page(self.driver.current_url):
@@ -729,8 +1502,7 @@ class MapCameraAutomation:
             return True
 
         # 戻れなかった場合は記録済みの商品一覧URLに直接移動
-        self.driver.get(self.last_product_list_url)
-        time.sleep(0.5)
+        self.navigate(self.last_product_list_url, LIST_READINESS)
 
         # 移動先が商品一覧ページかチェック
         if self.is_product_list_page(self.driver.current_url):
@@ -743,8 +1515,7 @@ class MapCameraAutomation:
             return True
 
         # それでもダメな場合はデフォルトの検索ページに移動
-        self.driver.get("https://www.mapcamera.com/search")
-        time.sleep(0.5)
+        self.navigate("https://www.mapcamera.com/search", LIST_READINESS)
         print("デフォルトの検索ページに移動しました")
         self.update_status("検索ページに移動しました。検索条件を設定してください。", "info")
 
@@ -777,6 +1548,7 @@ class MapCameraAutomation:
         # 新しく開いたタブのハンドルを取得
         tabs = self.driver.window_handles
         new_tab = tabs[-1]  # 最後に開いたタブ
+        self.tab_manager.register(new_tab, "list")
 
         # 一時的に新しいタブに切り替えて情報を取得
         self.driver.switch_to.window(new_tab)
@@ -803,14 +1575,37 @@ class MapCameraAutomation:
     @error_handler(operation="wait_for_product_click")
     def wait_for_product_click(self):
         """商品一覧ページで商品クリックを待機し、新しいタブで開く - 改良版"""
+        state = self._begin_product_click_wait()
+        if state is None:
+            return False
+
+        # 新しいタブが開かれるまで待機
+        while True:
+            result = self._poll_product_click(state)
+            if result is not None:
+                if not result:
+                    # 停止・中止した場合はユーザーのタブのリンクを元に戻す
+                    self.remove_link_conversion()
+                return result
+
+            # 少し待機（停止リクエストで即座に中断）
+            self._poll("click", state.poll_interval)
+
+    def _begin_product_click_wait(self):
+        """商品クリック待機の準備（タブの確認とリンク変換）を行う。待機できない場合はNone"""
+        self._mark_recording("wait_for_product_click")
+
         # 追加: 終了中チェック
         if hasattr(self, 'is_shutting_down') and self.is_shutting_down:
             print("シャットダウン中のため操作をスキップします")
-            return False
+            return None
 
         # 追加: セッション状態チェック
         if not self.check_session_and_notify():
-            return False
+            return None
+
+        # 前回の商品タブを終了扱いにし、上限を超えた使用済みタブを閉じる
+        self._recycle_tabs()
 
         # 現在のページが商品一覧ページの場合のみタブ切り替え処理を実行
         if self.is_product_list_page(self.driver.current_url):
@@ -826,7 +1621,7 @@ class MapCameraAutomation:
             else:
                 # 有効なタブがない場合は正しいタブを検索
                 if not self.focus_on_correct_tab():
-                    return False
+                    return None
                 # 現在のタブを商品一覧タブとして記録
                 current_tab = self.driver.current_window_handle
                 if self.is_product_list_page(self.driver.current_url):
@@ -837,7 +1632,7 @@ class MapCameraAutomation:
             # 商品詳細ページや最終確認画面など、商品一覧ページでない場合は
             # タブ切り替えを行わず、単に現在のタブが有効かチェックするのみ
             if not self.focus_on_correct_tab():
-                return False
+                return None
             # ステータスメッセージは更新しない（前のメッセージを維持）
 
         print("商品クリックを待機中...")
@@ -856,506 +1651,347 @@ class MapCameraAutomation:
 
             # リストタブを記録
             self.list_tab = initial_tab
+            self.tab_manager.register(initial_tab, "list")
 
-        # パッチング関数: 直接window.openを使用して新しいタブで商品を開く（修正版）
-        self.driver.execute_script("""
-            // 既存のコンテキストメニューイベントが正常に動作するようにする
-            window._originalOpenHook = window.open;
-            
-            // マップカメラのドメインかどうかをチェックする関数
-            function isMapCameraDomain() {
-                return window.location.hostname.includes('mapcamera.com');
-            }
-            
-            // 商品リンクのクリックを監視する関数
-            function setupProductLinkWatcher() {
-                // マップカメラのドメインでない場合は処理しない
-                if (!isMapCameraDomain()) {
-                    console.log("マップカメラ以外のドメインのため、リンク監視を行いません");
-                    return 0;
-                }
-                
-                var links = document.querySelectorAll('a[href*="/item/"]');
-                var modifiedCount = 0;
-                
-                for (var i = 0; i < links.length; i++) {
-                    var link = links[i];
-                    var href = link.getAttribute('href');
-                    
-                    // 商品リンクのみを対象（/item/maker や /item/category を除外）
-                    if (href.indexOf('/item/maker') >= 0 || 
-                        href.indexOf('/item/category') >= 0 ||
-                        href.indexOf('/item/list') >= 0) {
-                        continue;
-                    }
-                    
-                    // すでに処理済みのリンクはスキップ
-                    if (link.getAttribute('data-modified') === 'true') {
-                        continue;
-                    }
-                    
-                    // オリジナルのクリックハンドラを保存
-                    var originalClickHandler = link.onclick;
-                    
-                    // クリックイベントを修正
-                    link.onclick = function(e) {
-                        e.preventDefault();
-                        e.stopPropagation();
-                        
-                        // 元のURLを保存
-                        var targetUrl = this.href;
-                        
-                        // 新しいタブで開く
-                        var newTab = window._originalOpenHook(targetUrl, '_blank');
-                        
-                        // イベントキャンセル
-                        return false;
-                    };
-                    
-                    // マーキング
-                    link.setAttribute('data-modified', 'true');
-                    link.setAttribute('target', '_blank');  // 念のため
-                    modifiedCount++;
-                }
-                
-                return modifiedCount;
-            }
-            
-            // 定期的なドメインチェック機能を追加
-            function checkDomainAndSetupWatcher() {
-                try {
-                    if (isMapCameraDomain()) {
-                        return setupProductLinkWatcher();
-                    } else {
-                        console.log("マップカメラ以外のドメインです");
-                        return -1; // マップカメラ以外を示す値を返す
-                    }
-                } catch (e) {
-                    console.error("ドメインチェック中にエラー:", e);
-                    return -2; // エラーを示す値を返す
-                }
-            }
-            
-            // 初回実行
-            var result = checkDomainAndSetupWatcher();
-            console.log("Modified " + result + " product links");
-            
-            // インターバルIDを保存（既存のものがあれば再利用）
-            if (!window._productLinkWatcherInterval) {
-                window._productLinkWatcherInterval = setInterval(function() {
-                    var newCount = checkDomainAndSetupWatcher();
-                    if (newCount > 0) {
-                        console.log("Found and modified " + newCount + " new product links");
-                    }
-                }, 2000);
-            }
-            
-            return result;
-        """)
+        # リンク変換を有効化（ヘルパーはドキュメントごとに自動で読み込まれる）
+        self._apply_link_conversion_script()
 
         print("商品リンクを処理しました。クリックされるのを待機中...")
+        self._journal_state()
 
-        # 停止チェックの間隔を短く設定
-        stop_check_interval = 0.05  # 50ミリ秒ごとに停止チェック
-        last_stop_check = time.time()
-        last_message_update = time.time()
-        last_domain_check = time.time()
-        domain_check_interval = 1.0  # 1秒ごとにドメインをチェック
-
-        # 新しいタブが開かれるまで待機
-        while True:
-            # 停止チェック
-            current_time = time.time()
-            if (current_time - last_stop_check) >= stop_check_interval:
-                if self.check_stop():
-                    print("ユーザーリクエストにより処理を停止します")
-                    self.update_status("処理を停止しました", "warning")
-                    return False
-                last_stop_check = current_time
+        return ProductClickWait(initial_tab, initial_url, initial_tabs)
 
-            # 終了中フラグのチェックを追加
-            if hasattr(self, 'is_shutting_down') and self.is_shutting_down:
-                print("シャットダウン中のため操作を停止します")
+    def _poll_product_click(self, state):
+        """商品クリック待機の1回分の確認（商品タブを検出したらTrue、中止ならFalse、待機継続ならNone）"""
+        # 停止チェック
+        current_time = time.time()
+        if (current_time - state.last_stop_check) >= state.stop_check_interval:
+            if self.check_stop():
+                print("ユーザーリクエストにより処理を停止します")
+                self.update_status("処理を停止しました", "warning")
                 return False
+            state.last_stop_check = current_time
 
-            # 定期的なドメインチェックを追加
-            if (current_time - last_domain_check) >= domain_check_interval:
-                try:
-                    # 現在のタブが有効かチェック
-                    if self.tab_exists(initial_tab):
-                        # 現在アクティブなタブを保存
-                        current_active_tab = self.driver.current_window_handle
-
-                        # タブ切り替えを最小限に抑えるため、現在のタブが初期タブの場合のみ詳細チェック
-                        if current_active_tab == initial_tab:
-                            # セッションが有効かチェック
-                            if not self.is_session_valid():
-                                print("セッションが無効になりました。処理を中止します")
-                                self.update_status(
-                                    "ブラウザセッションが終了しました。再起動してください。", "warning")
-                                return False
+        # 終了中フラグのチェックを追加
+        if hasattr(self, 'is_shutting_down') and self.is_shutting_down:
+            print("シャットダウン中のため操作を停止します")
+            return False
 
-                            # 初期タブのドメインとURLを取得
-                            current_url = self.driver.current_url
-                            is_mapcamera = 'mapcamera.com' in current_url
+        # 定期的なドメインチェックを追加
+        if (current_time - state.last_domain_check) >= state.domain_check_interval:
+            try:
+                # 現在のタブが有効かチェック
+                if self.tab_exists(state.initial_tab):
+                    # 現在アクティブなタブを保存
+                    current_active_tab = self.driver.current_window_handle
+
+                    # タブ切り替えを最小限に抑えるため、現在のタブが初期タブの場合のみ詳細チェック
+                    if current_active_tab == state.initial_tab:
+                        # セッションが有効かチェック
+                        if not self.is_session_valid():
+                            print("セッションが無効になりました。処理を中止します")
+                            self.update_status(
+                                "ブラウザセッションが終了しました。再起動してください。", "warning")
+                            return False
 
-                            if not is_mapcamera:
-                                print("初期タブがマップカメラ以外のドメインに移動しました。商品クリック待機を終了します")
-                                self.update_status(
-                                    "マップカメラ以外のページに移動しました。購入処理を終了します。", "warning")
-                                return False
+                        # 初期タブのドメインとURLを取得
+                        current_url = self.driver.current_url
+                        is_mapcamera = 'mapcamera.com' in current_url
 
-                            # 商品一覧ページに戻ったかチェック
-                            current_is_list_page = self.is_product_list_page(
-                                current_url)
+                        if not is_mapcamera:
+                            print("初期タブがマップカメラ以外のドメインに移動しました。商品クリック待機を終了します")
+                            self.update_status(
+                                "マップカメラ以外のページに移動しました。購入処理を終了します。", "warning")
+                            return False
 
-                            # 前回のURLと今回のURLを使って状態変化を検出
-                            if hasattr(self, '_last_checked_url'):
-                                previous_is_list_page = self.is_product_list_page(
-                                    self._last_checked_url)
-                                previous_url = self._last_checked_url
+                        # 商品一覧ページに戻ったかチェック
+                        current_is_list_page = self.is_product_list_page(
+                            current_url)
 
-                                # 非一覧ページから一覧ページに変わった場合（復帰）
-                                if current_is_list_page and not previous_is_list_page:
-                                    print("商品一覧ページに戻りました。リンク変換スクリプトを再実行します")
-                                    self.update_status(
-                                        "商品一覧ページに戻りました。商品をクリックできます。", "info")
-                                    self._apply_link_conversion_script()
-                                    # リロードタイムスタンプを更新（復帰時は必ずスクリプト適用）
-                                    self._last_reload_timestamp = int(
-                                        time.time() * 1000)
-
-                                # 商品一覧ページから別のページに移動した場合
-                                elif not current_is_list_page and previous_is_list_page:
-                                    # 購入処理中フラグがない場合のみメッセージを更新
-                                    if not hasattr(self, 'purchase_in_progress') or not self.purchase_in_progress:
-                                        print("商品一覧ページから別のページに移動しました")
-                                        self.update_status(
-                                            "商品一覧ページから別のページに移動しました。", "info")
-
-                                # 同じ商品一覧ページ内での変化（リロードなど）
-                                elif current_url == previous_url and current_is_list_page:
-                                    # リロード頻度制限のためのタイムスタンプチェック
-                                    current_time_millis = int(
-                                        time.time() * 1000)
-                                    if hasattr(self, '_last_reload_timestamp'):
-                                        time_since_last_reload = current_time_millis - self._last_reload_timestamp
-                                        # 5秒以内の再検出は無視（誤検出防止）
-                                        if time_since_last_reload >= 5000:
-                                            # 修正されたリンクをカウント（スクリプトの生存確認）
-                                            link_count = self.driver.execute_script("""
-                                                // クリックハンドラーが適用されたリンクの数をカウント
-                                                var links = document.querySelectorAll('a[data-modified="true"]');
-                                                return links.length;
-                                            """)
-
-                                            # リンクが0であれば、スクリプトが消えている可能性が高い
-                                            if link_count == 0:
-                                                print(
-                                                    f"リンク変換が無効になっています。スクリプトを再適用します（検出リンク数: {link_count}）")
-                                                self.update_status(
-                                                    "リンク変換を再適用します", "info")
-                                                self._apply_link_conversion_script()
-                                                # リロードタイムスタンプを更新
-                                                self._last_reload_timestamp = current_time_millis
-                                    else:
-                                        # 初回のリロードタイムスタンプを設定
-                                        self._last_reload_timestamp = current_time_millis
-
-                            # 現在のURLを保存して次回のチェックに使用
-                            self._last_checked_url = current_url
-
-                            # 商品一覧ページで適切なメッセージを表示（ただし前回と同じメッセージは表示しない）
-                            if current_is_list_page:
-                                # 前回のメッセージと比較して、同じなら表示しない
-                                new_message = "商品一覧ページです。購入したい商品をクリックしてください。"
-                                if not hasattr(self, '_last_status_message') or self._last_status_message != new_message:
-                                    self.update_status(new_message, "info")
-                                    self._last_status_message = new_message
-                        else:
-                            # 現在のタブが初期タブと異なる場合、初期タブの状態を調べるためでも切り替えない
-                            # 完全に非侵入的な動作のためにタブ切り替えを行わない
+                        # 前回のURLと今回のURLを使って状態変化を検出
+                        if hasattr(self, '_last_checked_url'):
+                            previous_is_list_page = self.is_product_list_page(
+                                self._last_checked_url)
 
-                            # 購入処理中かどうかを確認
-                            if hasattr(self, 'product_tab') and current_active_tab == self.product_tab:
-                                # 商品タブがアクティブなら、ガイダンスを表示
-                                if not hasattr(self, '_last_status_message') or self._last_status_message != "商品一覧ページに切り替えて、次の商品を選択できます。":
-                                    self.update_status(
-                                        "商品一覧ページに切り替えて、次の商品を選択できます。", "info")
-                                    self._last_status_message = "商品一覧ページに切り替えて、次の商品を選択できます。"
-                            else:
-                                # その他のタブでは何もしない（ユーザーの自由な操作を尊重）
-                                pass
+                            # 非一覧ページから一覧ページに変わった場合（復帰）
+                            if current_is_list_page and not previous_is_list_page:
+                                print("商品一覧ページに戻りました。リンク変換スクリプトを再実行します")
+                                self.update_status(
+                                    "商品一覧ページに戻りました。商品をクリックできます。", "info")
+                                self._apply_link_conversion_script()
 
-                        last_domain_check = current_time
+                            # 商品一覧ページから別のページに移動した場合
+                            elif not current_is_list_page and previous_is_list_page:
+                                # 購入処理中フラグがない場合のみメッセージを更新
+                                if not hasattr(self, 'purchase_in_progress') or not self.purchase_in_progress:
+                                    print("商品一覧ページから別のページに移動しました")
+                                    self.update_status(
+                                        "商品一覧ページから別のページに移動しました。", "info")
+
+                        # 現在のURLを保存して次回のチェックに使用
+                        self._last_checked_url = current_url
+
+                        # 商品一覧ページで適切なメッセージを表示（ただし前回と同じメッセージは表示しない）
+                        if current_is_list_page:
+                            # 前回のメッセージと比較して、同じなら表示しない
+                            new_message = "商品一覧ページです。購入したい商品をクリックしてください。"
+                            if not hasattr(self, '_last_status_message') or self._last_status_message != new_message:
+                                self.update_status(new_message, "info")
+                                self._last_status_message = new_message
                     else:
-                        print("初期タブが存在しません")
-                        last_domain_check = current_time
-                except Exception as e:
-                    # エラーが発生した場合はセッションが無効になっている可能性が高い
-                    print(f"ドメインチェック中にエラー: {str(e)}")
-                    if "invalid session id" in str(e).lower():
-                        print("セッションが無効になりました。処理を中止します")
-                        self.update_status(
-                            "ブラウザセッションが終了しました。再起動してください。", "warning")
-                        return False
-                    last_domain_check = current_time
-
-            # 定期的にメッセージを更新
-            if (current_time - last_message_update) > 3:
-                # 安全にタブ存在チェック
-                if self.tab_exists(initial_tab):
-                    # 現在のタブがリストタブのままか確認
-                    if self.driver.current_window_handle == initial_tab:
-                        current_url = self.driver.current_url
-                        if self.is_product_list_page(current_url):
-                            self.update_status("商品一覧ページです。購入したい商品をクリックしてください。",
-                                               "info")
-                last_message_update = current_time
+                        # 現在のタブが初期タブと異なる場合、初期タブの状態を調べるためでも切り替えない
+                        # 完全に非侵入的な動作のためにタブ切り替えを行わない
 
-            # 新しいタブが開かれたかチェック
-            try:
-                current_tabs = self.driver.window_handles
-
-                # タブが閉じられた場合でも新しいタブを検出できるようにする
-                new_tabs = [
-                    tab for tab in current_tabs if tab not in initial_tabs]
-                if new_tabs:
-                    new_tab = new_tabs[-1]  # 最新のタブを取得
-
-                    # 念のため元のタブが有効か確認
-                    if self.tab_exists(initial_tab):
-                        if self.driver.current_window_handle != initial_tab:
-                            # 安全にタブ切り替え
-                            self.safe_switch_to_tab(initial_tab)
-
-                    # 新しいタブに切り替え - 安全に
-                    if not self.safe_switch_to_tab(new_tab):
-                        # タブが閉じられていたら続行
-                        continue
+                        # 購入処理中かどうかを確認
+                        if hasattr(self, 'product_tab') and current_active_tab == self.product_tab:
+                            # 商品タブがアクティブなら、ガイダンスを表示
+                            if not hasattr(self, '_last_status_message') or self._last_status_message != "商品一覧ページに切り替えて、次の商品を選択できます。":
+                                self.update_status(
+                                    "商品一覧ページに切り替えて、次の商品を選択できます。", "info")
+                                self._last_status_message = "商品一覧ページに切り替えて、次の商品を選択できます。"
+                        else:
+                            # その他のタブでは何もしない（ユーザーの自由な操作を尊重）
+                            pass
 
-                    # 明示的なWaitを使用してページ読み込みを待機
-                    try:
-                        # URLがabout:blankから変わるまで待機（最大10秒）
-                        WebDriverWait(self.driver, 10, poll_frequency=0.2).until(
-                            lambda d: d.current_url != "about:blank"
-                        )
+                    state.last_domain_check = current_time
+                else:
+                    print("初期タブが存在しません")
+                    state.last_domain_check = current_time
+            except Exception as e:
+                # エラーが発生した場合はセッションが無効になっている可能性が高い
+                print(f"ドメインチェック中にエラー: {str(e)}")
+                if "invalid session id" in str(e).lower():
+                    print("セッションが無効になりました。処理を中止します")
+                    self.update_status(
+                        "ブラウザセッションが終了しました。再起動してください。", "warning")
+                    return False
+                state.last_domain_check = current_time
+
+        # 定期的にメッセージを更新
+        if (current_time - state.last_message_update) > 3:
+            # 安全にタブ存在チェック
+            if self.tab_exists(state.initial_tab):
+                # 現在のタブがリストタブのままか確認
+                if self.driver.current_window_handle == state.initial_tab:
+                    current_url = self.driver.current_url
+                    if self.is_product_list_page(current_url):
+                        self.update_status("商品一覧ページです。購入したい商品をクリックしてください。",
+                                           "info")
+            state.last_message_update = current_time
 
-                        # さらにページ本体が読み込まれるのを待機（最大8秒）
-                        WebDriverWait(self.driver, 8, poll_frequency=0.2).until(
-                            lambda d: d.execute_script(
-                                "return document.readyState") != "loading"
-                        )
+        # 新しいタブが開かれたかチェック
+        try:
+            current_tabs = self.driver.window_handles
 
-                        if self.verbose_log:
-                            print(f"ページが読み込まれました: {self.driver.current_url}")
-                    except Exception as e:
-                        print(f"ページ読み込み待機中にエラー: {str(e)}")
-                        # エラーが発生しても処理を継続
+            # タブが閉じられた場合でも新しいタブを検出できるようにする
+            new_tabs = [
+                tab for tab in current_tabs if tab not in state.initial_tabs]
+            if new_tabs:
+                new_tab = new_tabs[-1]  # 最新のタブを取得
 
-                    # マップカメラのドメインであることを確認（修正版）
-                    current_url = self.driver.current_url
-                    if 'mapcamera.com' not in current_url:
-                        print(f"新しいタブがマップカメラのドメインではありません: {current_url}")
-
-                        # 現在のタブ数をチェック
-                        current_tab_count = len(self.driver.window_handles)
-                        if current_tab_count <= 1:
-                            # タブが1つしかない場合は閉じずに商品一覧ページに戻す
-                            print("タブが1つしかないため閉じずに商品一覧ページに戻します")
-                            self.update_status(
-                                "マップカメラ以外のページが検出されました。商品一覧ページに戻します。", "info")
-                            try:
-                                # マップカメラの商品一覧ページに戻る
-                                self.driver.get(
-                                    self.last_product_list_url or "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result")
-                                # ページ読み込み完了を待機
-                                WebDriverWait(self.driver, 10, poll_frequency=0.2).until(
-                                    lambda d: d.execute_script(
-                                        "return document.readyState") == "complete"
-                                )
-
-                                # リンク変換スクリプトを適用
-                                self._apply_link_conversion_script()
+                # 念のため元のタブが有効か確認
+                if self.tab_exists(state.initial_tab):
+                    if self.driver.current_window_handle != state.initial_tab:
+                        # 安全にタブ切り替え
+                        self.safe_switch_to_tab(state.initial_tab)
 
-                                # 初期タブの情報を更新
-                                initial_tab = self.driver.current_window_handle
-                                initial_url = self.driver.current_url
-                                initial_tabs = self.driver.window_handles.copy()
-                            except Exception as e:
-                                print(f"商品一覧ページへの復帰中にエラー: {str(e)}")
-                                if "invalid session id" in str(e).lower():
-                                    print("セッションが無効になりました。処理を中止します")
-                                    self.update_status(
-                                        "ブラウザセッションが終了しました。再起動してください。", "warning")
-                                    return False
-                        else:
-                            # 複数タブがある場合は自動的に閉じるのではなく、情報のみ表示
-                            print("マップカメラ以外のページが開かれましたが、閉じずに監視を継続します")
-                            self.update_status(
-                                "マップカメラ以外のページが開かれています。監視は継続します。", "info")
+                # 新しいタブに切り替え - 安全に
+                if not self.safe_switch_to_tab(new_tab):
+                    # タブが閉じられていたら続行
+                    return None
 
-                            # タブ切り替えをせず、現在のタブのままにする
-                            # 元のタブに戻る処理を削除
+                # ページ読み込みを待機（停止リクエストで即座に中断）
+                try:
+                    # URLがabout:blankから変わるまで待機（最大10秒）
+                    self._wait_until(
+                        lambda: self.driver.current_url != "about:blank", 10, interval=0.2)
 
-                        # リストの更新（次の検出のため）
-                        initial_tabs = current_tabs.copy()
-                        continue
+                    # さらにページ本体が読み込まれるのを待機（最大8秒）
+                    self._wait_until(
+                        lambda: self.driver.execute_script(
+                            "return document.readyState") != "loading", 8, interval=0.2)
 
-                    if self.is_product_page(
-                            current_url) or self.is_product_page_by_content():
-                        print(f"新しいタブで商品ページを検出: {current_url}")
-                        self.update_status(
-                            "商品ページを検出しました。購入処理を開始します...", "success")
+                    if self.check_stop():
+                        print("ユーザーリクエストにより処理を停止します")
+                        self.update_status("処理を停止しました", "warning")
+                        return False
 
-                        # タブ情報を記録
-                        self.product_tab = new_tab
-                        self.list_tab = initial_tab
+                    if self.verbose_log:
+                        print(f"ページが読み込まれました: {self.driver.current_url}")
+                except Exception as e:
+                    print(f"ページ読み込み待機中にエラー: {str(e)}")
+                    # エラーが発生しても処理を継続
 
-                        return True
+                # マップカメラのドメインであることを確認（修正版）
+                current_url = self.driver.current_url
+                if 'mapcamera.com' not in current_url:
+                    print(f"新しいタブがマップカメラのドメインではありません: {current_url}")
+
+                    # 現在のタブ数をチェック
+                    current_tab_count = len(self.driver.window_handles)
+                    if current_tab_count <= 1:
+                        # タブが1つしかない場合は閉じずに商品一覧ページに戻す
+                        print("タブが1つしかないため閉じずに商品一覧ページに戻します")
+                        self.update_status(
+                            "マップカメラ以外のページが検出されました。商品一覧ページに戻します。", "info")
+                        try:
+                            # マップカメラの商品一覧ページに戻る
+                            # リンク変換は追加された要素にも効くため、DOMの構築完了まで待てばよい
+                            self.navigate(
+                                self.last_product_list_url or "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result",
+                                "dom", timeout=10)
+
+                            # リンク変換スクリプトを適用
+                            self._apply_link_conversion_script()
+
+                            # 初期タブの情報を更新
+                            state.initial_tab = self.driver.current_window_handle
+                            state.initial_url = self.driver.current_url
+                            state.initial_tabs = self.driver.window_handles.copy()
+                        except Exception as e:
+                            print(f"商品一覧ページへの復帰中にエラー: {str(e)}")
+                            if "invalid session id" in str(e).lower():
+                                print("セッションが無効になりました。処理を中止します")
+                                self.update_status(
+                                    "ブラウザセッションが終了しました。再起動してください。", "warning")
+                                return False
                     else:
-                        # 商品ページでない場合は閉じて元のタブに戻る
-                        print(f"新しいタブが商品ページではありません: {current_url}")
-                        self.update_status("商品ページではありません。", "warning")
-                        self.driver.close()
-                        # 安全にタブ切り替え
-                        if self.tab_exists(initial_tab):
-                            self.driver.switch_to.window(initial_tab)
-                        # リストの更新（次の検出のため）
-                        initial_tabs = current_tabs.copy()
-            except Exception as e:
-                print(f"タブチェック中にエラー: {str(e)}")
-                # セッションが無効になっている場合は処理を中止
-                if "invalid session id" in str(e).lower():
-                    print("セッションが無効になりました。処理を中止します")
-                    self.update_status(
-                        "ブラウザセッションが終了しました。再起動してください。", "warning")
-                    return False
-                # 一時的なエラーの場合は少し待機して継続
-                time.sleep(0.1)
+                        # 複数タブがある場合は自動的に閉じるのではなく、情報のみ表示
+                        print("マップカメラ以外のページが開かれましたが、閉じずに監視を継続します")
+                        self.update_status(
+                            "マップカメラ以外のページが開かれています。監視は継続します。", "info")
 
-            # 現在のタブが変わっていないか確認（商品が同じタブで開いてしまった場合）
-            try:
-                if self.tab_exists(
-                        initial_tab
-                ) and self.driver.current_window_handle == initial_tab:
-                    current_url = self.driver.current_url
-                    if current_url != initial_url and (
-                            self.is_product_page(current_url)
-                            or self.is_product_page_by_content()):
-                        print("警告: 商品が同じタブで開かれました。別タブで再オープンします。")
-
-                        # 新しいタブで商品一覧ページを開き、元のタブを商品ページとして使用
-                        self.driver.execute_script(
-                            f"window.open('{initial_url}', '_blank');")
-
-                        # 明示的なWaitを使用してタブのロードを待機
-                        time.sleep(0.1)  # 最小限の待機
-
-                        # 新しく開いたタブをリストタブとして設定
-                        new_tabs = [
-                            tab for tab in self.driver.window_handles
-                            if tab not in initial_tabs
-                        ]
-                        if new_tabs:
-                            self.list_tab = new_tabs[-1]
-                            self.product_tab = initial_tab
-
-                            print(f"商品一覧タブを作成しました: {self.list_tab}")
-                            self.update_status("商品ページを検出しました。購入処理を開始します...",
-                                               "success")
-                            return True
-            except Exception as e:
-                print(f"タブ状態チェック中にエラー: {str(e)}")
-                # セッションが無効になっている場合は処理を中止
-                if "invalid session id" in str(e).lower():
-                    print("セッションが無効になりました。処理を中止します")
+                        # タブ切り替えをせず、現在のタブのままにする
+                        # 元のタブに戻る処理を削除
+
+                    # リストの更新（次の検出のため）
+                    state.initial_tabs = current_tabs.copy()
+                    return None
+
+                if self.is_product_page(
+                        current_url) or self.is_product_page_by_content():
+                    print(f"新しいタブで商品ページを検出: {current_url}")
                     self.update_status(
-                        "ブラウザセッションが終了しました。再起動してください。", "warning")
-                    return False
+                        "商品ページを検出しました。購入処理を開始します...", "success")
 
-            # 少し待機
-            time.sleep(0.05)
+                    # タブ情報を記録
+                    self.product_tab = new_tab
+                    self.list_tab = state.initial_tab
+                    self.tab_manager.register(new_tab, "product")
 
-    def _apply_link_conversion_script(self):
-        """リンク変換スクリプトを適用するヘルパーメソッド"""
+                    return True
+                else:
+                    # 商品ページでない場合は閉じて元のタブに戻る
+                    print(f"新しいタブが商品ページではありません: {current_url}")
+                    self.update_status("商品ページではありません。", "warning")
+                    self.driver.close()
+                    # 安全にタブ切り替え
+                    if self.tab_exists(state.initial_tab):
+                        self.driver.switch_to.window(state.initial_tab)
+                    # リストの更新（次の検出のため）
+                    state.initial_tabs = current_tabs.copy()
+        except Exception as e:
+            print(f"タブチェック中にエラー: {str(e)}")
+            # セッションが無効になっている場合は処理を中止
+            if "invalid session id" in str(e).lower():
+                print("セッションが無効になりました。処理を中止します")
+                self.update_status(
+                    "ブラウザセッションが終了しました。再起動してください。", "warning")
+                return False
+            # 一時的なエラーの場合は少し待機して継続
+            self._sleep(0.1)
+
+        # 現在のタブが変わっていないか確認（商品が同じタブで開いてしまった場合）
         try:
-            # リンク変換スクリプトを完全に再実行
-            result = self.driver.execute_script("""
-                // 既存のコンテキストメニューイベントが正常に動作するようにする
-                window._originalOpenHook = window.open;
-                
-                // 商品リンクのクリックを監視する関数
-                function setupProductLinkWatcher() {
-                    var links = document.querySelectorAll('a[href*="/item/"]');
-                    var modifiedCount = 0;
-                    
-                    for (var i = 0; i < links.length; i++) {
-                        var link = links[i];
-                        var href = link.getAttribute('href');
-                        
-                        // 商品リンクのみを対象（/item/maker や /item/category を除外）
-                        if (href.indexOf('/item/maker') >= 0 || 
-                            href.indexOf('/item/category') >= 0 ||
-                            href.indexOf('/item/list') >= 0) {
-                            continue;
-                        }
-                        
-                        // すでに処理済みのリンクはスキップ
-                        if (link.getAttribute('data-modified') === 'true') {
-                            continue;
-                        }
-                        
-                        // オリジナルのクリックハンドラを保存
-                        var originalClickHandler = link.onclick;
-                        
-                        // クリックイベントを修正
-                        link.onclick = function(e) {
-                            e.preventDefault();
-                            e.stopPropagation();
-                            
-                            // 元のURLを保存
-                            var targetUrl = this.href;
-                            
-                            // 新しいタブで開く
-                            var newTab = window._originalOpenHook(targetUrl, '_blank');
-                            
-                            // イベントキャンセル
-                            return false;
-                        };
-                        
-                        // マーキング
-                        link.setAttribute('data-modified', 'true');
-                        link.setAttribute('target', '_blank');  // 念のため
-                        modifiedCount++;
-                    }
-                    
-                    return modifiedCount;
-                }
-                
-                // 初回実行
-                var result = setupProductLinkWatcher();
-                console.log("リンク変換スクリプト実行: " + result + " 個のリンクを処理しました");
-                
-                // インターバルIDを保存（既存のものがあれば再利用）
-                if (!window._productLinkWatcherInterval) {
-                    window._productLinkWatcherInterval = setInterval(function() {
-                        var newCount = setupProductLinkWatcher();
-                        if (newCount > 0) {
-                            console.log("Found and modified " + newCount + " new product links");
-                        }
-                    }, 2000);
-                }
-                
-                return result;
-            """)
+            if self.tab_exists(
+                    state.initial_tab
+            ) and self.driver.current_window_handle == state.initial_tab:
+                current_url = self.driver.current_url
+                if current_url != state.initial_url and (
+                        self.is_product_page(current_url)
+                        or self.is_product_page_by_content()):
+                    print("警告: 商品が同じタブで開かれました。別タブで再オープンします。")
+
+                    # 新しいタブで商品一覧ページを開き、元のタブを商品ページとして使用
+                    self.driver.execute_script(
+                        f"window.open('{state.initial_url}', '_blank');")
+
+                    # 明示的なWaitを使用してタブのロードを待機
+                    time.sleep(0.1)  # 最小限の待機
+
+                    # 新しく開いたタブをリストタブとして設定
+                    new_tabs = [
+                        tab for tab in self.driver.window_handles
+                        if tab not in state.initial_tabs
+                    ]
+                    if new_tabs:
+                        self.list_tab = new_tabs[-1]
+                        self.product_tab = state.initial_tab
+                        self.tab_manager.register(self.list_tab, "list")
+                        self.tab_manager.register(state.initial_tab, "product")
+
+                        print(f"商品一覧タブを作成しました: {self.list_tab}")
+                        self.update_status("商品ページを検出しました。購入処理を開始します...",
+                                           "success")
+                        return True
+        except Exception as e:
+            print(f"タブ状態チェック中にエラー: {str(e)}")
+            # セッションが無効になっている場合は処理を中止
+            if "invalid session id" in str(e).lower():
+                print("セッションが無効になりました。処理を中止します")
+                self.update_status(
+                    "ブラウザセッションが終了しました。再起動してください。", "warning")
+                return False
+
+        return None
 
+    def _apply_link_conversion_script(self):
+        """リンク変換を有効化するヘルパーメソッド（同じタブの以降のページでも自動で継続）"""
+        try:
+            result = self._call_helper("linkify") or 0
+            self._linkified_tabs.add(self.driver.current_window_handle)
             print(f"リンク変換スクリプトが実行され、{result}個のリンクが処理されました")
             return result
         except Exception as e:
             print(f"リンク変換スクリプト適用中にエラー: {str(e)}")
             return 0
 
+    def remove_link_conversion(self):
+        """リンク変換を有効にしたタブで解除する（停止・終了後にユーザーのタブのリンクを書き換えない）"""
+        if not self._linkified_tabs:
+            return 0
+        try:
+            current_tab = self.driver.current_window_handle
+            open_tabs = set(self.driver.window_handles)
+        except Exception as e:
+            if self.verbose_log:
+                print(f"リンク変換の解除をスキップします: {str(e)}")
+            return 0
+
+        removed = 0
+        for handle in list(self._linkified_tabs):
+            self._linkified_tabs.discard(handle)
+            if handle not in open_tabs:
+                continue
+            try:
+                if handle != current_tab:
+                    self.driver.switch_to.window(handle)
+                self._call_helper("unlinkify")
+                removed += 1
+            except Exception as e:
+                if self.verbose_log:
+                    print(f"リンク変換の解除中にエラー: {str(e)}")
+
+        # 元のタブに戻す
+        try:
+            if current_tab in open_tabs and self.driver.current_window_handle != current_tab:
+                self.driver.switch_to.window(current_tab)
+        except Exception:
+            pass
+        if removed and self.verbose_log:
+            print(f"{removed}個のタブでリンク変換を解除しました")
+        return removed
+
     @error_handler(operation="handle_point_payment_page")
     def handle_point_payment_page(self):
         """ポイント・支払い方法選択ページの処理"""
@@ -1386,7 +2022,7 @@ class MapCameraAutomation:
         ]
 
         # パスワードフィールドを探して入力
-        element, _ = self.wait_for_any_element(password_selectors, timeout=5)
+        element, _ = self.wait_for_any_element(password_selectors, timeout=5, key="password")
         if not element:
             print("パスワードフィールドが見つかりませんでした。")
             self.update_status("パスワードフィールドが見つかりません", "error")
@@ -1417,7 +2053,7 @@ class MapCameraAutomation:
 
         # 次へボタンをクリック
         if not self.handle_element_action(
-                next_button_selectors, "click", timeout=5, retries=3):
+                next_button_selectors, "click", timeout=5, retries=3, key="password_next_button"):
             self.update_status("次へボタンが見つかりませんでした", "error")
             return False
 
@@ -1433,7 +2069,7 @@ class MapCameraAutomation:
 
                 if "payment1" in self.driver.current_url or "payment" in self.driver.current_url:
                     break
-                time.sleep(0.1)
+                self._poll("checkout", 0.1)
         except Exception:
             if self.verbose_log:
                 print("ページ遷移が確認できませんでした")
@@ -1466,7 +2102,7 @@ class MapCameraAutomation:
 
         # 代金引換ラジオボタンを選択
         if not self.handle_element_action(
-                daibiki_selectors, "click", timeout=3, retries=3):
+                daibiki_selectors, "click", timeout=3, retries=3, key="daibiki"):
             self.update_status("代金引換ボタンが見つかりません", "warning")
             # 既に選択されているかもしれないので、続行する
 
@@ -1487,7 +2123,7 @@ class MapCameraAutomation:
 
         # 次へボタンをクリック
         if not self.handle_element_action(
-                next_button_selectors, "click", timeout=5, retries=3):
+                next_button_selectors, "click", timeout=5, retries=3, key="payment_next_button"):
             self.update_status("次へボタンが見つかりませんでした", "error")
             return False
 
@@ -1551,7 +2187,7 @@ class MapCameraAutomation:
                         break
                 except:
                     pass
-                time.sleep(0.1)
+                self._poll("checkout", 0.1)
 
             if recaptcha_iframe:
                 if self.verbose_log:
@@ -1582,8 +2218,8 @@ class MapCameraAutomation:
                     except:
                         pass
 
-                    # 少し待機
-                    time.sleep(0.2)  # 0.5秒→0.2秒に短縮
+                    # 少し待機（停止リクエストで即座に中断）
+                    self._poll("checkout", 0.2)
 
                 if self.verbose_log:
                     print("メインフレームに戻ります")
@@ -1609,7 +2245,7 @@ class MapCameraAutomation:
 
         # 次へボタンをクリック
         if not self.handle_element_action(
-                next_button_selectors, "click", timeout=5, retries=3):
+                next_button_selectors, "click", timeout=5, retries=3, key="delivery_next_button"):
             self.update_status("次へボタンが見つかりませんでした", "error")
             return False
 
@@ -1618,13 +2254,31 @@ class MapCameraAutomation:
 
     @error_handler(operation="start_automation")
     def start_automation(self):
-        """現在のページから自動化を開始"""
+        """現在のページから自動化を開始（途中のステップからの再開にも対応）"""
+        tracing = self.config.get("trace_checkout", False) and self.tracer is None
+        if tracing:
+            self.start_trace()
+        try:
+            with self._trace_span("start_automation"):
+                if not self._prepare_automation():
+                    return False
+                return self.run_checkout_flow()
+        finally:
+            if tracing:
+                self.stop_trace()
+
+    def _prepare_automation(self):
+        """購入処理の準備（商品タブへの切り替え）を行う"""
+        self._mark_recording("start_automation")
+
         # 購入処理中フラグを設定
         self.purchase_in_progress = True
 
-        # 現在のタブに焦点を合わせる (変更なし)
+        # 現在のタブに焦点を合わせる
         if hasattr(self, 'product_tab'):
             self.driver.switch_to.window(self.product_tab)
+            self.tab_manager.set_role(self.product_tab, "checkout")
+            self._apply_block_profile("checkout")
         else:
             if not self.focus_on_correct_tab():
                 self.update_status("マップカメラのタブが見つかりません。マップカメラサイトを開いてください。",
@@ -1634,122 +2288,278 @@ class MapCameraAutomation:
         print("自動化を開始します")
         current_url = self.driver.current_url
         print(f"現在のURL: {current_url}")
+        return True
+
+    def _build_checkout_steps(self):
+        """購入フローのステップを定義する（並び順がページ判定の優先順）"""
+        return [
+            CheckoutStep("pointandpayment", "ポイント・支払い方法選択",
+                         matches=lambda url: "/pointandpayment" in url,
+                         action=self.handle_point_payment_page,
+                         next_step="payment", exit_timeout=5,
+                         readiness="selector:input[type='password']"),
+            CheckoutStep("payment", "支払い方法選択",
+                         matches=lambda url: "/payment1" in url or "/payment" in url,
+                         action=self.handle_payment_page,
+                         next_step="confirm", exit_timeout=0),
+            CheckoutStep("delivery", "配送情報・reCAPTCHA",
+                         matches=lambda url: "/delivery" in url,
+                         action=self.handle_recaptcha,
+                         next_step="pointandpayment", exit_timeout=5),
+            CheckoutStep("confirm", "最終確認",
+                         matches=lambda url: "/confirm" in url,
+                         action=self._finish_checkout),
+            CheckoutStep("cart", "カート",
+                         matches=lambda url: "/cart" in url,
+                         action=self._proceed_to_checkout,
+                         next_step="pointandpayment", exit_timeout=5),
+            CheckoutStep("product", "商品詳細",
+                         matches=lambda url: self.is_product_page(url) or self.is_product_page_by_content(),
+                         action=self._add_to_cart,
+                         next_step="cart", exit_timeout=0),
+        ]
+
+    def _get_checkout_step(self, name):
+        """名前から購入フローのステップを取得"""
+        if not hasattr(self, 'checkout_steps'):
+            self.checkout_steps = self._build_checkout_steps()
+        for step in self.checkout_steps:
+            if step.name == name:
+                return step
+        return None
+
+    def _detect_checkout_step(self):
+        """現在のページがどのステップかを判定する（該当なしはNone）"""
+        if not hasattr(self, 'checkout_steps'):
+            self.checkout_steps = self._build_checkout_steps()
+        current_url = self.driver.current_url
+        for step in self.checkout_steps:
+            if step.matches(current_url):
+                return step
+        return None
 
-        # 停止チェック (変更なし)
+    def _wait_for_step_exit(self, step):
+        """ステップの処理後、ページがそのステップから離れるまで待機"""
+        start_time = time.time()
+        while time.time() - start_time < step.exit_timeout:
+            if self.check_stop():
+                return False
+            try:
+                if not step.matches(self.driver.current_url):
+                    return True
+            except Exception:
+                pass
+            self._poll("checkout", 0.1)
+        return False
+
+    def run_checkout_flow(self):
+        """ページから現在のステップを判定し、そこから購入フローを実行する（結果は商品タブに記録する）"""
+        result = False
+        try:
+            result = self._run_checkout_steps()
+            return result
+        finally:
+            self._end_checkout(result)
+
+    def _run_checkout_steps(self):
+        step = self._begin_checkout()
+        if step is None:
+            return False
+
+        max_transitions = len(self.checkout_steps) * 2  # 無限ループ防止
+        for _ in range(max_transitions):
+            outcome, step = self._advance_checkout(step)
+            if step is None:
+                return outcome
+
+        return self._checkout_exhausted()
+
+    def _advance_checkout(self, step):
+        """購入フローの1ステップを実行して (結果, 次のステップ) を返す（終了した場合は次のステップがNone）
+
+        非同期コアからも1ステップずつ呼ばれる。ステップの途中でドライバーを差し替えないよう、
+        再接続はステップの終了を待つ。
+        """
+        # 停止チェック
         if self.check_stop():
             print("ユーザーリクエストにより処理を停止します")
             self.update_status("処理を停止しました", "warning")
-            return False
+            return False, None
 
-        # 商品詳細ページかどうかを確認 (変更なし)
-        if self.is_product_page(
-                current_url) or self.is_product_page_by_content():
+        with self.driver_lock:
+            # ステップを実行し、失敗または最終ステップなら終了
+            outcome = self._run_checkout_step(step)
+            if outcome is not None:
+                return outcome, None
+
+            # 完了条件を待機してから次のステップを判定
+            if step.exit_timeout > 0:
+                with self._trace_span("wait_for_step_exit", step=step.name):
+                    self._wait_for_step_exit(step)
+
+            return False, self._next_checkout_step(step)
+
+    def _begin_checkout(self):
+        """購入フローの開始ステップを判定する（対応していないページならNone）"""
+        step = self._detect_checkout_step()
+        if step is None:
+            print("対応していないページです")
+            self.update_status("対応していないページです。商品詳細ページで実行してください。", "error")
+            return None
+
+        if step.name == "product":
             print("商品詳細ページから自動化を開始します")
             self.update_status("自動購入処理を開始します...", "info")
         else:
-            print("対応していないページです")
-            self.update_status("対応していないページです。商品詳細ページで実行してください。", "error")
+            print(f"途中のステップから再開します: {step.label}")
+            self.update_status(f"「{step.label}」から購入処理を再開します...", "info")
+
+        self.step_timings = []
+        self.failed_step = None
+        self.checkout_step = None
+        self._journal_state(purchase_in_progress=True)
+        return step
+
+    def _end_checkout(self, result):
+        """購入フローの終了を記録する
+
+        途中で失敗した商品タブだけを使い終わったものとし、上限を超えたら閉じてよい候補にする。
+        最終確認画面まで進んだタブ（注文の確定待ち）や停止したタブは閉じる候補にしない。
+        """
+        # 購入処理中フラグは最終確認画面での誤メッセージ防止のため維持し、記録上だけ終了にする
+        # （再起動時に「購入処理の途中で終了しました」と警告しないため）
+        self._journal_state(purchase_in_progress=False)
+        tab = getattr(self, 'product_tab', None)
+        if tab and not result and not self.check_stop() and getattr(self, 'checkout_step', None) != "confirm":
+            self.tab_manager.finish(tab)
+
+    def _run_checkout_step(self, step):
+        """ステップを実行して所要時間を記録する（失敗ならFalse、最終ステップならTrue、続行ならNone）"""
+        print(f"ステップ開始: {step.label}")
+        self.checkout_step = step.name
+        self._record_page_weight("checkout", step.name)
+        self._trace_page()
+        step_start = time.time()
+        # ページ遷移の直後でも、ステップに必要な状態になるまでは処理を始めない
+        if not self._wait_until(lambda: self.is_page_ready(step.readiness),
+                                self.config.get("page_load_timeout", 10), interval=0.05, kind="checkout"):
+            print(f"ページの準備（{step.readiness}）を確認できませんでした。そのまま続行します")
+        if step.next_step is not None:
+            # クリックで遷移するステップは、読み込みを待たずに戻るドライバーでも
+            # 次のステップが遷移前のページで処理を始めないよう目印を付ける
+            self._mark_navigation()
+        with self.governor.active():  # ステップの実行中は待機ループを最短の間隔にする
+            with self._trace_span(f"step:{step.name}", cat="step", label=step.label):
+                result = step.action()
+        elapsed = time.time() - step_start
+        self.step_timings.append((step.name, elapsed))
+        self.metrics.histogram("checkout_step_seconds", step.name).observe(elapsed)
+        self.selector_registry.save_if_dirty()
+        print(f"ステップ「{step.label}」: {elapsed:.2f}秒")
+
+        if not result:
+            self.failed_step = step.name
+            self._clear_navigation_mark()
+            self._log_step_timings()
             return False
 
-        # *** SOLD OUT検出処理 *** (変更なし)
+        # 最終ステップなら完了
+        if step.next_step is None:
+            self._log_step_timings()
+            return True
+        return None
+
+    def _next_checkout_step(self, step):
+        """ページから次のステップを判定する（先に進めなかった場合はNone）"""
+        next_step = self._detect_checkout_step()
+        if next_step is step and step.exit_timeout > 0:
+            self._clear_navigation_mark()
+            print(f"ステップ「{step.label}」から先に進めませんでした")
+            self.update_status(f"「{step.label}」から先に進めませんでした", "error")
+            self.failed_step = step.name
+            self._log_step_timings()
+            return None
+        if next_step is None or next_step is step:
+            # ページから判定できない場合は定義済みの次のステップへ
+            next_step = self._get_checkout_step(step.next_step)
+        return next_step
+
+    def _checkout_exhausted(self):
+        """ステップ数の上限に達した場合の処理"""
+        print("購入フローのステップ数が上限を超えました")
+        self.update_status("購入処理が完了しませんでした。ページを確認してください。", "error")
+        self._log_step_timings()
+        return False
+
+    def _log_step_timings(self):
+        """各ステップの所要時間をログに出力"""
+        if not getattr(self, 'step_timings', None):
+            return
+        summary = " / ".join(
+            f"{self._get_checkout_step(name).label} {elapsed:.2f}秒"
+            for name, elapsed in self.step_timings)
+        total = sum(elapsed for _, elapsed in self.step_timings)
+        print(f"ステップ所要時間: {summary}（合計 {total:.2f}秒）")
+        if self.gui_handler and hasattr(self.gui_handler, "log"):
+            self.gui_handler.log(f"ステップ所要時間: {summary}（合計 {total:.2f}秒）")
+        self._log_page_weight_report("checkout")
+
+    def _add_to_cart(self):
+        """商品詳細ステップ: SOLD OUTを確認してカートに追加"""
         print("SOLD OUTチェックを開始")
         if self.is_sold_out():
             print("商品はSOLD OUTです")
             self.update_status("この商品はSOLD OUTです。", "warning")
             return False
 
-        # カートに追加 (変更なし)
         print("カートに追加処理を開始")
-        if self.check_stop():
-            print("ユーザーリクエストにより処理を停止します")
-            self.update_status("処理を停止しました", "warning")
-            return False
-
         self.update_status("カートに商品を追加します", "info")
         cart_button_selectors = [
             "input[name='cartPut']", "button.cart-button", "a.add-to-cart"
         ]
 
         if not self.handle_element_action(
-                cart_button_selectors, "click", timeout=5, retries=3):
+                cart_button_selectors, "click", timeout=5, retries=3, key="cart_button"):
             self.update_status("カートボタンが見つかりませんでした", "error")
             return False
         time.sleep(0.1)
+        return True
 
-        if self.check_stop():
-            print("ユーザーリクエストにより処理を停止します")
-            self.update_status("処理を停止しました", "warning")
-            return False
-
-        # ここから変更: レジに進むボタンクリックの代わりに直接URLに遷移
+    def _proceed_to_checkout(self):
+        """カートステップ: お届け先設定画面をスキップしてポイント・支払い方法選択画面へ移動"""
         print("裏技: お届け先設定画面をスキップして直接ポイント・支払い方法選択画面へ移動します")
         self.update_status("高速モード: お届け先設定画面をスキップします", "info")
 
         try:
-            # 直接ポイントと支払い方法選択画面へ移動
-            self.driver.get(
-                "https://www.mapcamera.com/ec/cart/order/pointandpayment")
-
-            # ページが完全に読み込まれるのを待機
-            WebDriverWait(self.driver, 5).until(
-                lambda d: d.execute_script(
-                    "return document.readyState") == "complete"
-            )
+            # 直接ポイントと支払い方法選択画面へ移動（パスワード入力欄が現れたら次へ進める）
+            if not self.navigate("https://www.mapcamera.com/ec/cart/order/pointandpayment",
+                                 self._get_checkout_step("pointandpayment").readiness, timeout=5):
+                raise TimeoutException("ページの読み込みが完了しませんでした")
 
             print("ポイント・支払い方法選択画面に直接移動しました")
             self.update_status("ポイント・支払い方法選択画面に移動しました", "success")
+            return True
         except Exception as e:
             self.log_error("ポイント・支払い方法選択画面への直接移動でエラー",
                            e, operation="direct_to_payment")
             self.update_status("高速移動に失敗しました。通常モードで続行します。", "warning")
 
-            # 失敗した場合は通常のフローでレジに進む
-            print("通常モード: レジに進む処理を開始")
-            self.update_status("レジに進みます", "info")
-            checkout_button_selectors = [
-                "a#checkout2", "a.checkout-button", "a[href*='checkout']",
-                "button.proceed-to-checkout"
-            ]
-
-            if not self.handle_element_action(
-                    checkout_button_selectors, "click", timeout=5, retries=3):
-                self.update_status("レジへ進むボタンが見つかりませんでした", "error")
-                return False
-            time.sleep(0.1)
-
-            # 配送情報ページでreCAPTCHA
-            print("現在のURL確認: delivery")
-            if "/delivery" in self.driver.current_url:
-                if not self.handle_recaptcha():
-                    return False
-
-        if self.check_stop():
-            print("ユーザーリクエストにより処理を停止します")
-            self.update_status("処理を停止しました", "warning")
-            return False
-
-        time.sleep(0.1)
-
-        # ポイント・支払い方法選択ページ (変更なし)
-        print("現在のURL確認: pointandpayment")
-        if "/pointandpayment" in self.driver.current_url:
-            if not self.handle_point_payment_page():
-                return False
+        # 失敗した場合は通常のフローでレジに進む（配送情報ページは次のステップで処理）
+        print("通常モード: レジに進む処理を開始")
+        self.update_status("レジに進みます", "info")
+        checkout_button_selectors = [
+            "a#checkout2", "a.checkout-button", "a[href*='checkout']",
+            "button.proceed-to-checkout"
+        ]
 
-        if self.check_stop():
-            print("ユーザーリクエストにより処理を停止します")
-            self.update_status("処理を停止しました", "warning")
+        if not self.handle_element_action(
+                checkout_button_selectors, "click", timeout=5, retries=3, key="checkout_button"):
+            self.update_status("レジへ進むボタンが見つかりませんでした", "error")
             return False
+        return True
 
-        time.sleep(0.1)
-
-        # 支払い方法選択 (変更なし)
-        print("現在の URL確認: payment1")
-        if "/payment1" in self.driver.current_url or "/payment" in self.driver.current_url:
-            if not self.handle_payment_page():
-                return False
-
-        # 自動化完了 (変更なし)
+    def _finish_checkout(self):
+        """最終確認ステップ: 注文確定はユーザーに委ねて処理を完了する"""
         print("自動化完了")
         self.update_status(
             "処理が完了しました。注文を確定する場合は画面の「注文を確定する」ボタンをクリックし、次の商品を選択する場合は商品一覧タブに切り替えてください。", "success")
@@ -1757,10 +2567,10 @@ class MapCameraAutomation:
         # 購入処理中フラグを維持（最終確認画面での誤メッセージ防止）
         # self.purchase_in_progress = True のまま保持
 
-        # タブ切り替え防止フラグを設定 (変更なし)
+        # タブ切り替え防止フラグを設定
         self.prevent_tab_switch = True
 
-        # 監視関連のフラグをリセット (変更なし)
+        # 監視関連のフラグをリセット
         if hasattr(self, 'is_monitoring'):
             self.is_monitoring = False
 
@@ -1783,8 +2593,9 @@ class MapCameraAutomation:
                         session_active = False
                         print("WebDriverセッションは既に終了しています")
 
-                    # セッションがアクティブな場合のみメッセージ消去を試みる
+                    # セッションがアクティブな場合のみメッセージ消去とリンク変換の解除を試みる
                     if session_active:
+                        self.remove_link_conversion()
                         try:
                             self.driver.execute_script("""
                                 var msg = document.getElementById('automation-message');
@@ -1796,6 +2607,21 @@ class MapCameraAutomation:
                     print(f"WebDriver状態確認中にエラー: {str(e)}")
                     # エラーが発生しても処理を続行
 
+                # 記録モードなら記録を保存
+                if self.recorder is not None:
+                    try:
+                        self.stop_recording()
+                    except Exception as e:
+                        print(f"セッション記録の保存中にエラー: {str(e)}")
+
+                # コマンドの監視スレッドと中断用の接続を終了
+                if self.watchdog is not None:
+                    self.watchdog.close()
+
+                # 正常に終了したので、次回の起動では再開しない
+                if self.journal is not None:
+                    self.journal.clear()
+
                 print("クリーンアップが完了しました")
         except Exception as e:
             print(f"クリーンアップ処理全体でエラー: {str(e)}")
@@ -1809,6 +2635,103 @@ class MapCameraAutomation:
         except:
             return False
 
+    def _recycle_tabs(self):
+        """上限を超えた使用済みタブを閉じる（商品タブの使用済みは購入フローの終了時に _end_checkout で記録する）"""
+        try:
+            protected = {getattr(self, 'list_tab', None), getattr(self, 'monitor_tab', None)}
+            closed = self.tab_manager.enforce(self.driver, protected)
+            if closed:
+                self._helper_tabs.difference_update(closed)
+                self._linkified_tabs.difference_update(closed)
+                for handle in closed:
+                    self._blocked_tabs.pop(handle, None)
+                print(f"使い終わったタブを{len(closed)}個閉じました")
+            return closed
+        except Exception as e:
+            if self.verbose_log:
+                print(f"タブの整理中にエラー: {str(e)}")
+            return []
+
+    def _apply_block_profile(self, role):
+        """現在のタブに役割のリソースブロックを設定する（自動化が開いたタブのみ、タブごとに1回）"""
+        if not self.config.get("resource_blocking", False):
+            return False
+        try:
+            handle = self.driver.current_window_handle
+            if self._blocked_tabs.get(handle) == role or not self.tab_manager.is_managed(handle):
+                return False
+
+            patterns = self.config.get("block_profiles", {}).get(role, [])
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            self._blocked_tabs[handle] = role
+            if self.verbose_log:
+                print(f"リソースブロックを設定しました（{role}: {len(patterns)}パターン）")
+            return True
+        except Exception as e:
+            if self.verbose_log:
+                print(f"リソースブロックを設定できませんでした: {str(e)}")
+            return False
+
+    def _record_page_weight(self, role, page=None):
+        """現在のページの通信量と読み込み時間をPerformance APIから取得して集計する"""
+        if not self.config.get("page_weight_report", False):
+            return None
+        try:
+            handle = self.driver.current_window_handle
+            weight = self.driver.execute_script("""
+                var nav = performance.getEntriesByType('navigation')[0];
+                var resources = performance.getEntriesByType('resource');
+                var bytes = nav ? nav.transferSize : 0;
+                for (var i = 0; i < resources.length; i++) bytes += resources[i].transferSize || 0;
+                return {bytes: bytes, resources: resources.length,
+                        load: nav ? (nav.loadEventEnd || nav.domContentLoadedEventEnd) : null};
+            """)
+        except Exception as e:
+            if self.verbose_log:
+                print(f"ページの通信量を取得できませんでした: {str(e)}")
+            return None
+        if not weight or weight.get("load") is None:
+            return None
+
+        # ブロック中のページとブロックなしのページを分けて集計する
+        profile = self._blocked_tabs.get(handle) or "none"
+        key = (role, profile, page or role)
+        stats = self.page_weights.setdefault(key, {"samples": 0, "bytes": 0, "resources": 0, "load_ms": 0.0})
+        stats["samples"] += 1
+        stats["bytes"] += weight.get("bytes") or 0
+        stats["resources"] += weight.get("resources") or 0
+        stats["load_ms"] += weight.get("load") or 0
+        return weight
+
+    def page_weight_report(self):
+        """役割・ブロックプロファイル・ページごとの平均通信量と読み込み時間"""
+        report = []
+        for (role, profile, page), stats in sorted(self.page_weights.items()):
+            samples = stats["samples"]
+            report.append({
+                "role": role,
+                "profile": profile,
+                "page": page,
+                "samples": samples,
+                "avg_kb": round(stats["bytes"] / samples / 1024, 1),
+                "avg_resources": round(stats["resources"] / samples, 1),
+                "avg_load_ms": round(stats["load_ms"] / samples),
+            })
+        return report
+
+    def _log_page_weight_report(self, role=None):
+        """通信量と読み込み時間の集計をログに出力"""
+        for row in self.page_weight_report():
+            if role and row["role"] != role:
+                continue
+            message = (f"ページ通信量（{row['role']} / ブロック: {row['profile']} / {row['page']}）: "
+                       f"平均 {row['avg_kb']}KB・{row['avg_resources']}件、"
+                       f"読み込み {row['avg_load_ms']}ms（{row['samples']}回）")
+            print(message)
+            if self.gui_handler and hasattr(self.gui_handler, "log"):
+                self.gui_handler.log(message)
+
     def safe_switch_to_tab(self, tab_handle):
         """安全にタブを切り替える（タブが存在する場合のみ）"""
         if self.tab_exists(tab_handle):
@@ -1816,7 +2739,7 @@ class MapCameraAutomation:
             return True
         return False
 
-    def monitor_page_updates(self, url=None, callback=None):
+    def monitor_page_updates(self, url=None, callback=None, start_thread=True):
         """
         指定したURLのページを監視し、更新があれば通知する
         既存のマップカメラタブを利用するよう変更
@@ -1824,7 +2747,9 @@ class MapCameraAutomation:
         Args:
             url (str, optional): 監視するURL。Noneの場合は既存のタブを使用
             callback (callable): 更新検出時に呼び出すコールバック関数
+            start_thread (bool): Falseの場合は準備のみ行い、監視ループは呼び出し側で実行する
         """
+        self._mark_recording("monitor_page_updates")
         try:
             # 現在のウィンドウハンドルを保存
             current_handle = self.driver.current_window_handle
@@ -1854,6 +2779,7 @@ class MapCameraAutomation:
                 # 新しいタブに切り替え
                 handles = self.driver.window_handles
                 monitor_tab = handles[-1]
+                self.tab_manager.register(monitor_tab, "monitor")
                 self.driver.switch_to.window(monitor_tab)
 
             if not monitor_tab:
@@ -1862,13 +2788,21 @@ class MapCameraAutomation:
                                    "error")
                 return False
 
-            # ページが完全に読み込まれるまで待機
-            WebDriverWait(self.driver, 10).until(lambda d: d.execute_script(
-                "return document.readyState") == "complete")
+            # 監視に必要な状態になるまで待機
+            if not self._wait_until(lambda: self.is_page_ready(self.config.get("monitor_readiness", "dom")), 10):
+                raise TimeoutException("監視するページの読み込みが完了しませんでした")
 
             # 初期状態の商品リスト情報を保存
             initial_products = self._get_product_list_info()
 
+            # 同じページの監視を再開する場合は前回の基準と比較する（停止中の更新も検出できる）
+            monitor_url = self.driver.current_url
+            baseline = getattr(self, 'last_check_result', None)
+            if baseline and getattr(self, 'monitor_url', None) == monitor_url:
+                print("前回の監視の基準を引き継ぎます")
+                initial_products = baseline
+            self.monitor_url = monitor_url
+
             # 設定から監視間隔を取得
             monitoring_interval = self.config.get("monitoring_interval", 10)
 
@@ -1882,14 +2816,16 @@ class MapCameraAutomation:
             self.monitor_callback = callback
             self.stop_requested = False
             self.last_check_result = initial_products
+            self._journal_state()
 
             # 元のタブに戻る
             self.driver.switch_to.window(current_handle)
 
             # 監視スレッドを開始
-            self.monitor_thread = threading.Thread(target=self._monitor_loop,
-                                                   daemon=True)
-            self.monitor_thread.start()
+            if start_thread:
+                self.monitor_thread = threading.Thread(target=self._monitor_loop,
+                                                       daemon=True)
+                self.monitor_thread.start()
 
             return True
 
@@ -1908,189 +2844,252 @@ class MapCameraAutomation:
         """バックグラウンドで監視を実行するループ - タブ切り替え問題の修正"""
         monitoring_interval = self.config.get(
             "monitoring_interval", 10)  # ここを変更
+        settle_time = self.config.get("monitor_settle_time", 1)
+        readiness = self.config.get("monitor_readiness", "dom")
+        min_wait = min(0.5, monitoring_interval)
         consecutive_errors = 0   # 連続エラー回数
-        first_successful_check = False  # 最初の正常な検出フラグ
         update_detected = False  # 更新検出フラグを追加
 
         while not self.stop_requested and hasattr(self, 'monitor_tab'):
             cycle_start_time = time.time()  # サイクル開始時間を記録
             try:
-                # 現在のタブを保存
-                try:
-                    current_handle = self.driver.current_window_handle
-                except:
-                    # 現在のタブが取得できない場合、監視タブを現在のタブとする
-                    if self.tab_exists(self.monitor_tab):
-                        current_handle = self.monitor_tab
-                    else:
-                        # 監視タブも存在しない場合は終了
-                        print("現在のタブと監視タブの両方が見つかりません。監視を終了します。")
-                        break
-
-                # ここから新しく追加するコード ↓
                 # タブ切り替え防止フラグをチェック
                 if hasattr(self, 'prevent_tab_switch') and self.prevent_tab_switch:
                     if self.verbose_log:
                         print("タブ切り替え防止フラグが有効なため、モニタリングタブへの切り替えをスキップします")
                     # タブ切り替えせずに次のサイクルへ
-                    time.sleep(monitoring_interval)
+                    self._sleep(monitoring_interval)
                     continue
-                # ここまでが新しく追加するコード ↑
 
-                # 監視タブが存在するか確認
-                if not self.tab_exists(self.monitor_tab):
-                    print("監視タブが閉じられました。監視を終了します。")
+                # リロードから更新の検出まで（監視を続けられない場合はNone）
+                updated = self._run_monitor_cycle(readiness, settle_time)
+                if updated is None:
                     break
 
-                # ===== タブ切り替え問題対応 =====
-                # 現在のタブが監視タブでない場合のみ切り替える
-                same_tab = (current_handle == self.monitor_tab)
-                if not same_tab:
-                    # 監視タブに切り替え
-                    self.driver.switch_to.window(self.monitor_tab)
+                if updated:
+                    print("商品の更新を検出しました！")
 
-                # リロードの前に一時的なフラグを保存
-                temp_js_var = f"window.__monitoring_check_{int(time.time())}"
-                self.driver.execute_script(f"{temp_js_var} = true;")
+                    # コールバック関数の呼び出し
+                    if hasattr(self, 'monitor_callback') and callable(
+                            self.monitor_callback):
+                        self.monitor_callback()
 
-                # ページをリロード
-                self.driver.refresh()
+                    # 更新検出フラグを設定
+                    update_detected = True
 
-                # ページ読み込み待機
-                try:
-                    WebDriverWait(
-                        self.driver, 10).until(lambda d: d.execute_script(
-                            "return document.readyState") == "complete")
-                    time.sleep(1)  # 追加の待機
-                except Exception as e:
-                    print(f"ページ読み込み待機でタイムアウト: {str(e)}")
-                    time.sleep(2)
-
-                # 更新の検出処理
-                # ページの商品情報を取得
-                current_data = self._get_product_list_info()
-
-                # 前回の結果と比較（初回は比較しない）
-                if hasattr(self,
-                           'last_check_result') and self.last_check_result:
-                    # 商品情報の比較ロジックを改善（一例）
-                    changes_detected = self._detect_product_changes(
-                        self.last_check_result, current_data)
-
-                    if changes_detected:
-                        print("商品の更新を検出しました！")
-
-                        # コールバック関数の呼び出し
-                        if hasattr(self, 'monitor_callback') and callable(
-                                self.monitor_callback):
-                            self.monitor_callback()
-
-                        # 更新検出フラグを設定
-                        update_detected = True
-
-                        # 商品は1日1回しか更新されないため、監視を自動停止
-                        print("商品更新が検出されたため、監視を自動停止します")
-                        self.stop_requested = True
-                        break
-
-                # 結果を記録
-                self.last_check_result = current_data
-
-                # 元のタブに戻る（監視タブと異なる場合のみ）
-                if not same_tab and self.tab_exists(current_handle):
-                    self.driver.switch_to.window(current_handle)
+                    # 商品は1日1回しか更新されないため、監視を自動停止
+                    print("商品更新が検出されたため、監視を自動停止します")
+                    self.stop_requested = True
+                    break
 
                 # エラーリセット
                 consecutive_errors = 0
 
                 # 処理にかかった時間を計算
                 elapsed_time = time.time() - cycle_start_time
+                self.metrics.gauge("monitor_cycle_seconds").set(elapsed_time)
+                self.metrics.counter("monitor_cycles").inc()
 
-                # 残りの待機時間を計算（最小0.5秒を保証）
-                remaining_wait = max(0.5, monitoring_interval - elapsed_time)
+                # 残りの待機時間を計算（監視間隔が0.5秒未満でなければ最小0.5秒を保証）
+                remaining_wait = max(min_wait, monitoring_interval - elapsed_time)
 
                 if self.verbose_log:
                     print(
                         f"監視処理時間: {elapsed_time:.2f}秒、残り待機時間: {remaining_wait:.2f}秒"
                     )
 
-                # 適切な時間だけ待機
-                time.sleep(remaining_wait)
+                # 適切な時間だけ待機（停止リクエストで即座に中断）
+                self._poll("monitor", remaining_wait)
 
             except Exception as e:
-                # エラー処理
+                # エラー処理（元のタブへは _run_monitor_cycle で戻している）
                 self.log_error("監視ループでエラーが発生", e, operation="_monitor_loop")
                 consecutive_errors += 1
 
-                try:
-                    # エラー発生時も元のタブに戻る（監視タブと異なる場合のみ）
-                    if not same_tab and current_handle and self.tab_exists(
-                            current_handle):
-                        self.driver.switch_to.window(current_handle)
-                except:
-                    pass
-
                 # 連続エラー時は待機時間を延長
                 error_wait = min(5, consecutive_errors)
-                time.sleep(error_wait)
+                self._sleep(error_wait)
 
         # 監視終了時の処理を追加
         if update_detected:
             # 1日の更新が完了したことを通知
             print("本日の商品更新は検出されました。監視を終了します。")
 
+    def _run_monitor_cycle(self, readiness, settle_time):
+        """監視の1サイクル（リロード・読み込み待機・更新の検出）を実行する（監視を続けられない場合はNone）
+
+        非同期コアからも1サイクルずつ呼ばれる。リロードから比較までの間はドライバーを差し替えない
+        （再接続はサイクルの終了を待つ）。エラーの場合は元のタブに戻してから例外を送出する。
+        """
+        cycle = None
+        with self.driver_lock, self._trace_span("monitor_cycle", cat="monitor"):
+            try:
+                # 監視タブに切り替えてリロード
+                cycle = self._reload_monitor_tab()
+                if cycle is None:
+                    return None
+
+                # ページ読み込み待機（停止リクエストで即座に中断）
+                if self._wait_until(lambda: self.is_page_ready(readiness), 10):
+                    self._sleep(settle_time)  # 追加の待機
+                else:
+                    print("ページ読み込み待機でタイムアウト")
+                    self._sleep(2)
+
+                # 更新の検出処理
+                return self._check_monitor_updates(*cycle)
+            except Exception:
+                self._restore_tab_after_monitor(cycle)
+                raise
+
+    def _reload_monitor_tab(self):
+        """監視タブに切り替えてリロードする（監視を続けられない場合はNone）"""
+        # 現在のタブを保存
+        try:
+            current_handle = self.driver.current_window_handle
+        except:
+            # 現在のタブが取得できない場合、監視タブを現在のタブとする
+            if self.tab_exists(self.monitor_tab):
+                current_handle = self.monitor_tab
+            else:
+                # 監視タブも存在しない場合は終了
+                print("現在のタブと監視タブの両方が見つかりません。監視を終了します。")
+                return None
+
+        # 監視タブが存在するか確認
+        if not self.tab_exists(self.monitor_tab):
+            print("監視タブが閉じられました。監視を終了します。")
+            return None
+
+        # ===== タブ切り替え問題対応 =====
+        # 現在のタブが監視タブでない場合のみ切り替える
+        same_tab = (current_handle == self.monitor_tab)
+        if not same_tab:
+            # 監視タブに切り替え
+            self.driver.switch_to.window(self.monitor_tab)
+
+        # 監視タブは画像などを読み込まない（次のリロードから有効）
+        self._apply_block_profile("monitor")
+
+        # リロードの前に一時的なフラグを保存
+        temp_js_var = f"window.__monitoring_check_{int(time.time())}"
+        self.driver.execute_script(f"{temp_js_var} = true; {NAVIGATION_MARKER_JS}")
+
+        # ページをリロード
+        self.driver.refresh()
+        return current_handle, same_tab
+
+    def navigate(self, url=None, readiness="load", timeout=None):
+        """ページを開き（urlがNoneならリロード）、readiness の状態になるまで待つ（なればTrue）
+
+        ページ読み込み戦略が none のドライバーは読み込みを待たずに戻るため、
+        ページごとに必要な状態（すべての読み込み・DOMの構築・特定の要素）だけを待てる。
+        """
+        if url is None:
+            return self._navigate(self.driver.refresh, None, "リロード", readiness, timeout)
+        return self._navigate(lambda: self.driver.get(url), url, url, readiness, timeout)
+
+    def navigate_back(self, readiness="dom", timeout=None):
+        """ブラウザの「戻る」で前のページに戻り、readiness の状態になるまで待つ（なればTrue）"""
+        ready = self._navigate(self.driver.back, None, "戻る", readiness, timeout)
+        if not ready:
+            # 履歴がなく遷移しなかった場合に備えて目印を外す
+            self._clear_navigation_mark()
+        return ready
+
+    def _navigate(self, go, url, label, readiness, timeout):
+        """go() で遷移し、新しいドキュメントが readiness の状態になるまで待つ"""
+        timeout = timeout or self.config.get("page_load_timeout", 10)
+        start_time = time.time()
+        self._mark_navigation(url)
+        try:
+            go()
+        except Exception:
+            # 遷移しなかった場合は目印を外す（付けたままだと準備完了にならない）
+            self._clear_navigation_mark()
+            raise
+
+        ready = self._wait_until(lambda: self.is_page_ready(readiness), timeout, interval=0.05)
+        elapsed = time.time() - start_time
+        self.metrics.histogram("navigation_seconds", readiness.split(":")[0]).observe(elapsed)
+        if not ready:
+            print(f"ページの準備（{readiness}）が{timeout}秒以内に確認できませんでした: {label}")
+        elif self.verbose_log:
+            print(f"ページの準備（{readiness}）まで{elapsed:.2f}秒: {label}")
+        return ready
+
+    def _mark_navigation(self, url=None):
+        """遷移前のドキュメントに目印を付ける（フラグメントだけの移動はドキュメントが変わらないので付けない）"""
+        try:
+            if url is not None and "#" in url:
+                if url.split("#")[0] == self.driver.current_url.split("#")[0]:
+                    return
+            self.driver.execute_script(NAVIGATION_MARKER_JS)
+        except Exception:
+            pass
+
+    def _clear_navigation_mark(self):
+        """遷移しなかったドキュメントから目印を外す（付けたままだと準備完了にならない）"""
+        try:
+            self.driver.execute_script("delete document.__mcNavigating;")
+        except Exception:
+            pass
+
+    def is_page_ready(self, readiness="load"):
+        """現在のページが readiness の状態になっているか"""
+        return bool(self.driver.execute_script(readiness_script(readiness)))
+
+    def _check_monitor_updates(self, current_handle, same_tab):
+        """リロード後の商品情報を前回と比較する（更新があればTrue、なければ元のタブに戻る）"""
+        self._record_page_weight("monitor")
+
+        # ページの商品情報を取得
+        current_data = self._get_product_list_info()
+
+        # 前回の結果と比較（初回は比較しない）
+        if hasattr(self,
+                   'last_check_result') and self.last_check_result:
+            if self._detect_product_changes(self.last_check_result, current_data):
+                return True
+
+        # 結果を記録（件数かダイジェストが変わった場合のみ保存される）
+        self.last_check_result = current_data
+        self._journal_state()
+
+        # 元のタブに戻る（監視タブと異なる場合のみ）
+        if not same_tab and self.tab_exists(current_handle):
+            self.driver.switch_to.window(current_handle)
+        return False
+
+    def _restore_tab_after_monitor(self, cycle):
+        """監視サイクルでエラーが発生した場合に元のタブに戻る"""
+        try:
+            if cycle is None:
+                return
+            current_handle, same_tab = cycle
+            # 監視タブと異なる場合のみ
+            if not same_tab and current_handle and self.tab_exists(
+                    current_handle):
+                self.driver.switch_to.window(current_handle)
+        except:
+            pass
+
     def _get_product_list_info(self):
-        """商品リストの情報を取得"""
+        """商品リストの情報を取得（ダイジェストを先に取得し、変わった商品の詳細だけを転送する）"""
         try:
-            # MapCameraサイトの構造に基づいてDOM操作
-            product_data = self.driver.execute_script("""
-                var result = {
-                    count: 0,
-                    items: []
-                };
-                
-                // 商品リストコンテナを取得
-                var container = document.querySelector('ul.srcitemlist');
-                if (!container) return result;
-                
-                // 商品アイテムを取得
-                var items = container.querySelectorAll('li.item_wrap');
-                result.count = items.length;
-                
-                // 最初の10件のみ処理（パフォーマンス向上）
-                for (var i = 0; i < Math.min(10, items.length); i++) {
-                    var item = items[i];
-                    
-                    // 商品ID
-                    var id = item.getAttribute('data-mapcode') || '';
-                    
-                    // 商品名
-                    var nameElem = item.querySelector('.txt > a');
-                    var name = nameElem ? nameElem.textContent.trim() : '';
-                    
-                    // 価格情報
-                    var priceElem = item.querySelector('.price > span > span > b');
-                    var price = priceElem ? priceElem.textContent.trim() : '';
-                    
-                    // SOLD OUT状態
-                    var soldOutElem = item.querySelector('.price');
-                    var isSoldOut = soldOutElem ? soldOutElem.textContent.includes('SOLD OUT') : false;
-                    
-                    // 商品リンク
-                    var linkElem = item.querySelector('.itembox > a');
-                    var link = linkElem ? linkElem.getAttribute('href') : '';
-                    
-                    result.items.push({
-                        id: id,
-                        name: name,
-                        price: price,
-                        soldOut: isSoldOut,
-                        link: link
-                    });
-                }
-                
-                return result;
-            """)
+            snapshot = getattr(self, '_list_snapshot', None)
+            previous_digest = snapshot["digest"] if snapshot else None
+            digest_data = self._call_helper("listDigest", previous_digest)
+
+            if digest_data is None:
+                # ダイジェストに対応していないページでは全件を取得
+                product_data = self._call_helper("listInfo") or {"count": 0, "items": []}
+            elif digest_data.get("unchanged"):
+                # 前回から変化なし（転送はダイジェストのみ）
+                product_data = {"count": snapshot["count"], "items": snapshot["items"],
+                                "digest": snapshot["digest"]}
+            else:
+                product_data = self._update_list_snapshot(snapshot, digest_data)
 
             # タイムスタンプを追加
             product_data['timestamp'] = time.time()
@@ -2100,9 +3099,52 @@ class MapCameraAutomation:
             self.log_error("商品リスト取得エラー", e, operation="_get_product_list_info")
             return {"count": 0, "items": [], "timestamp": time.time()}
 
+    def _update_list_snapshot(self, snapshot, digest_data):
+        """商品ごとのダイジェストを前回と比べ、変わった商品の詳細だけを取得してキャッシュを更新"""
+        cached = snapshot["by_id"] if snapshot else {}
+        entries = digest_data.get("items") or []
+
+        changed_ids = [item_id for item_id, digest in entries
+                       if item_id not in cached or cached[item_id][0] != digest]
+        fetched = (self._call_helper("listItems", changed_ids) or {}) if changed_ids else {}
+
+        by_id = {}
+        items = []
+        for item_id, digest in entries:
+            if item_id in fetched:
+                item = fetched[item_id]
+            elif item_id in cached and cached[item_id][0] == digest:
+                item = cached[item_id][1]
+            elif item_id in cached:
+                # 取得中にページが変わった商品は前回の内容のまま比較し、次回のサイクルで取得し直す
+                # （IDだけの仮の内容と比べると、名前や価格が消えたように見えて誤検出になる）
+                digest, item = None, cached[item_id][1]
+            else:
+                # 新しい商品はIDだけでも追加として検出できる。詳細は次回のサイクルで取得し直す
+                digest, item = None, {"id": item_id}
+            by_id[item_id] = (digest, item)
+            items.append(item)
+
+        if self.verbose_log:
+            print(f"商品一覧のダイジェストが変化: {len(changed_ids)}/{len(entries)}件の詳細を取得")
+
+        # 取得し損ねた商品がある場合は次回もダイジェストを比較する
+        complete = all(digest is not None for digest, _ in by_id.values())
+        self._list_snapshot = {
+            "digest": digest_data.get("digest") if complete else None,
+            "count": digest_data.get("count", len(entries)),
+            "items": items,
+            "by_id": by_id,
+        }
+        return {"count": self._list_snapshot["count"], "items": items, "digest": digest_data.get("digest")}
+
     def _detect_product_changes(self, previous_data, current_data):
         """前回と今回の商品リスト情報を比較して変更を検出する"""
         try:
+            # 一覧全体のダイジェストが同じなら変化なし
+            if previous_data.get('digest') and previous_data.get('digest') == current_data.get('digest'):
+                return False
+
             # 基本的な比較（商品数の変化）
             if previous_data.get('count', 0) != current_data.get('count', 0):
                 if self.verbose_log:
@@ -2121,6 +3163,13 @@ class MapCameraAutomation:
             prev_items = previous_data.get('items', [])
             curr_items = current_data.get('items', [])
 
+            # 再開時に復元した基準（件数とダイジェストのみ）は、ダイジェストの違いを更新とみなす
+            # （停止中に商品数を変えずに入れ替わった一覧を見逃さない）
+            if not prev_items and previous_data.get('digest') and current_data.get('digest'):
+                if self.verbose_log:
+                    print(f"一覧のダイジェストの変化を検出: {previous_data['digest']} -> {current_data['digest']}")
+                return True
+
             # 商品が1つもない場合はスキップ
             if not prev_items or not curr_items:
                 return False
@@ -2163,67 +3212,6 @@ class MapCameraAutomation:
         self.password = password
         return True
 
-    def _get_product_list_info(self):
-        """商品リストの情報を取得"""
-        try:
-            # MapCameraサイトの構造に基づいてDOM操作
-            product_data = self.driver.execute_script("""
-                var result = {
-                    count: 0,
-                    items: []
-                };
-                
-                // 商品リストコンテナを取得
-                var container = document.querySelector('ul.srcitemlist');
-                if (!container) return result;
-                
-                // 商品アイテムを取得
-                var items = container.querySelectorAll('li.item_wrap');
-                result.count = items.length;
-                
-                // 最初の10件のみ処理（パフォーマンス向上）
-                for (var i = 0; i < Math.min(10, items.length); i++) {
-                    var item = items[i];
-                    
-                    // 商品ID
-                    var id = item.getAttribute('data-mapcode') || '';
-                    
-                    // 商品名
-                    var nameElem = item.querySelector('.txt > a');
-                    var name = nameElem ? nameElem.textContent.trim() : '';
-                    
-                    // 価格情報
-                    var priceElem = item.querySelector('.price > span > span > b');
-                    var price = priceElem ? priceElem.textContent.trim() : '';
-                    
-                    // SOLD OUT状態
-                    var soldOutElem = item.querySelector('.price');
-                    var isSoldOut = soldOutElem ? soldOutElem.textContent.includes('SOLD OUT') : false;
-                    
-                    // 商品リンク
-                    var linkElem = item.querySelector('.itembox > a');
-                    var link = linkElem ? linkElem.getAttribute('href') : '';
-                    
-                    result.items.push({
-                        id: id,
-                        name: name,
-                        price: price,
-                        soldOut: isSoldOut,
-                        link: link
-                    });
-                }
-                
-                return result;
-            """)
-
-            # タイムスタンプを追加
-            product_data['timestamp'] = time.time()
-
-            return product_data
-        except Exception as e:
-            self.log_error("商品リスト取得エラー", e, operation="_get_product_list_info")
-            return {"count": 0, "items": [], "timestamp": time.time()}
-
     def stop_monitoring(self, async_mode=True):
         """ページ監視を停止する（強化版）"""
         try:
@@ -2242,6 +3230,10 @@ class MapCameraAutomation:
 
                 # すべての監視関連変数を明示的にリセット
                 self._reset_monitoring_state()
+
+                # 監視を停止したので、保存したセッション状態も消す
+                if self.journal is not None:
+                    self.journal.clear()
                 return True
         except Exception as e:
             self.log_error("監視停止でエラーが発生", e, operation="stop_monitoring")
@@ -2249,8 +3241,13 @@ class MapCameraAutomation:
 
     def _reset_monitoring_state(self):
         """監視関連の状態を完全にリセットする"""
+        # 監視タブは使い終わったものとして扱う（自動化が開いたタブのみ閉じる対象になる）
+        if hasattr(self, 'monitor_tab'):
+            self.tab_manager.finish(self.monitor_tab)
+            self._log_page_weight_report("monitor")
+
         # 監視関連の属性をクリア
-        for attr in ['monitor_tab', 'monitor_url', 'last_check_result',
+        for attr in ['monitor_tab', 'monitor_url', 'last_check_result', '_list_snapshot',
                      'monitor_callback', 'monitor_thread', 'is_monitoring']:
             if hasattr(self, attr):
                 delattr(self, attr)
@@ -2263,8 +3260,12 @@ class MapCameraAutomation:
 
     def _cleanup_monitoring_resources(self):
         """監視リソースをクリーンアップする（拡張版）"""
+        if hasattr(self, 'monitor_tab'):
+            self.tab_manager.finish(self.monitor_tab)
+
         # 監視関連の属性をクリア（既存の処理）
-        for attr in ['monitor_tab', 'monitor_url', 'last_check_result', 'monitor_callback', 'monitor_thread']:
+        for attr in ['monitor_tab', 'monitor_url', 'last_check_result', '_list_snapshot',
+                     'monitor_callback', 'monitor_thread']:
             if hasattr(self, attr):
                 delattr(self, attr)
 
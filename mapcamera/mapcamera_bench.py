@@ -0,0 +1,431 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from mapcamera_fake_driver import FakeDriver, FakeElement, FakePage
+
+
+# 文字化け対策
+if hasattr(sys, 'stdout') and sys.stdout is not None:
+    if hasattr(sys.stdout, 'encoding') and sys.stdout.encoding != 'utf-8':
+        if hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(encoding='utf-8')
+
+
+LIST_URL = "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result"
+PRODUCT_URL = "https://www.mapcamera.com/item/3717009999999"
+
+# マイクロベンチマークの履歴ファイル（1回の実行を1行のJSONで追記）
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mapcamera_bench_history.jsonl")
+
+
+def list_items(count, offset=0):
+    """商品一覧の listInfo 結果を作成"""
+    items = [{"id": f"item-{i + offset}", "title": f"商品{i + offset}", "price": "10,000円",
+              "soldOut": False} for i in range(count)]
+    return {"count": count, "items": items}
+
+
+def create_automation(driver, config=None, verbose=False):
+    """フェイクドライバーでMapCameraAutomationを作成"""
+    from mapcamera_automation import MapCameraAutomation
+
+    with quiet(not verbose):
+        automation = MapCameraAutomation("", verbose_log=verbose, driver=driver)
+    automation.config.update(config or {})
+    driver.reset_counts()
+    return automation
+
+
+def quiet(enabled=True):
+    """自動化クラスのコンソール出力を抑制"""
+    if enabled:
+        return contextlib.redirect_stdout(io.StringIO())
+    return contextlib.nullcontext()
+
+
+# ===== シナリオ =====
+# 各シナリオは (driver, 追加設定, 準備関数, 実行する関数, 結果の確認関数) を返す
+
+
+def scenario_find_best_tab(latency):
+    """無関係なタブが多い中から商品詳細タブを選ぶ"""
+    urls = ["about:blank"] + [f"https://example.com/page{i}" for i in range(8)]
+    urls += [LIST_URL, PRODUCT_URL]
+    driver = FakeDriver(start_urls=urls, latency=latency)
+
+    def setup():
+        driver.switch_to.window(driver.tab_order[0])
+        driver.reset_counts()
+
+    def check(automation, result):
+        return result is True and driver.current_url == PRODUCT_URL
+
+    return driver, {}, setup, lambda automation: automation.find_best_tab(), check
+
+
+def scenario_handle_element_action(latency):
+    """3番目のセレクタでのみ見つかるボタンをクリックする"""
+    clicked = []
+    button = FakeElement("input", {"type": "submit"}, on_click=lambda d: clicked.append(True))
+    pages = {PRODUCT_URL: lambda url: FakePage(url, elements={"input.submit": [button]})}
+    driver = FakeDriver(pages=pages, start_urls=[PRODUCT_URL], latency=latency)
+    selectors = ["#cartPut", "button.next", "input.submit"]
+
+    def setup():
+        clicked.clear()
+        driver.reset_counts()
+
+    def check(automation, result):
+        return result is True and len(clicked) == 1
+
+    return (driver, {}, setup,
+            lambda automation: automation.handle_element_action(selectors, "click"), check)
+
+
+def scenario_wait_for_product_click(latency):
+    """商品一覧で待機中に商品が新しいタブで開かれる"""
+    pages = {
+        LIST_URL: lambda url: FakePage(url, list_info=list_items(20)),
+        PRODUCT_URL: lambda url: FakePage(url, elements={"input[name='cartPut']": [FakeElement("input")]}),
+    }
+    driver = FakeDriver(pages=pages, start_urls=[LIST_URL], latency=latency)
+
+    def setup():
+        # 余分に開いたタブを閉じて一覧タブだけに戻す
+        for handle in driver.tab_order[1:]:
+            driver.tabs.pop(handle)
+        driver.tab_order = driver.tab_order[:1]
+        driver.current_handle = driver.tab_order[0]
+        driver.reset_counts()
+        # 数回ポーリングした後にユーザーが商品をクリックする
+        driver.schedule(30, lambda d: d.open_tab(PRODUCT_URL))
+
+    def check(automation, result):
+        return result is True and driver.tabs[automation.product_tab].page.url == PRODUCT_URL
+
+    return driver, {}, setup, lambda automation: automation.wait_for_product_click(), check
+
+
+def scenario_monitor_loop(latency):
+    """3回目のリロードで商品数が変わる一覧ページを監視する"""
+    def info(page):
+        return list_items(21 if page.refresh_count >= 3 else 20)
+
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url, list_info=info)},
+                        start_urls=[LIST_URL], latency=latency)
+    detected = []
+
+    def setup():
+        detected.clear()
+        handle = driver.tab_order[0]
+        driver.navigate_tab(handle, LIST_URL)
+        driver.reset_counts()
+
+    def run(automation):
+        automation.monitor_tab = driver.tab_order[0]
+        automation.monitor_callback = lambda: detected.append(True)
+        automation.stop_requested = False
+        automation.last_check_result = automation._get_product_list_info()
+        automation._monitor_loop()
+        return len(detected)
+
+    def check(automation, result):
+        return result == 1 and driver.tabs[automation.monitor_tab].page.refresh_count == 3
+
+    config = {"monitoring_interval": 0, "monitor_settle_time": 0}
+    return driver, config, setup, run, check
+
+
+SCENARIOS = {
+    "find_best_tab": scenario_find_best_tab,
+    "handle_element_action": scenario_handle_element_action,
+    "wait_for_product_click": scenario_wait_for_product_click,
+    "_monitor_loop": scenario_monitor_loop,
+}
+
+
+def run_scenario(name, repeat=5, latency=0.0, verbose=False):
+    """シナリオを繰り返し実行し、所要時間とコマンド数を集計"""
+    driver, config, setup, run, check = SCENARIOS[name](latency)
+    automation = create_automation(driver, config, verbose)
+
+    timings = []
+    calls = None
+    ok = True
+    for _ in range(repeat):
+        setup()
+        with quiet(not verbose):
+            start = time.perf_counter()
+            result = run(automation)
+            timings.append((time.perf_counter() - start) * 1000)
+        ok = ok and bool(check(automation, result))
+        calls = dict(driver.calls)
+
+    timings.sort()
+    return {
+        "name": name,
+        "ok": ok,
+        "repeat": repeat,
+        "latency_ms": latency * 1000,
+        "median_ms": round(timings[len(timings) // 2], 3),
+        "min_ms": round(timings[0], 3),
+        "round_trips": sum(calls.values()),
+        "calls": dict(sorted(calls.items(), key=lambda item: -item[1])),
+    }
+
+
+def print_results(results):
+    """結果を表形式で表示"""
+    print(f"{'シナリオ':<26}{'結果':<6}{'中央値(ms)':>12}{'最小(ms)':>12}{'往復数':>8}")
+    for result in results:
+        status = "OK" if result["ok"] else "NG"
+        print(f"{result['name']:<28}{status:<6}{result['median_ms']:>12.3f}"
+              f"{result['min_ms']:>12.3f}{result['round_trips']:>8}")
+        top = ", ".join(f"{name}={count}" for name, count in list(result["calls"].items())[:5])
+        print(f"    {top}")
+
+
+# ===== マイクロベンチマーク（ブラウザ不要の処理） =====
+# 各ベンチマークは (1回分の処理を行う関数, 1回あたりの件数) を返す
+
+
+def snapshot(count, offset=0, timestamp=0.0):
+    """_detect_product_changes 用の商品一覧スナップショットを作成"""
+    data = list_items(count, offset)
+    data["timestamp"] = timestamp
+    return data
+
+
+def micro_detect_changes(count):
+    """末尾の商品だけが入れ替わった一覧を比較する（全件比較になる最悪ケース）"""
+    def build():
+        automation = create_automation(FakeDriver())
+        previous = snapshot(count, timestamp=0.0)
+        current = snapshot(count, timestamp=10.0)
+        current["items"][-1] = dict(current["items"][-1], id="item-new")
+        return lambda: automation._detect_product_changes(previous, current), 1
+    return build
+
+
+def micro_url_classify():
+    """URL判定関数を様々なURLで実行する"""
+    automation = create_automation(FakeDriver())
+    urls = [LIST_URL, PRODUCT_URL, "https://www.mapcamera.com/cart",
+            "https://www.mapcamera.com/ec/order/confirm", "https://example.com/search?q=camera",
+            "about:blank"] * 50
+
+    def run():
+        for url in urls:
+            automation.is_product_list_page(url)
+            automation.is_product_page(url)
+    return run, len(urls)
+
+
+def micro_status_format():
+    """ログの整形とファイルへの追記"""
+    from mapcamera_gui import Logger
+
+    log_file = os.path.join(tempfile.mkdtemp(prefix="mapcamera_bench_"), "bench_log.txt")
+    logger = Logger(log_file=log_file)
+    messages = ["商品一覧ページです。購入したい商品をクリックしてください。",
+                "ステータス: 商品ページを検出しました。購入処理を開始します...",
+                "停止リクエストから処理終了まで: 12ミリ秒"] * 10
+
+    def run():
+        with quiet():
+            for message in messages:
+                logger.info(message)
+    return run, len(messages)
+
+
+def write_sample_config():
+    """ベンチマーク用の設定ファイルを作成"""
+    path = os.path.join(tempfile.mkdtemp(prefix="mapcamera_bench_"), "mapcamera_config.json")
+    config = {"chrome_path": "chrome.exe", "debug_port": "9222", "verbose_log": False,
+              "monitoring_interval": 10, "page_load_timeout": 20, "script_timeout": 15}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    return path
+
+
+def micro_load_config():
+    """自動化クラスの設定読み込みとデフォルト値のマージ"""
+    automation = create_automation(FakeDriver())
+    path = write_sample_config()
+
+    def run():
+        with quiet():
+            automation.load_config(path)
+    return run, 1
+
+
+def micro_config_manager_load():
+    """GUIの設定読み込みとデフォルト値のマージ"""
+    from mapcamera_gui import ConfigManager
+
+    manager = ConfigManager(write_sample_config())
+    return manager.load, 1
+
+
+MICRO_BENCHMARKS = {
+    "detect_changes[10]": micro_detect_changes(10),
+    "detect_changes[100]": micro_detect_changes(100),
+    "detect_changes[1000]": micro_detect_changes(1000),
+    "detect_changes[10000]": micro_detect_changes(10000),
+    "url_classify": micro_url_classify,
+    "status_format": micro_status_format,
+    "load_config": micro_load_config,
+    "ConfigManager.load": micro_config_manager_load,
+}
+
+
+def run_micro(name, repeat=5, min_time=0.05):
+    """マイクロベンチマークを実行し、1件あたりの最小所要時間（マイクロ秒）を返す"""
+    run, items = MICRO_BENCHMARKS[name]()
+
+    # 1回の計測が min_time 秒以上になるよう実行回数を決める
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 100000:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        timings.append((time.perf_counter() - start) / (number * items) * 1e6)
+    return round(min(timings), 4)
+
+
+def load_history(path):
+    """履歴ファイルを読み込む"""
+    history = []
+    if not os.path.exists(path):
+        return history
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    history.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return history
+
+
+def find_regressions(results, history, threshold, window=5):
+    """直近の履歴の中央値と比べて threshold 倍以上遅くなった項目を返す"""
+    regressions = []
+    for name, value in results.items():
+        previous = [entry["results"][name] for entry in history[-window:]
+                    if name in entry.get("results", {})]
+        if not previous:
+            continue
+        baseline = statistics.median(previous)
+        if baseline > 0 and value > baseline * threshold:
+            regressions.append({"name": name, "baseline_us": baseline, "current_us": value,
+                                "ratio": round(value / baseline, 2)})
+    return regressions
+
+
+def run_micro_suite(names, repeat, history_file, threshold, save=True):
+    """マイクロベンチマークを実行し、履歴との比較と記録を行う"""
+    history = load_history(history_file)
+    results = {name: run_micro(name, repeat) for name in names}
+    regressions = find_regressions(results, history, threshold)
+
+    if save:
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+            "regressions": [item["name"] for item in regressions],
+        }
+        with open(history_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    return results, regressions
+
+
+def print_micro_results(results, regressions):
+    """マイクロベンチマークの結果を表示"""
+    flagged = {item["name"]: item for item in regressions}
+    print(f"{'ベンチマーク':<26}{'1件あたり(µs)':>16}{'基準値(µs)':>14}")
+    for name, value in results.items():
+        item = flagged.get(name)
+        baseline = f"{item['baseline_us']:>14.4f}  <- {item['ratio']}倍に悪化" if item else ""
+        print(f"{name:<30}{value:>16.4f}{baseline}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="フェイクドライバーとブラウザ不要の処理のベンチマークを実行します")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    loops_parser = subparsers.add_parser("loops", help="フェイクドライバーで自動化ループを計測")
+    loops_parser.add_argument("scenarios", nargs="*",
+                              help=f"実行するシナリオ（省略時はすべて）: {', '.join(SCENARIOS)}")
+    loops_parser.add_argument("--repeat", type=int, default=5)
+    loops_parser.add_argument("--latency", type=float, default=0.0,
+                              help="1コマンドあたりの疑似遅延（ミリ秒）")
+    loops_parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    loops_parser.add_argument("--verbose", action="store_true", help="自動化クラスの出力を表示")
+
+    micro_parser = subparsers.add_parser("micro", help="ブラウザ不要の処理を計測して履歴と比較")
+    micro_parser.add_argument("benchmarks", nargs="*",
+                              help=f"実行するベンチマーク（省略時はすべて）: {', '.join(MICRO_BENCHMARKS)}")
+    micro_parser.add_argument("--repeat", type=int, default=5)
+    micro_parser.add_argument("--history", default=HISTORY_FILE, help="結果を追記する履歴ファイル（JSON Lines）")
+    micro_parser.add_argument("--threshold", type=float, default=1.5,
+                              help="直近の中央値の何倍を超えたら悪化とみなすか")
+    micro_parser.add_argument("--no-save", action="store_true", help="結果を履歴に記録しない")
+    micro_parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "micro":
+        names = args.benchmarks or list(MICRO_BENCHMARKS)
+        unknown = [name for name in names if name not in MICRO_BENCHMARKS]
+        if unknown:
+            parser.error(f"不明なベンチマーク: {', '.join(unknown)}")
+        results, regressions = run_micro_suite(names, args.repeat, args.history,
+                                               args.threshold, save=not args.no_save)
+        if args.json:
+            print(json.dumps({"results": results, "regressions": regressions},
+                             ensure_ascii=False, indent=2))
+        else:
+            print_micro_results(results, regressions)
+        # 基準値より悪化した項目があれば失敗
+        return 1 if regressions else 0
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"不明なシナリオ: {', '.join(unknown)}")
+    results = [run_scenario(name, args.repeat, args.latency / 1000, args.verbose) for name in names]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+
+    # 期待した結果にならなかったシナリオがあれば失敗
+    return 0 if all(result["ok"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+import itertools
+import json
+import threading
+import time
+import urllib.request
+
+from selenium.common.exceptions import (JavascriptException, NoSuchElementException, NoSuchFrameException,
+                                        NoSuchWindowException, StaleElementReferenceException, TimeoutException,
+                                        WebDriverException)
+from selenium.webdriver.common.by import By
+
+
+# ページの読み込み完了を確認する間隔（秒）
+LOAD_POLL_INTERVAL = 0.05
+
+
+class CdpConnection:
+    """ブラウザ全体のDevToolsプロトコル用WebSocket接続（1本の接続で全タブを操作する）"""
+
+    def __init__(self, ws_url, timeout=30):
+        # websocket-clientはCDPエンジンを使う場合のみ必要
+        import websocket
+
+        # Originヘッダーを送るとChromeに接続を拒否されるため送らない
+        self.ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True)
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.listeners = {}  # イベント名 -> コールバックのリスト
+
+    def send(self, method, params=None, session_id=None, timeout=None):
+        """コマンドを送信して結果を待つ（待機中に届いたイベントはリスナーに渡す）"""
+        message = {"id": next(self._ids), "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+
+        with self._lock:
+            self.ws.settimeout(timeout or self.timeout)
+            self.ws.send(json.dumps(message))
+            while True:
+                response = self._recv(method)
+                if response.get("id") == message["id"]:
+                    break
+                if "method" in response:
+                    self._dispatch(response)
+
+        if "error" in response:
+            error = response["error"]
+            raise CdpError(method, error.get("code"), error.get("message", ""), error.get("data"))
+        return response.get("result", {})
+
+    def wait_for_event(self, method, timeout=None):
+        """指定したイベントが届くまで待ってパラメータを返す（待機中に届いたイベントもリスナーに渡す）"""
+        end_time = time.time() + (timeout or self.timeout)
+        with self._lock:
+            while True:
+                remaining = end_time - time.time()
+                if remaining <= 0:
+                    raise TimeoutException(f"DevToolsのイベントが届きません: {method}")
+                self.ws.settimeout(remaining)
+                event = self._recv(method)
+                if "method" in event:
+                    self._dispatch(event)
+                    if event["method"] == method:
+                        return event.get("params", {})
+
+    def _recv(self, method):
+        try:
+            return json.loads(self.ws.recv())
+        except Exception as e:
+            if type(e).__name__ == "WebSocketTimeoutException":
+                raise TimeoutException(f"DevToolsの応答がありません: {method}")
+            raise WebDriverException(f"DevToolsとの通信エラー: {str(e)}")
+
+    def _dispatch(self, event):
+        """イベントを登録されたコールバックに渡す"""
+        for callback in list(self.listeners.get(event["method"], [])):
+            try:
+                callback(event.get("params", {}), event.get("sessionId"))
+            except Exception as e:
+                print(f"DevToolsイベント処理エラー: {str(e)}")
+
+    def close(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class CdpError(WebDriverException):
+    """DevToolsプロトコルのエラー応答"""
+
+    def __init__(self, method, code, message, data=None):
+        super().__init__(f"{method}: {message}" + (f" ({data})" if data else ""))
+        self.method = method
+        self.code = code
+        self.cdp_message = message
+
+
+class CdpElement:
+    """DevToolsのリモートオブジェクトとしてのDOM要素"""
+
+    def __init__(self, driver, object_id, session_id, context_id=None):
+        self._driver = driver
+        self.object_id = object_id
+        self.session_id = session_id
+        self.context_id = context_id
+
+    @property
+    def id(self):
+        return self.object_id
+
+    def _call(self, function, *args):
+        return self._driver._call_function(self.object_id, function, args, self.session_id)
+
+    def click(self):
+        self._call("function() { this.scrollIntoView({block: 'center'}); this.click(); }")
+
+    def clear(self):
+        self._call("function() { this.focus(); this.value = '';"
+                   " this.dispatchEvent(new Event('input', {bubbles: true})); }")
+
+    def send_keys(self, value):
+        # フォーカスしてから実際の入力と同じinputイベントを発生させる
+        self._call("function() { this.focus(); }")
+        self._driver.execute("Input.insertText", {"text": str(value)}, session_id=self.session_id)
+
+    def get_attribute(self, name):
+        return self._call("function(name) {"
+                          " if (name in this && typeof this[name] !== 'object' && typeof this[name] !== 'function')"
+                          " return this[name] === null ? null : String(this[name]);"
+                          " return this.getAttribute(name); }", name)
+
+    def is_displayed(self):
+        return bool(self._call("function() { var style = window.getComputedStyle(this);"
+                               " return style.visibility !== 'hidden' && style.display !== 'none'"
+                               " && this.getClientRects().length > 0; }"))
+
+    def is_enabled(self):
+        return not self._call("function() { return !!this.disabled; }")
+
+    @property
+    def text(self):
+        return self._call("function() { return this.innerText || ''; }")
+
+    @property
+    def tag_name(self):
+        return self._call("function() { return this.tagName.toLowerCase(); }")
+
+
+class CdpSwitchTo:
+    """driver.switch_to の代替"""
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        self._driver._switch_to_target(handle)
+
+    def frame(self, frame):
+        self._driver._switch_to_frame(frame)
+
+    def default_content(self):
+        self._driver._frame = None
+
+
+class CdpDriver:
+    """ChromeDriverを経由せず、DevToolsプロトコルで直接Chromeを操作するドライバー
+
+    MapCameraAutomationが使うWebDriverの機能だけを同じ名前で実装する。
+    すべてのコマンドは execute() を通るため、計測や監視のフックはここに掛ければよい。
+    """
+
+    def __init__(self, debug_port="9222", host="127.0.0.1", timeout=30, page_load_strategy="normal"):
+        self.debug_address = f"{host}:{debug_port}"
+        with urllib.request.urlopen(f"http://{self.debug_address}/json/version", timeout=5) as response:
+            version = json.loads(response.read().decode("utf-8"))
+
+        self.connection = CdpConnection(version["webSocketDebuggerUrl"], timeout)
+        self.capabilities = {"browserVersion": version.get("Browser", "")}
+        self.page_load_timeout = 10
+        self.page_load_strategy = page_load_strategy  # normal / eager / none（WebDriverと同じ意味）
+        self.script_timeout = 10
+        self._sessions = {}   # ターゲットID -> セッションID
+        self._handles = []    # 開かれた順のタブ一覧（最後が最新）
+        self._current = None
+        self._frame = None    # switch_to.frame 中のフレーム情報
+
+        # 閉じられたタブのセッションを破棄
+        self.on("Target.detachedFromTarget", self._on_detached)
+
+        handles = self.window_handles
+        if not handles:
+            raise NoSuchWindowException("操作できるタブがありません")
+        self._switch_to_target(handles[0], activate=False)
+
+    # ===== 共通処理 =====
+
+    def execute(self, method, params=None, session_id=None):
+        """DevToolsプロトコルのコマンドを実行する（すべてのコマンドの共通入口）"""
+        return self.connection.send(method, params, session_id=session_id)
+
+    def on(self, event, callback):
+        """DevToolsイベントのコールバックを登録する（callback(params, session_id)）"""
+        self.connection.listeners.setdefault(event, []).append(callback)
+
+    def _on_detached(self, params, session_id):
+        detached = params.get("sessionId")
+        for handle, session in list(self._sessions.items()):
+            if session == detached or handle == params.get("targetId"):
+                del self._sessions[handle]
+
+    def _session(self, handle=None):
+        """ターゲットのセッションIDを取得（未接続なら接続する）"""
+        handle = handle or self._current
+        if handle not in self._sessions:
+            try:
+                result = self.execute("Target.attachToTarget", {"targetId": handle, "flatten": True})
+            except CdpError as e:
+                raise NoSuchWindowException(f"no such window: {handle} ({e.cdp_message})")
+            self._sessions[handle] = result["sessionId"]
+        return self._sessions[handle]
+
+    def _page_command(self, method, params=None):
+        """現在のタブ（フレーム切り替え中はそのフレーム）に対するコマンド"""
+        session_id = self._frame["session"] if self._frame else self._session()
+        try:
+            return self.execute(method, params, session_id=session_id)
+        except CdpError as e:
+            if "session" in e.cdp_message.lower() or "target" in e.cdp_message.lower():
+                raise NoSuchWindowException(f"no such window: {self._current}")
+            raise
+
+    def _check_exception(self, result):
+        """スクリプトの例外をSeleniumと同じ例外に変換"""
+        details = result.get("exceptionDetails")
+        if details:
+            exception = details.get("exception", {})
+            raise JavascriptException(exception.get("description") or details.get("text", "JavaScript error"))
+        return result.get("result", {})
+
+    def _evaluate(self, expression, return_by_value=True):
+        params = {"expression": expression, "returnByValue": return_by_value, "awaitPromise": True}
+        if self._frame and self._frame.get("context"):
+            params["contextId"] = self._frame["context"]
+        result = self._check_exception(self._page_command("Runtime.evaluate", params))
+        return result.get("value") if return_by_value else result
+
+    def _call_function(self, object_id, function, args, session_id=None):
+        """オブジェクトをthisとして関数を実行し、値を返す"""
+        arguments = [{"objectId": arg.object_id} if isinstance(arg, CdpElement) else {"value": arg}
+                     for arg in args]
+        try:
+            result = self.execute("Runtime.callFunctionOn", {
+                "objectId": object_id, "functionDeclaration": function, "arguments": arguments,
+                "returnByValue": True, "awaitPromise": True,
+            }, session_id=session_id or self._session())
+        except CdpError as e:
+            if "object" in e.cdp_message.lower() or "context" in e.cdp_message.lower():
+                raise StaleElementReferenceException(f"stale element reference: {e.cdp_message}")
+            raise
+        return self._check_exception(result).get("value")
+
+    def _mark_document(self):
+        """現在のドキュメントに目印を付ける（遷移後の新しいドキュメントと区別するため）"""
+        try:
+            self._evaluate("document.__mcPrevious = true")
+        except (JavascriptException, CdpError):
+            pass
+
+    def _wait_for_new_document(self, timeout=None):
+        """目印のない新しいドキュメントの読み込みを page_load_strategy に従って待つ（none なら待たない）"""
+        if self.page_load_strategy == "none":
+            return True
+        condition = ("document.readyState !== 'loading'" if self.page_load_strategy == "eager"
+                     else "document.readyState === 'complete'")
+        timeout = timeout or self.page_load_timeout
+        end_time = time.time() + timeout
+        while time.time() < end_time:
+            try:
+                if self._evaluate("!document.__mcPrevious && " + condition):
+                    return True
+            except (JavascriptException, CdpError):
+                # ナビゲーション中はコンテキストが破棄されるため再試行
+                pass
+            time.sleep(LOAD_POLL_INTERVAL)
+        raise TimeoutException(f"ページの読み込みが{timeout}秒以内に完了しませんでした")
+
+    # ===== タブ =====
+
+    @property
+    def window_handles(self):
+        targets = self.execute("Target.getTargets")["targetInfos"]
+        pages = [t["targetId"] for t in targets
+                 if t["type"] == "page" and not t["url"].startswith("devtools://")]
+
+        # 開かれた順を維持する（getTargetsは新しい順に返すため逆順で追加）
+        alive = set(pages)
+        self._handles = [h for h in self._handles if h in alive]
+        self._handles.extend(h for h in reversed(pages) if h not in self._handles)
+        return list(self._handles)
+
+    @property
+    def current_window_handle(self):
+        self._target_info()
+        return self._current
+
+    def _target_info(self, handle=None):
+        handle = handle or self._current
+        try:
+            return self.execute("Target.getTargetInfo", {"targetId": handle})["targetInfo"]
+        except CdpError:
+            raise NoSuchWindowException(f"no such window: {handle}")
+
+    def _switch_to_target(self, handle, activate=True):
+        self._session(handle)
+        self._current = handle
+        self._frame = None
+        if activate:
+            self.activate(handle)
+
+    def activate(self, handle=None):
+        """タブを前面に表示する"""
+        self.execute("Target.activateTarget", {"targetId": handle or self._current})
+
+    def _switch_to_frame(self, frame):
+        """iframe要素に切り替える（別プロセスのiframeはそのターゲットに接続する）"""
+        if not isinstance(frame, CdpElement):
+            raise NoSuchFrameException("iframe要素を指定してください")
+
+        node = self.execute("DOM.describeNode", {"objectId": frame.object_id},
+                            session_id=frame.session_id)["node"]
+        frame_id = node.get("frameId")
+        if not frame_id:
+            raise NoSuchFrameException("指定された要素はiframeではありません")
+
+        targets = self.execute("Target.getTargets")["targetInfos"]
+        if any(t["targetId"] == frame_id and t["type"] == "iframe" for t in targets):
+            self._frame = {"session": self._session(frame_id)}
+        else:
+            world = self.execute("Page.createIsolatedWorld", {"frameId": frame_id},
+                                 session_id=frame.session_id)
+            self._frame = {"session": frame.session_id, "context": world["executionContextId"]}
+
+    @property
+    def switch_to(self):
+        return CdpSwitchTo(self)
+
+    def close(self):
+        handle = self._current
+        self.execute("Target.closeTarget", {"targetId": handle})
+        self._sessions.pop(handle, None)
+        if handle in self._handles:
+            self._handles.remove(handle)
+
+    # ===== ページ =====
+
+    @property
+    def current_url(self):
+        if self._frame:
+            return self._evaluate("location.href")
+        return self._target_info()["url"]
+
+    @property
+    def title(self):
+        return self._target_info()["title"]
+
+    @property
+    def page_source(self):
+        return self._evaluate("document.documentElement.outerHTML")
+
+    def get(self, url):
+        self._frame = None
+        self._mark_document()
+        result = self._page_command("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise WebDriverException(f"ページを開けませんでした: {url} ({result['errorText']})")
+        # loaderIdがない場合はフラグメントのみの移動（ドキュメントは変わらない）
+        if result.get("loaderId"):
+            self._wait_for_new_document()
+
+    def refresh(self):
+        self._frame = None
+        self._mark_document()
+        self._page_command("Page.reload", {})
+        self._wait_for_new_document()
+
+    def back(self):
+        self._frame = None
+        history = self._page_command("Page.getNavigationHistory")
+        index = history["currentIndex"]
+        if index <= 0:
+            return
+
+        current_url = history["entries"][index]["url"]
+        previous = history["entries"][index - 1]
+        self._mark_document()
+        self._page_command("Page.navigateToHistoryEntry", {"entryId": previous["id"]})
+        # 同じドキュメント内の移動（フラグメントのみの違い）では読み込みは発生しない
+        if previous["url"].split("#")[0] != current_url.split("#")[0]:
+            self._wait_for_new_document()
+
+    def execute_script(self, script, *args):
+        function = "function() {\n" + script + "\n}"
+        elements = [arg for arg in args if isinstance(arg, CdpElement)]
+        if elements:
+            # 要素を引数に渡す場合は、その要素を基準に関数を呼び出す
+            return self._call_function(elements[0].object_id, function, args, elements[0].session_id)
+        return self._evaluate(f"({function}).apply(window, {json.dumps(list(args))})")
+
+    def execute_cdp_cmd(self, cmd, params):
+        return self._page_command(cmd, params)
+
+    # ===== 要素 =====
+
+    def find_elements(self, by, value):
+        if by == By.CSS_SELECTOR:
+            expression = f"Array.from(document.querySelectorAll({json.dumps(value)}))"
+        elif by == By.XPATH:
+            expression = (f"(function() {{ var r = document.evaluate({json.dumps(value)}, document, null,"
+                          " XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null); var a = [];"
+                          " for (var i = 0; i < r.snapshotLength; i++) a.push(r.snapshotItem(i)); return a; })()")
+        else:
+            raise WebDriverException(f"CDPエンジンが対応していない検索方法です: {by}")
+
+        array = self._evaluate(expression, return_by_value=False)
+        if not array.get("objectId"):
+            return []
+
+        session_id = self._frame["session"] if self._frame else self._session()
+        properties = self.execute("Runtime.getProperties", {"objectId": array["objectId"], "ownProperties": True},
+                                  session_id=session_id)["result"]
+        context_id = self._frame.get("context") if self._frame else None
+        found = [(int(p["name"]), p["value"]["objectId"]) for p in properties
+                 if p["name"].isdigit() and p.get("value", {}).get("objectId")]
+        return [CdpElement(self, object_id, session_id, context_id) for _, object_id in sorted(found)]
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"no such element: {value}")
+        return found[0]
+
+    # ===== 設定・終了 =====
+
+    def set_page_load_timeout(self, timeout):
+        self.page_load_timeout = timeout
+
+    def set_script_timeout(self, timeout):
+        self.script_timeout = timeout
+
+    def quit(self):
+        """接続を閉じる（ブラウザは終了しない）"""
+        self.connection.close()
@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+# 文字化け対策
+if hasattr(sys, 'stdout') and sys.stdout is not None:
+    if hasattr(sys.stdout, 'encoding') and sys.stdout.encoding != 'utf-8':
+        if hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(encoding='utf-8')
+if hasattr(sys, 'stderr') and sys.stderr is not None:
+    if hasattr(sys.stderr, 'encoding') and sys.stderr.encoding != 'utf-8':
+        if hasattr(sys.stderr, 'reconfigure'):
+            sys.stderr.reconfigure(encoding='utf-8')
+
+
+def get_config_path():
+    """設定ファイルのパスを取得（GUIと同じ mapcamera_config.json）"""
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, 'mapcamera_config.json')
+
+
+class EventWriter:
+    """イベントを1行1つのJSONで標準出力に書き出す（自動化クラスの出力は標準エラーへ）"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.RLock()  # シグナルハンドラーからの出力でも止まらないように
+
+    def emit(self, event, **fields):
+        record = {"time": datetime.now().isoformat(timespec="milliseconds"), "event": event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class CliHandler:
+    """自動化クラスの gui_handler の代わりにステータスをイベントとして出力する"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def update_status(self, message, level="info"):
+        self.writer.emit("status", level=level, message=message)
+
+    def log(self, message):
+        self.writer.emit("log", message=message)
+
+
+def load_password(config_path):
+    """パスワードを取得（環境変数 MAPCAMERA_PASSWORD を優先し、なければ設定ファイルから復号）"""
+    password = os.environ.get("MAPCAMERA_PASSWORD")
+    if password:
+        return password
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            encrypted = json.load(f).get("password", "")
+    except Exception:
+        return ""
+    if not encrypted:
+        return ""
+    from mapcamera_secrets import decrypt_password
+    return decrypt_password(encrypted)
+
+
+def create_automation(args, writer, password=""):
+    """起動中のChromeに接続して自動化クラスを作成"""
+    from mapcamera_automation import MapCameraAutomation
+
+    return MapCameraAutomation(password, args.config, verbose_log=args.verbose,
+                               gui_handler=CliHandler(writer))
+
+
+def install_signal_handlers(automation, writer):
+    """SIGINT / SIGTERM（WindowsではCtrl+Breakも）で停止をリクエストする
+
+    停止しないまま2回目のシグナルを受け取った場合は、処理の終了を待たずに終了処理（main の finally）へ進む。
+    """
+    stop = {"signal": None}
+
+    def handler(signum, frame):
+        repeated = stop["signal"] is not None
+        stop["signal"] = signum
+        writer.emit("signal", signal=signal.Signals(signum).name)
+        if repeated:
+            raise SystemExit(128 + signum)
+        automation.request_stop()
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), handler)
+    return stop
+
+
+def run_in_thread(target):
+    """処理を別スレッドで実行し、メインスレッドはシグナルを受け取れるように短い間隔で待つ"""
+    result = {}
+
+    def run():
+        try:
+            result["value"] = target()
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, name="mapcamera-cli", daemon=True)
+    thread.start()
+    while thread.is_alive():
+        thread.join(0.2)
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+
+def command_monitor(args, automation, writer, stop):
+    """商品一覧ページの更新を監視し、検出したら終了する"""
+    if args.interval:
+        automation.config["monitoring_interval"] = args.interval
+
+    detected = threading.Event()
+
+    def on_update():
+        detected.set()
+        writer.emit("update_detected", url=getattr(automation, 'monitor_url', None))
+
+    if not automation.monitor_page_updates(args.url, on_update, start_thread=False):
+        writer.emit("error", message="監視を開始できませんでした")
+        return 1
+
+    writer.emit("monitoring", url=getattr(automation, 'monitor_url', None),
+                interval=automation.config.get("monitoring_interval", 10))
+    run_in_thread(automation._monitor_loop)
+
+    if detected.is_set():
+        automation.stop_monitoring()
+        return 0
+    # シグナルで止めた場合は監視の基準をセッション状態に残し、次回の監視で引き継ぐ
+    writer.emit("stopped", reason="signal" if stop["signal"] else "monitor_ended")
+    return 0 if stop["signal"] else 1
+
+
+def command_wait_click(args, automation, writer, stop):
+    """商品一覧で商品がクリックされるのを待ち、--checkout なら購入処理まで行う"""
+    if not automation.find_best_tab():
+        writer.emit("error", message="マップカメラのタブが見つかりません")
+        return 1
+
+    writer.emit("waiting_click")
+    if not run_in_thread(automation.wait_for_product_click):
+        writer.emit("stopped", reason="signal" if stop["signal"] else "click_not_detected")
+        return 0 if stop["signal"] else 1
+
+    writer.emit("product_opened", tab=getattr(automation, 'product_tab', None),
+                url=automation.driver.current_url)
+    if not args.checkout:
+        return 0
+
+    if args.trace:
+        automation.config["trace_checkout"] = True
+    start_time = time.time()
+    success = run_in_thread(automation.start_automation)
+    writer.emit("checkout_finished", success=bool(success),
+                elapsed=round(time.time() - start_time, 3),
+                steps=[{"step": name, "elapsed": round(elapsed, 3)}
+                       for name, elapsed in getattr(automation, 'step_timings', [])],
+                failed_step=getattr(automation, 'failed_step', None),
+                trace=getattr(automation, 'last_trace_path', None))
+    return 0 if success else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="GUIを使わずに起動中のChromeに接続して監視・購入補助を行います（出力はJSON Lines）")
+    parser.add_argument("--config", default=get_config_path(), help="設定ファイル（既定: mapcamera_config.json）")
+    parser.add_argument("--verbose", action="store_true", help="詳細ログ（標準エラーに出力）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    monitor_parser = subparsers.add_parser("monitor", help="商品一覧ページの更新を監視")
+    monitor_parser.add_argument("--url", help="既存の一覧タブがない場合に開く商品一覧ページのURL")
+    monitor_parser.add_argument("--interval", type=float, help="監視間隔（秒、既定は設定ファイルの値）")
+
+    click_parser = subparsers.add_parser("wait-click", help="商品一覧で商品がクリックされるのを待機")
+    click_parser.add_argument("--checkout", action="store_true",
+                              help="商品ページが開いたら購入処理を行う（パスワードは MAPCAMERA_PASSWORD か設定ファイル）")
+    click_parser.add_argument("--trace", action="store_true",
+                              help="購入処理のPython側とブラウザ側のトレースを保存する（設定の trace_dir）")
+
+    bench_parser = subparsers.add_parser("bench", add_help=False,
+                                         help="ベンチマークを実行（引数は mapcamera_bench.py と同じ）")
+    bench_parser.add_argument("bench_args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+
+    # bench の引数（--help などのオプションを含む）はそのまま mapcamera_bench に渡す
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "bench":
+        from mapcamera_bench import main as bench_main
+        return bench_main(extra + args.bench_args)
+    if extra:
+        parser.error(f"認識できない引数です: {' '.join(extra)}")
+
+    writer = EventWriter(sys.stdout)
+
+    password = ""
+    if args.command == "wait-click" and args.checkout:
+        password = load_password(args.config)
+        if not password:
+            writer.emit("error", message="パスワードが設定されていません（MAPCAMERA_PASSWORD または設定ファイル）")
+            return 2
+
+    # 自動化クラスのprint出力は標準エラーに回し、標準出力はイベントだけにする
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            automation = create_automation(args, writer, password)
+        except Exception as e:
+            writer.emit("error", message=f"Chromeに接続できませんでした: {str(e)}",
+                        error_type=type(e).__name__)
+            return 1
+
+        stop = install_signal_handlers(automation, writer)
+        writer.emit("connected", command=args.command, tabs=len(automation.driver.window_handles))
+        try:
+            if args.command == "monitor":
+                return command_monitor(args, automation, writer, stop)
+            return command_wait_click(args, automation, writer, stop)
+        except Exception as e:
+            writer.emit("error", message=str(e), error_type=type(e).__name__)
+            return 1
+        finally:
+            automation.selector_registry.save_if_dirty()
+            # ブラウザは閉じずに、コマンドの監視とChromeDriverだけを終了する
+            if automation.watchdog is not None:
+                automation.watchdog.close()
+            automation.release_driver()
+            writer.emit("exit")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+
+from selenium.common.exceptions import NoSuchElementException, NoSuchWindowException
+
+
+# _call_helper が送信するスクリプトからヘルパー名を取り出す
+HELPER_CALL_PATTERN = re.compile(r"window\.__mc\['(\w+)'\]")
+WINDOW_OPEN_PATTERN = re.compile(r"window\.open\('([^']*)'")
+# navigate() の準備状態の判定スクリプトからセレクタを取り出す
+READINESS_SELECTOR_PATTERN = re.compile(r'document\.querySelector\(("(?:[^"\\]|\\.)*")\)')
+
+
+def fnv1a(text):
+    """ページ側ヘルパーと同じFNV-1a（32bit）のダイジェスト"""
+    value = 0x811c9dc5
+    data = text.encode("utf-16-le")  # JavaScriptの charCodeAt と同じUTF-16の単位で計算
+    for i in range(0, len(data), 2):
+        value ^= data[i] | (data[i + 1] << 8)
+        value = (value * 0x01000193) & 0xffffffff
+    return f"{value:08x}"
+
+
+class FakeElement:
+    """テスト用の要素"""
+
+    _next_id = 0
+
+    def __init__(self, tag="div", attributes=None, text="", displayed=True, enabled=True,
+                 on_click=None):
+        FakeElement._next_id += 1
+        self.id = f"fake-element-{FakeElement._next_id}"
+        self.tag_name = tag
+        self.attributes = dict(attributes or {})
+        self.text = text
+        self.displayed = displayed
+        self.enabled = enabled
+        self.on_click = on_click  # クリック時に呼ばれる関数（driverを受け取る）
+        self.value = ""
+        self.driver = None
+
+    def get_attribute(self, name):
+        if self.driver:
+            self.driver._count("element.get_attribute")
+        if name == "value":
+            return self.value
+        return self.attributes.get(name)
+
+    def is_displayed(self):
+        if self.driver:
+            self.driver._count("element.is_displayed")
+        return self.displayed
+
+    def is_enabled(self):
+        if self.driver:
+            self.driver._count("element.is_enabled")
+        return self.enabled
+
+    def click(self):
+        if self.driver:
+            self.driver._count("element.click")
+        if callable(self.on_click):
+            self.on_click(self.driver)
+
+    def clear(self):
+        if self.driver:
+            self.driver._count("element.clear")
+        self.value = ""
+
+    def send_keys(self, value):
+        if self.driver:
+            self.driver._count("element.send_keys")
+        self.value += str(value)
+
+
+class FakePage:
+    """テスト用のページ状態"""
+
+    def __init__(self, url, title="", elements=None, ready_state="complete", list_info=None,
+                 on_refresh=None, html=""):
+        self.url = url
+        self.title = title
+        self.elements = elements or {}      # セレクタ -> 要素のリスト
+        self.ready_state = ready_state
+        self.list_info = list_info          # __mc.listInfo() の戻り値（関数も可）
+        self.on_refresh = on_refresh        # リロード時に呼ばれる関数（pageを受け取る）
+        self.html = html
+        self.refresh_count = 0
+        self.time_origin = time.time() * 1000  # performance.timeOrigin の代替
+
+    def find(self, selector):
+        """セレクタに一致する要素を返す（カンマ区切りにも対応）"""
+        found = []
+        for part in selector.split(","):
+            found.extend(self.elements.get(part.strip(), []))
+        return found
+
+
+class FakeTab:
+    """1つのタブの履歴"""
+
+    def __init__(self, handle, page):
+        self.handle = handle
+        self.history = [page]
+        self.index = 0
+
+    @property
+    def page(self):
+        return self.history[self.index]
+
+    def navigate(self, page):
+        self.history = self.history[:self.index + 1] + [page]
+        self.index = len(self.history) - 1
+
+
+class FakeSwitchTo:
+    """driver.switch_to の代替"""
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        self._driver._count("switch_to.window")
+        if handle not in self._driver.tabs:
+            raise NoSuchWindowException(f"no such window: {handle}")
+        self._driver.current_handle = handle
+
+    def frame(self, frame):
+        self._driver._count("switch_to.frame")
+        self._driver.in_frame = True
+
+    def default_content(self):
+        self._driver._count("switch_to.default_content")
+        self._driver.in_frame = False
+
+
+class FakeDriver:
+    """MapCameraAutomationが使うSeleniumの機能だけを実装したメモリ上のドライバー
+
+    pages にはURLからFakePage（またはURLを受け取ってFakePageを返す関数）を登録する。
+    latency には1コマンドあたりの待ち時間、latencies にはコマンドごとの待ち時間を指定する。
+    """
+
+    def __init__(self, pages=None, start_urls=None, latency=0.0, latencies=None):
+        self.pages = pages or {}
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.calls = Counter()
+        self.tabs = {}
+        self.tab_order = []
+        self.current_handle = None
+        self.in_frame = False
+        self.page_load_timeout = None
+        self.script_timeout = None
+        self.cdp_commands = []
+        self.script_handlers = []   # (部分文字列, 関数) のリスト
+        self._scheduled = []
+        self._next_handle = 0
+        self._lock = threading.RLock()
+
+        for url in (start_urls or ["about:blank"]):
+            self.open_tab(url, count=False)
+        self.current_handle = self.tab_order[0]
+
+    # ===== 内部処理 =====
+
+    def _count(self, name):
+        """コマンドの呼び出し回数を数え、指定された待ち時間を再現する"""
+        with self._lock:
+            self.calls[name] += 1
+            total = sum(self.calls.values())
+            due = [item for item in self._scheduled if item[0] <= total]
+            self._scheduled = [item for item in self._scheduled if item[0] > total]
+
+        for _, action in due:
+            action(self)
+
+        delay = self.latencies.get(name, self.latency)
+        if delay:
+            time.sleep(delay)
+
+    def _page_for(self, url):
+        """URLに対応するページを作成する"""
+        entry = self.pages.get(url)
+        if entry is None:
+            # クエリやフラグメントを除いたURLでも探す
+            base = url.split("#")[0]
+            entry = self.pages.get(base)
+        if callable(entry):
+            entry = entry(url)
+        if entry is None:
+            entry = FakePage(url)
+        for elements in entry.elements.values():
+            for element in elements:
+                element.driver = self
+        return entry
+
+    @property
+    def _tab(self):
+        if self.current_handle not in self.tabs:
+            raise NoSuchWindowException("no such window: target window already closed")
+        return self.tabs[self.current_handle]
+
+    # ===== テストからの操作 =====
+
+    def open_tab(self, url, count=True):
+        """新しいタブを開く（ユーザーのクリックなどを再現）"""
+        with self._lock:
+            self._next_handle += 1
+            handle = f"TAB-{self._next_handle}"
+            self.tabs[handle] = FakeTab(handle, self._page_for(url))
+            self.tab_order.append(handle)
+        if count:
+            self.calls["browser.open_tab"] += 1
+        return handle
+
+    def navigate_tab(self, handle, url):
+        """指定したタブを別のURLに移動させる"""
+        self.tabs[handle].navigate(self._page_for(url))
+
+    def schedule(self, after_calls, action):
+        """コマンドの総呼び出し回数が指定値に達したときに action(driver) を実行する"""
+        with self._lock:
+            self._scheduled.append((sum(self.calls.values()) + after_calls, action))
+
+    def reset_counts(self):
+        """呼び出し回数をリセット"""
+        self.calls = Counter()
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    # ===== WebDriver互換のAPI =====
+
+    @property
+    def window_handles(self):
+        self._count("window_handles")
+        return list(self.tab_order)
+
+    @property
+    def current_window_handle(self):
+        self._count("current_window_handle")
+        return self._tab.handle
+
+    @property
+    def current_url(self):
+        self._count("current_url")
+        return self._tab.page.url
+
+    @property
+    def title(self):
+        self._count("title")
+        return self._tab.page.title
+
+    @property
+    def page_source(self):
+        self._count("page_source")
+        return self._tab.page.html
+
+    @property
+    def switch_to(self):
+        return FakeSwitchTo(self)
+
+    def execute_script(self, script, *args):
+        self._count("execute_script")
+        page = self._tab.page
+
+        for pattern, handler in self.script_handlers:
+            if pattern in script:
+                return handler(self, page, *args)
+
+        if "__mcNavigating" in script:
+            return self._readiness(page, script)
+
+        if "document.readyState" in script:
+            return page.ready_state
+
+        match = HELPER_CALL_PATTERN.search(script)
+        if match:
+            return [self._call_helper(page, match.group(1), *args)]
+
+        match = WINDOW_OPEN_PATTERN.search(script)
+        if match:
+            self.open_tab(match.group(1), count=False)
+            return None
+
+        if "arguments[0].click()" in script and args:
+            args[0].click()
+            return None
+
+        if "arguments[0].value = ''" in script and args:
+            args[0].value = ""
+            return None
+
+        return None
+
+    def _readiness(self, page, script):
+        """navigate() の準備状態の判定（ページの切り替えは同期なので常に新しいドキュメントとして扱う）"""
+        if not script.startswith("return"):
+            return None  # 遷移前の目印の設定・削除
+        match = READINESS_SELECTOR_PATTERN.search(script)
+        if match:
+            return bool(page.find(json.loads(match.group(1))))
+        if "=== 'complete'" in script:
+            return page.ready_state == "complete"
+        return page.ready_state != "loading"
+
+    def _call_helper(self, page, name, *args):
+        """ページ側ヘルパー（window.__mc）の代替"""
+        if name == "listInfo":
+            info = page.list_info(page) if callable(page.list_info) else page.list_info
+            return dict(info or {"count": 0, "items": []})
+        if name == "listDigest":
+            info = self._call_helper(page, "listInfo")
+            entries = [[item.get("id", ""), fnv1a(json.dumps(item, sort_keys=True, ensure_ascii=False))]
+                       for item in info["items"]]
+            digest = fnv1a(",".join(f"{item_id}:{d}" for item_id, d in entries))
+            if args and args[0] == digest:
+                return {"count": info["count"], "digest": digest, "unchanged": True}
+            return {"count": info["count"], "digest": digest, "items": entries}
+        if name == "listItems":
+            wanted = set(args[0]) if args else set()
+            info = self._call_helper(page, "listInfo")
+            return {item.get("id", ""): item for item in info["items"] if item.get("id", "") in wanted}
+        if name == "linkify":
+            return len(page.find('a[href*="/item/"]'))
+        if name == "unlinkify":
+            return 0
+        if name == "perfEntries":
+            return {"url": page.url, "timeOrigin": page.time_origin, "resources": [], "longTasks": [],
+                    "navigation": {"start": 0, "duration": 0, "responseStart": 0, "domContentLoaded": 0,
+                                   "load": 0, "transferSize": 0}}
+        return None
+
+    def execute_cdp_cmd(self, cmd, params):
+        self._count("execute_cdp_cmd")
+        self.cdp_commands.append((cmd, params))
+        return {}
+
+    def find_elements(self, by, value):
+        self._count("find_elements")
+        return list(self._tab.page.find(value))
+
+    def find_element(self, by, value):
+        self._count("find_element")
+        found = self._tab.page.find(value)
+        if not found:
+            raise NoSuchElementException(f"no such element: {value}")
+        return found[0]
+
+    def get(self, url):
+        self._count("get")
+        self._tab.navigate(self._page_for(url))
+
+    def refresh(self):
+        self._count("refresh")
+        page = self._tab.page
+        page.refresh_count += 1
+        if callable(page.on_refresh):
+            page.on_refresh(page)
+
+    def back(self):
+        self._count("back")
+        tab = self._tab
+        if tab.index > 0:
+            tab.index -= 1
+
+    def close(self):
+        self._count("close")
+        with self._lock:
+            handle = self.current_handle
+            self.tabs.pop(handle, None)
+            self.tab_order.remove(handle)
+
+    def quit(self):
+        self._count("quit")
+
+    def set_page_load_timeout(self, timeout):
+        self._count("set_page_load_timeout")
+        self.page_load_timeout = timeout
+
+    def set_script_timeout(self, timeout):
+        self._count("set_script_timeout")
+        self.script_timeout = timeout
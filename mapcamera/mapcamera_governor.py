@@ -0,0 +1,151 @@
+import collections
+import contextlib
+import threading
+import time
+
+
+# ポーリングの種類ごとの設定: (アイドル・最小化時の間隔の上限（秒）, 最小化中は止めるか)
+# 上限が None の種類は状態に関係なく指定どおりの間隔で待つ
+POLL_KINDS = {
+    "checkout": (None, False),      # 購入処理中の待機は常に最短
+    "monitor": (None, False),       # 監視間隔はユーザーの設定どおり
+    "click": (None, False),         # 商品クリック待機（クリックはGUIではなくブラウザで起きるため、GUIの操作状態では伸ばさない）
+    "wait": (0.5, False),           # その他の条件待ち
+    "chrome_check": (5.0, True),    # GUIのChrome状態確認
+    "metrics": (5.0, True),         # GUIのメトリクス表示
+}
+
+# 状態の表示名
+STATE_LABELS = {"active": "購入処理中", "normal": "通常", "idle": "アイドル", "paused": "最小化中"}
+
+# 起床回数を集計する期間（秒）
+WAKEUP_WINDOW = 60.0
+
+
+class PollGovernor:
+    """すべての待機ループにポーリング間隔を割り当てる
+
+    購入処理のステップ実行中は指定どおりの短い間隔、ユーザーがしばらく操作していなければ長めの間隔、
+    ウィンドウが最小化されている間はGUIだけのポーリングを止める。
+    起床回数を記録し、1分あたりの回数を報告する。
+    """
+
+    def __init__(self, idle_after=60.0, idle_factor=3.0, paused_factor=5.0):
+        self.idle_after = idle_after        # 最後の操作からアイドルとみなすまでの秒数
+        self.idle_factor = idle_factor
+        self.paused_factor = paused_factor
+        self._active = 0                    # 実行中の購入ステップの数（入れ子・複数スレッドに対応）
+        self._paused = False
+        self._last_activity = None          # 操作を報告する側（GUI）がない間は None（アイドルにならない）
+        self._wakeups = collections.deque()
+        self._resume_listeners = []
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """設定ファイルの値を反映"""
+        self.idle_after = config.get("poll_idle_after", self.idle_after)
+        self.idle_factor = config.get("poll_idle_factor", self.idle_factor)
+        self.paused_factor = config.get("poll_paused_factor", self.paused_factor)
+
+    @property
+    def state(self):
+        """現在の状態（active / paused / idle / normal）"""
+        if self._active:
+            return "active"
+        if self._paused:
+            return "paused"
+        if (self.idle_after and self._last_activity is not None
+                and time.time() - self._last_activity >= self.idle_after):
+            return "idle"
+        return "normal"
+
+    @contextlib.contextmanager
+    def active(self):
+        """with文のブロックの間は購入処理中として扱う"""
+        with self._lock:
+            self._active += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def note_user_activity(self):
+        """ユーザーの操作を記録（キー入力・クリックなど）"""
+        self._last_activity = time.time()
+
+    def set_paused(self, paused):
+        """ウィンドウの最小化状態を設定（元に戻したときは止めていたポーリングを再開する）"""
+        if self._paused == paused:
+            return
+        self._paused = paused
+        if paused:
+            return
+        if self._last_activity is not None:
+            self._last_activity = time.time()  # ウィンドウを戻したのも操作とみなす
+        with self._lock:
+            listeners, self._resume_listeners = self._resume_listeners, []
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"ポーリング再開の処理でエラー: {str(e)}")
+
+    def on_resume(self, callback):
+        """止めているポーリングを再開時に呼び出すよう登録"""
+        with self._lock:
+            self._resume_listeners.append(callback)
+
+    def interval(self, kind, base):
+        """種類と基準の間隔から今回の待機間隔を決める（止める場合はNone）"""
+        cap, pausable = POLL_KINDS.get(kind, POLL_KINDS["wait"])
+        state = self.state
+        if cap is None or state in ("active", "normal"):
+            return base
+        if state == "paused" and pausable:
+            return None
+        factor = self.paused_factor if state == "paused" else self.idle_factor
+        return max(base, min(base * factor, cap))
+
+    def wait(self, event, kind, base):
+        """イベントで中断できる待機（イベントがセットされたらTrueを返す）"""
+        interval = self.interval(kind, base)
+        if interval is None:
+            interval = base * self.paused_factor  # 自動化側の待機は止めずに長めに待つ
+        result = event.wait(interval)
+        self.note_wakeup(kind)
+        return result
+
+    def note_wakeup(self, kind):
+        """ポーリングの起床を記録"""
+        now = time.time()
+        with self._lock:
+            self._wakeups.append((now, kind))
+            self._prune(now)
+
+    def _prune(self, now):
+        cutoff = now - WAKEUP_WINDOW
+        wakeups = self._wakeups
+        while wakeups and wakeups[0][0] < cutoff:
+            wakeups.popleft()
+
+    def wakeups_per_minute(self):
+        """直近1分間の起床回数 (合計, {種類: 回数})"""
+        with self._lock:
+            self._prune(time.time())
+            by_kind = collections.Counter(kind for _, kind in self._wakeups)
+        return sum(by_kind.values()), dict(by_kind)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """プロセス全体で共有するガバナー"""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = PollGovernor()
+    return _governor
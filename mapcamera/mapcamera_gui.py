@@ -5,18 +5,21 @@ import json
 import os
 import sys
 import webbrowser
-import base64
 import psutil
 import time
+import urllib.request
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import datetime
 import tkinter as tk
 from tkinter import scrolledtext
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from cryptography.fernet import Fernet
 import functools
 
+from mapcamera_secrets import encrypt_password, decrypt_password
+from mapcamera_governor import STATE_LABELS, get_governor
+
 # アプリケーションのパス検出
 
 
@@ -41,62 +44,6 @@ def get_log_path():
     """ログファイルのパスを取得"""
     return os.path.join(get_base_path(), 'mapcamera_log.txt')
 
-# 鍵ファイルのパスを取得
-
-
-def get_key_path():
-    """暗号化キーのパスを取得"""
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, 'encryption.key')
-
-# 鍵の生成または読み込み
-
-
-def get_encryption_key():
-    """暗号化キーを取得または生成"""
-    key_path = get_key_path()
-
-    # キーファイルが存在しない場合は新しく生成
-    if not os.path.exists(key_path):
-        key = Fernet.generate_key()
-        with open(key_path, 'wb') as key_file:
-            key_file.write(key)
-        return key
-
-    # 既存のキーファイルから読み込み
-    with open(key_path, 'rb') as key_file:
-        return key_file.read()
-
-
-def encrypt_password(password):
-    """パスワードを暗号化"""
-    if not password:
-        return ""
-    try:
-        key = get_encryption_key()
-        cipher = Fernet(key)
-        encrypted_data = cipher.encrypt(password.encode())
-        return base64.urlsafe_b64encode(encrypted_data).decode()
-    except Exception as e:
-        print(f"暗号化エラー: {str(e)}")
-        return ""
-
-
-def decrypt_password(encrypted_data):
-    """暗号化されたパスワードを復号化"""
-    if not encrypted_data:
-        return ""
-    try:
-        key = get_encryption_key()
-        cipher = Fernet(key)
-        decrypted_data = cipher.decrypt(
-            base64.urlsafe_b64decode(encrypted_data.encode()))
-        return decrypted_data.decode()
-    except Exception as e:
-        print(f"復号化エラー: {str(e)}")
-        return ""
-
-
 # エラーメッセージ定数
 ERROR_MESSAGES = {
     "chrome_not_found": "Googleクロームがインストールされていないか、指定されたパスが間違っています。設定を確認してください。",
@@ -147,12 +94,16 @@ def gui_error_handler(operation=None):
 class Logger:
     """ログ機能の管理クラス"""
 
-    def __init__(self, log_widget=None, log_file=None):
+    def __init__(self, log_widget=None, log_file=None, bridge=None):
         self.log_widget = log_widget
         self.log_file = log_file
+        self.bridge = bridge            # ワーカースレッドからのウィジェット更新をUIスレッドに依頼する
+        self._pending = []              # UIスレッドでの表示待ちのログ
+        self._drain_scheduled = False
+        self._pending_lock = threading.Lock()
 
     def log(self, message, level="INFO"):
-        """ログを記録して表示"""
+        """ログを記録して表示（ウィジェットへの表示はUIスレッドでまとめて行う）"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         formatted_message = f"[{timestamp}] [{level}] {message}"
 
@@ -161,13 +112,14 @@ class Logger:
 
         # GUIのログエリアに表示
         if self.log_widget:
-            try:
-                self.log_widget.config(state=tk.NORMAL)
-                self.log_widget.insert(tk.END, formatted_message + "\n")
-                self.log_widget.see(tk.END)  # 自動スクロール
-                self.log_widget.config(state=tk.DISABLED)
-            except Exception as e:
-                print(f"ログウィジェット更新エラー: {str(e)}")
+            with self._pending_lock:
+                self._pending.append(formatted_message)
+                schedule = not self._drain_scheduled
+                self._drain_scheduled = True
+            if self.bridge is None or self.bridge.is_ui_thread():
+                self._drain()
+            elif schedule:
+                self.bridge.submit(self._drain)
 
         # ファイルに記録
         if self.log_file:
@@ -177,6 +129,21 @@ class Logger:
             except Exception as e:
                 print(f"ログファイル書き込みエラー: {str(e)}")
 
+    def _drain(self):
+        """表示待ちのログをまとめてウィジェットに追加（UIスレッドで実行）"""
+        with self._pending_lock:
+            lines, self._pending = self._pending, []
+            self._drain_scheduled = False
+        if not lines:
+            return
+        try:
+            self.log_widget.config(state=tk.NORMAL)
+            self.log_widget.insert(tk.END, "\n".join(lines) + "\n")
+            self.log_widget.see(tk.END)  # 自動スクロール
+            self.log_widget.config(state=tk.DISABLED)
+        except Exception as e:
+            print(f"ログウィジェット更新エラー: {str(e)}")
+
     def info(self, message):
         """情報メッセージをログに記録"""
         self.log(message, "INFO")
@@ -215,7 +182,11 @@ class ConfigManager:
             'page_load_timeout': 20,
             'script_timeout': 15,
             'force_stop_timeout': 2000,
-            'auto_switch_tab': False  # 購入完了後のタブ自動切り替え（現在は無効）
+            'auto_switch_tab': False,  # 購入完了後のタブ自動切り替え（現在は無効）
+            'use_async_core': False,  # 監視・商品クリック待機・購入処理を非同期コアで実行する
+            'profile_run': False,  # タスク実行をプロファイルして結果を保存する
+            'profile_top_n': 15,  # ログに表示するプロファイル上位の関数の数
+            'poll_idle_after': 60  # 操作がこの秒数なければポーリング間隔を広げる（0で無効）
         }
         self.config = self.load()
 
@@ -373,6 +344,50 @@ class ProcessManager:
             self.log(f"Chrome実行確認エラー: {str(e)}")
             return False
 
+    def find_chrome_process(self, debug_port):
+        """指定のデバッグポートで起動したChromeのメインプロセスを取得"""
+        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            try:
+                proc_info = proc.info
+                if 'chrome' in (proc_info['name'] or '').lower() and proc_info['cmdline']:
+                    if any(f"--remote-debugging-port={debug_port}" in cmd for cmd in proc_info['cmdline']):
+                        return proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return None
+
+    def get_process_tree_memory(self, proc):
+        """プロセスと子プロセス（レンダラーなど）のメモリ使用量の合計（バイト）"""
+        total = 0
+        for p in [proc] + proc.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return total
+
+    def wait_for_debug_port(self, debug_port, timeout=30):
+        """DevToolsエンドポイントが応答するまで待機し、準備完了までの秒数を返す"""
+        url = f"http://127.0.0.1:{debug_port}/json/version"
+        start_time = time.time()
+        interval = 0.05  # 初期ポーリング間隔（徐々に延長）
+
+        while time.time() - start_time < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    info = json.loads(response.read().decode('utf-8'))
+                    if info.get('webSocketDebuggerUrl'):
+                        return time.time() - start_time
+            except Exception:
+                # ポートがまだ開いていない
+                pass
+
+            time.sleep(interval)
+            interval = min(0.5, interval * 1.5)
+
+        self.log(f"デバッグポート{debug_port}が{timeout}秒以内に応答しませんでした")
+        return None
+
 # 自動化タスク管理クラス - 自動化処理を別スレッドで実行
 
 
@@ -409,11 +424,20 @@ class AutomationTask:
 
         kwargs = kwargs or {}
 
+        # プロファイル設定はUIスレッドで読み取っておく
+        profile_run = self.is_profiling_enabled()
+
         def wrapped_target():
+            profiler = None
             try:
                 self.log("タスクを開始します")
                 self.running = True
 
+                if profile_run:
+                    import cProfile
+                    profiler = cProfile.Profile()
+                    profiler.enable()
+
                 # 対象関数を実行
                 result = target(*args, **(kwargs or {}))
 
@@ -427,6 +451,20 @@ class AutomationTask:
                 self.log(f"タスク実行中にエラーが発生: {str(e)}")
                 return None
             finally:
+                if profiler is not None:
+                    profiler.disable()
+                    self.save_profile(profiler)
+
+                # 停止リクエストから実際に処理が終わるまでの時間を記録
+                if self.stop_requested and self.automation and hasattr(self.automation, 'measure_stop_latency'):
+                    latency = self.automation.measure_stop_latency()
+                    if latency is not None:
+                        self.log(f"停止リクエストから処理終了まで: {latency * 1000:.0f}ミリ秒")
+
+                # 停止した場合は商品一覧タブのリンク変換を解除（購入処理中に停止した場合も含む）
+                if self.stop_requested and self.automation and hasattr(self.automation, 'remove_link_conversion'):
+                    self.automation.remove_link_conversion()
+
                 # 状態をリセットして UI 更新
                 was_running = self.running  # 実行状態を記録
                 self.running = False
@@ -441,6 +479,43 @@ class AutomationTask:
         self.thread.start()
         return True
 
+    def is_profiling_enabled(self):
+        """「この実行をプロファイル」が有効かどうか"""
+        profile_var = getattr(self.app, 'profile_var', None)
+        try:
+            return bool(profile_var and profile_var.get())
+        except Exception:
+            return False
+
+    def save_profile(self, profiler):
+        """プロファイル結果をログと同じフォルダに保存し、上位の関数をログに表示"""
+        import io
+        import pstats
+
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            profile_path = os.path.join(
+                os.path.dirname(get_log_path()), f"mapcamera_profile_{timestamp}.prof")
+            profiler.dump_stats(profile_path)
+
+            top_n = 15
+            if self.app and hasattr(self.app, 'config'):
+                top_n = self.app.config.get('profile_top_n', top_n)
+
+            # 累積時間の上位を表示（待機の多い処理は sleep / select が上位に来る）
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(top_n)
+            summary = [line for line in stream.getvalue().splitlines() if line.strip()]
+
+            self.log(f"プロファイルを保存しました: {profile_path}")
+            for line in summary:
+                self.log(line)
+            return profile_path
+        except Exception as e:
+            self.log(f"プロファイルの保存に失敗しました: {str(e)}")
+            return None
+
     def stop(self):
         """タスクの停止をリクエスト"""
         if not self.running:
@@ -546,15 +621,62 @@ class UIFactory:
 # ダイアログ管理クラス - 各種ダイアログを管理
 
 
+class UIBridge:
+    """ワーカースレッドからUIスレッドでの処理を依頼し、結果をFutureで受け取る"""
+
+    def __init__(self, root):
+        self.root = root
+        self.ui_thread = threading.current_thread()  # UIスレッドで作成すること
+
+    def is_ui_thread(self):
+        return threading.current_thread() is self.ui_thread
+
+    def submit(self, func, *args, **kwargs):
+        """UIスレッドで func を実行する（UIスレッドから呼ばれた場合はその場で実行）"""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        if self.is_ui_thread():
+            run()
+        else:
+            self.root.after(0, run)
+        return future
+
+    def call(self, func, *args, timeout=None, default=None, **kwargs):
+        """UIスレッドで func を実行して結果を待つ（タイムアウト時は default を返す）"""
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # まだ実行されていなければ取り消す（表示中のダイアログはそのまま）
+            future.cancel()
+            return default
+
+
 class DialogManager:
-    """対話的なダイアログの管理"""
+    """対話的なダイアログの管理
 
-    def __init__(self, root, ui_factory):
+    ワーカースレッドから呼ばれた場合はUIスレッドに依頼する。
+    show_info / show_error はFutureを返し、show_confirm は結果が出るまで（timeoutまで）待つ。
+    """
+
+    def __init__(self, root, ui_factory, bridge=None):
         self.root = root
         self.ui = ui_factory
+        self.bridge = bridge or UIBridge(root)
 
     def show_info(self, message):
         """情報ダイアログを表示"""
+        if not self.bridge.is_ui_thread():
+            return self.bridge.submit(self.show_info, message)
+
         dialog = ctk.CTkToplevel(self.root)
         dialog.title("情報")
         dialog.geometry("400x150")
@@ -575,6 +697,9 @@ class DialogManager:
 
     def show_error(self, message, error_key=None):
         """エラーダイアログを表示"""
+        if not self.bridge.is_ui_thread():
+            return self.bridge.submit(self.show_error, message, error_key)
+
         if error_key:
             message = ERROR_MESSAGES.get(error_key, message)
 
@@ -632,8 +757,11 @@ class DialogManager:
 
         return dialog
 
-    def show_confirm(self, message):
-        """確認ダイアログを表示して結果を返す"""
+    def show_confirm(self, message, timeout=None):
+        """確認ダイアログを表示して結果を返す（ワーカースレッドからはtimeout秒で「いいえ」扱い）"""
+        if not self.bridge.is_ui_thread():
+            return self.bridge.call(self.show_confirm, message, timeout=timeout, default=False)
+
         result = [False]  # リストを使って結果を格納
 
         dialog = ctk.CTkToplevel(self.root)
@@ -708,7 +836,8 @@ class MapCameraGUI:
         self.process_manager = ProcessManager(self.logger)
 
         # ダイアログマネージャーの初期化
-        self.dialog = DialogManager(self.root, self.ui)
+        self.ui_bridge = UIBridge(self.root)
+        self.dialog = DialogManager(self.root, self.ui, self.ui_bridge)
 
         # タスク管理の初期化
         self.task = AutomationTask(
@@ -719,17 +848,30 @@ class MapCameraGUI:
 
         # 変数初期化
         self.chrome_running = False
+        self.chrome_starting = False
         self.automation = None
         self.force_stop_timer = None
         self.verbose_var = tk.BooleanVar(
             value=self.config.get('verbose_log', False))
+        self.profile_var = tk.BooleanVar(
+            value=self.config.get('profile_run', False))
         # 監視状態の初期化
         self.is_monitoring = False
+        # 自動化クラスの事前準備（プリウォーム）状態
+        self.prewarm_thread = None
+        self.prewarmed = False
+        self.awaiting_prewarm = False  # 事前準備の完了を待ってから再開する操作があるか
+        self.core = None  # 非同期コア（use_async_core が有効な場合のみ）
+        # ポーリング間隔の管理（自動化クラスと共有）
+        self.governor = get_governor()
+        self.governor.configure(self.config)
 
         # UIの作成
         self.create_main_layout()
+        self.bind_activity_tracking()
 
         # ロガーのUIコンポーネント登録（UIコンポーネント作成後）
+        self.logger.bridge = self.ui_bridge
         self.logger.log_widget = self.log_text
 
         # 初期ログ
@@ -783,6 +925,7 @@ class MapCameraGUI:
         self.create_browser_section()
         self.create_operation_section()
         self.create_status_section()
+        self.create_metrics_section()
         self.create_settings_section()
         self.create_log_section()
 
@@ -796,6 +939,30 @@ class MapCameraGUI:
         )
         self.exit_button.pack(fill=tk.X, pady=5, padx=10)
 
+    def bind_activity_tracking(self):
+        """ユーザーの操作とウィンドウの最小化をガバナーに伝える"""
+        def on_activity(event):
+            self.governor.note_user_activity()
+
+        def on_visibility(event):
+            # 子ウィジェットのイベントも届くため、ウィンドウ自体の変化だけを見る
+            if event.widget is self.root:
+                self.governor.set_paused(self.root.state() == "iconic")
+
+        for sequence in ("<KeyPress>", "<ButtonPress>", "<Motion>", "<MouseWheel>"):
+            self.root.bind_all(sequence, on_activity, add="+")
+        self.root.bind("<Unmap>", on_visibility, add="+")
+        self.root.bind("<Map>", on_visibility, add="+")
+        self.governor.note_user_activity()
+
+    def schedule_poll(self, kind, base_seconds, callback):
+        """GUIのポーリングを予約（間隔はガバナーが決め、最小化中は元に戻すまで止める）"""
+        interval = self.governor.interval(kind, base_seconds)
+        if interval is None:
+            self.governor.on_resume(lambda: self.root.after(0, callback))
+            return
+        self.root.after(int(interval * 1000), callback)
+
     def create_browser_section(self):
         """ブラウザ設定セクションの作成"""
         browser_frame = self.ui.create_frame(self.main_frame)
@@ -956,6 +1123,109 @@ class MapCameraGUI:
         )
         self.status_message.pack(fill=tk.X, padx=10, pady=5)
 
+    def create_metrics_section(self):
+        """パフォーマンス表示セクションの作成"""
+        metrics_frame = self.ui.create_frame(self.main_frame)
+        metrics_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.ui.create_label(
+            metrics_frame,
+            text="パフォーマンス",
+            font=self.header_font
+        ).pack(anchor="w", padx=10, pady=5)
+
+        self.metrics_label = self.ui.create_label(
+            metrics_frame,
+            text="自動化の開始後に表示されます",
+            justify="left",
+            anchor="w"
+        )
+        self.metrics_label.pack(fill=tk.X, padx=10, pady=5)
+
+        self._metrics_source = None
+        self._call_rate = None
+        self._chrome_process = None
+        self._chrome_lookup_at = 0
+        self.root.after(1000, self.refresh_metrics)
+
+    def refresh_metrics(self):
+        """自動化のメトリクスを読み取って表示を更新（通常は1秒ごと）"""
+        self.governor.note_wakeup("metrics")
+        try:
+            self.metrics_label.configure(text="\n".join(self.format_metrics()))
+        except Exception as e:
+            print(f"メトリクス表示エラー: {str(e)}")
+        self.schedule_poll("metrics", 1.0, self.refresh_metrics)
+
+    def format_metrics(self):
+        """表示用のメトリクスの行"""
+        from mapcamera_metrics import RateMeter
+
+        lines = []
+        metrics = getattr(self.automation, 'metrics', None)
+        if metrics is not None:
+            # 自動化インスタンスが作り直されたら計測し直す
+            if self._metrics_source is not metrics:
+                self._metrics_source = metrics
+                self._call_rate = RateMeter(metrics.counter("driver_calls"))
+
+            latency = metrics.histogram("driver_call_seconds")
+            pending = metrics.gauge("driver_pending").value
+            if self.core is not None:
+                pending += self.core.queue_depth()
+            lines.append(
+                f"WebDriver: {self._call_rate.read():.1f}回/秒"
+                f"（平均 {latency.mean * 1000:.0f}ms / p95 {latency.percentile(0.95) * 1000:.0f}ms）"
+                f"  待ち: {pending}件  エラー: {metrics.counter('driver_errors').value}件"
+                f"  期限超過: {metrics.counter('driver_deadline_exceeded').value}件")
+
+            cycle = metrics.gauge("monitor_cycle_seconds")
+            if cycle.updated_at is not None:
+                lines.append(
+                    f"監視サイクル: {cycle.value:.2f}秒（{metrics.counter('monitor_cycles').value}回目、"
+                    f"{time.time() - cycle.updated_at:.0f}秒前）")
+
+            steps = []
+            for name, histogram in metrics.labels("checkout_step_seconds").items():
+                step = self.automation._get_checkout_step(name)
+                label = step.label if step else name
+                steps.append(
+                    f"{label} {histogram.count}回 p50 {histogram.percentile(0.5) * 1000:.0f}ms"
+                    f" / 最大 {histogram.max * 1000:.0f}ms")
+            if steps:
+                lines.append("ステップ: " + "、".join(steps))
+        else:
+            lines.append("WebDriver: 未接続")
+
+        memory = self.get_chrome_memory()
+        if memory is not None:
+            lines.append(f"Chromeメモリ: {memory / (1024 * 1024):.0f}MB")
+
+        total, by_kind = self.governor.wakeups_per_minute()
+        kinds = "、".join(f"{kind} {count}" for kind, count in sorted(by_kind.items(), key=lambda item: -item[1]))
+        lines.append(f"ポーリング: {total}回/分（{STATE_LABELS[self.governor.state]}）" + (f"  {kinds}" if kinds else ""))
+        return lines
+
+    def get_chrome_memory(self):
+        """Chrome全体のメモリ使用量（プロセスの検索は10秒に1回まで）"""
+        if self._chrome_process is not None and not self._chrome_process.is_running():
+            self._chrome_process = None
+
+        if self._chrome_process is None:
+            if time.time() - self._chrome_lookup_at < 10:
+                return None
+            self._chrome_lookup_at = time.time()
+            self._chrome_process = self.process_manager.find_chrome_process(
+                self.config.get('debug_port', '9222'))
+            if self._chrome_process is None:
+                return None
+
+        try:
+            return self.process_manager.get_process_tree_memory(self._chrome_process)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self._chrome_process = None
+            return None
+
     def create_settings_section(self):
         """設定セクションの作成"""
         settings_frame = self.ui.create_frame(self.main_frame)
@@ -1027,7 +1297,16 @@ class MapCameraGUI:
             variable=self.verbose_var
         )
         self.verbose_checkbox.grid(
-            row=2, column=0, columnspan=3, padx=10, pady=5, sticky="w")
+            row=2, column=0, padx=10, pady=5, sticky="w")
+
+        # プロファイルオプション
+        self.profile_checkbox = self.ui.create_checkbox(
+            settings_controls,
+            text="この実行をプロファイル",
+            variable=self.profile_var
+        )
+        self.profile_checkbox.grid(
+            row=2, column=1, columnspan=2, padx=10, pady=5, sticky="w")
 
         # 列の重み設定
         settings_controls.grid_columnconfigure(1, weight=1)
@@ -1074,25 +1353,32 @@ class MapCameraGUI:
                     print(f"ログウィジェット更新エラー: {str(e)}")
 
     def update_status(self, message, level="info"):
-        """ステータスメッセージを更新する"""
+        """ステータスメッセージを更新する（ワーカースレッドからは表示をUIスレッドに依頼）"""
         if hasattr(self, 'status_message') and self.status_message:
-            # レベル別の色設定
-            colors = {
-                "info": ("#333333", "#FFFFFF"),    # 黒/白 (ライト/ダークモード)
-                "success": ("#006400", "#00CC00"),  # 濃い緑/明るい緑
-                "warning": ("#CC6600", "#FFAA33"),  # 濃いオレンジ/明るいオレンジ
-                "error": ("#CC0000", "#FF6666")    # 濃い赤/明るい赤
-            }
-
-            color = colors.get(level, colors["info"])
-            self.status_message.configure(text=message, text_color=color)
-
-            # 非同期更新のため即時反映
-            self.root.update_idletasks()
+            if self.ui_bridge.is_ui_thread():
+                self._show_status(message, level)
+            else:
+                self.ui_bridge.submit(self._show_status, message, level)
 
         # ログにも記録
         self.log(f"ステータス: {message}")
 
+    def _show_status(self, message, level):
+        """ステータスメッセージの表示を更新（UIスレッドで実行）"""
+        # レベル別の色設定
+        colors = {
+            "info": ("#333333", "#FFFFFF"),    # 黒/白 (ライト/ダークモード)
+            "success": ("#006400", "#00CC00"),  # 濃い緑/明るい緑
+            "warning": ("#CC6600", "#FFAA33"),  # 濃いオレンジ/明るいオレンジ
+            "error": ("#CC0000", "#FF6666")    # 濃い赤/明るい赤
+        }
+
+        color = colors.get(level, colors["info"])
+        self.status_message.configure(text=message, text_color=color)
+
+        # 非同期更新のため即時反映
+        self.root.update_idletasks()
+
     def ui_update_wrapper(self, callback, delay=0):
         """UIスレッドでコールバックを実行するためのラッパー関数"""
         self.root.after(delay, callback)
@@ -1163,6 +1449,7 @@ class MapCameraGUI:
         # 設定を更新
         self.config['password'] = raw_password  # 保存時に暗号化される
         self.config['verbose_log'] = self.verbose_var.get()
+        self.config['profile_run'] = self.profile_var.get()
         self.config['profile_directory'] = selected_profile
 
         # 設定を保存
@@ -1227,7 +1514,9 @@ class MapCameraGUI:
             self.stop_button: "処理を即時停止します。商品を購入しそびれた場合は迅速に停止してください。",
             self.password_entry: "マップカメラサイトのログインパスワードを入力してください。",
             self.verbose_checkbox: "詳細なログ情報を表示します。問題が発生した場合に役立ちます。",
+            self.profile_checkbox: "処理の時間がどこでかかっているかを記録します。\n結果はログファイルと同じフォルダに mapcamera_profile_*.prof として保存されます。",
             self.status_message: "現在の処理状況を示します。エラーや警告は色で区別されます。",
+            self.metrics_label: "WebDriverのコマンド数と応答時間、監視1回の所要時間、購入ステップの所要時間、Chromeのメモリ使用量です。\n数値が悪化していく場合はChromeの再起動を検討してください。",
             self.continuous_mode_button: "商品一覧ページから次々と商品を購入できるモードを開始します。\n商品更新タイミングでの連続購入に最適です。",
             # 新しく追加したツールチップ
             self.start_monitor_button: "11:30頃の商品更新を自動的に監視します。更新を検出したら通知します。",
@@ -1266,6 +1555,7 @@ class MapCameraGUI:
     def start_chrome_checker(self):
         """Chromeの状態を定期的に確認する（改良版）"""
         def check_chrome():
+            self.governor.note_wakeup("chrome_check")
             try:
                 # Chromeプロセスが存在するか確認
                 chrome_running = self.process_manager.check_chrome_running(
@@ -1275,6 +1565,7 @@ class MapCameraGUI:
                     # Chromeが終了している場合
                     if self.chrome_running:  # 以前は実行中だった場合
                         self.chrome_running = False
+                        self.prewarmed = False
                         self.chrome_status.configure(
                             text="停止中", text_color="red")
                         self.start_single_button.configure(state="disabled")
@@ -1294,8 +1585,8 @@ class MapCameraGUI:
                         # 再起動ボタンを有効化
                         self.chrome_button.configure(state="normal")
 
-                # 次の確認をスケジュール
-                self.root.after(1000, check_chrome)  # 1秒ごとにチェック（より頻繁に）
+                # 次の確認をスケジュール（通常は1秒ごと、アイドル時は間隔を広げ、最小化中は止める）
+                self.schedule_poll("chrome_check", 1.0, check_chrome)
 
             except Exception as e:
                 self.log(f"Chrome状態確認エラー: {str(e)}")
@@ -1308,7 +1599,7 @@ class MapCameraGUI:
     @gui_error_handler(operation="start_chrome")
     def start_chrome(self):
         """Chromeを起動する（マップカメラサイトは開かない）"""
-        if self.chrome_running:
+        if self.chrome_running or self.chrome_starting:
             self.log("Chromeは既に実行中です")
             return
 
@@ -1331,7 +1622,37 @@ class MapCameraGUI:
 
         # サブプロセスとして実行
         subprocess.Popen(command, shell=True)
-        self.log("Chromeを起動しました")
+        self.log("Chromeを起動しました。デバッグポートの応答を待機しています...")
+
+        # デバッグポートが応答するまでボタンは有効化しない
+        self.wait_for_chrome_ready(debug_port, enable_monitor=True)
+
+    def wait_for_chrome_ready(self, debug_port, enable_monitor=False):
+        """デバッグポートの準備完了をバックグラウンドで待機する"""
+        self.chrome_starting = True
+        self.chrome_button.configure(state="disabled")
+        self.chrome_status.configure(text="起動中", text_color="#FF8C00")
+        self.update_status("Chromeの起動を待機しています...", "info")
+
+        def probe():
+            elapsed = self.process_manager.wait_for_debug_port(debug_port)
+            self.ui_update_wrapper(
+                lambda: self.on_chrome_ready(elapsed, enable_monitor), 0)
+
+        threading.Thread(target=probe, daemon=True).start()
+
+    def on_chrome_ready(self, elapsed, enable_monitor=False):
+        """デバッグポートの確認結果をUIに反映する（メインスレッド）"""
+        self.chrome_starting = False
+        self.chrome_button.configure(state="normal")
+
+        if elapsed is None:
+            self.chrome_status.configure(text="停止中", text_color="red")
+            self.update_status(
+                "Chromeに接続できませんでした。Chromeを終了してから再度起動してください。", "error")
+            return
+
+        self.log(f"Chromeの起動から接続可能になるまで: {elapsed:.2f}秒")
         self.update_status("Chromeが起動しました", "success")
 
         self.chrome_running = True
@@ -1341,11 +1662,126 @@ class MapCameraGUI:
         self.start_single_button.configure(state="normal")
         self.start_list_button.configure(state="normal")
         self.continuous_mode_button.configure(state="normal")
-        self.start_monitor_button.configure(state="normal")  # 監視ボタンも有効化
+        if enable_monitor:
+            self.start_monitor_button.configure(state="normal")  # 監視ボタンも有効化
 
         # Chromeの状態を定期的に確認するタイマーを開始
         self.start_chrome_checker()
 
+        # 自動化クラスをバックグラウンドで事前準備
+        self.start_prewarm()
+
+    @gui_error_handler(operation="start_prewarm")
+    def start_prewarm(self):
+        """Chrome起動後、自動化クラスをバックグラウンドで事前準備する"""
+        if self.automation is not None:
+            return
+
+        if self.prewarm_thread and self.prewarm_thread.is_alive():
+            return
+
+        # Tk変数はメインスレッドで読み取ってからスレッドに渡す
+        password = self.password_entry.get()
+        verbose = self.verbose_var.get()
+
+        self.prewarm_thread = threading.Thread(
+            target=self._prewarm_automation, args=(password, verbose), daemon=True)
+        self.prewarm_thread.start()
+
+    def _prewarm_automation(self, password, verbose):
+        """自動化クラスを構築し、タブ情報を取得しておく（バックグラウンドスレッド）
+
+        使うかどうかはUIスレッドで決め、使うと決まるまではセッション状態のファイルに触れない。
+        """
+        start_time = time.time()
+        self.log("自動化クラスの事前準備を開始します")
+
+        try:
+            from mapcamera_automation import MapCameraAutomation
+        except Exception as e:
+            self.log(f"自動化クラスの読み込みに失敗しました: {str(e)}")
+            return
+
+        # デバッグポートは確認済みのため、接続の一時的な失敗のみ再試行
+        automation = None
+        max_attempts = 3
+        for attempt in range(max_attempts):
+            try:
+                automation = MapCameraAutomation(
+                    password, get_config_path(), verbose_log=verbose, gui_handler=self, journal=False)
+                break
+            except Exception as e:
+                if attempt < max_attempts - 1:
+                    time.sleep(min(2.0, 0.5 * (attempt + 1)))
+                else:
+                    self.log(f"自動化クラスの事前準備に失敗しました: {str(e)}")
+                    return
+
+        # 確認と設定はUIスレッドで行う（initialize_automation と同時に設定しない）
+        future = self.ui_bridge.submit(self._adopt_prewarmed, automation)
+        try:
+            adopted = future.result(timeout=10)
+        except FutureTimeoutError:
+            # 取り消せなければUIスレッドで実行中のため、その結果を待つ
+            adopted = False if future.cancel() else future.result()
+        except Exception:
+            adopted = False
+
+        # 事前準備中にユーザー操作で別インスタンスが作られていれば破棄（ChromeDriverも終了する）
+        if not adopted:
+            self.log("自動化クラスは既に初期化済みのため、事前準備の結果は使用しません")
+            if automation.watchdog is not None:
+                automation.watchdog.close()
+            automation.release_driver()
+            return
+
+        # 使うと決まってから前回のセッション状態を復元する（完了までは他の初期化がこのスレッドを待つ）
+        try:
+            automation.open_journal()
+        except Exception as e:
+            self.log(f"前回のセッション状態を復元できませんでした: {str(e)}")
+
+        elapsed = time.time() - start_time
+        self.log(f"自動化クラスの事前準備が完了しました（{elapsed:.2f}秒）")
+
+    def _adopt_prewarmed(self, automation):
+        """事前準備したインスタンスを使用する（UIスレッドで呼ぶ。使用する場合はTrue）"""
+        if self.automation is not None or self.task.running:
+            return False
+        self.automation = automation
+        self.task.automation = automation
+        self.prewarmed = True
+        return True
+
+    def defer_until_prewarmed(self, callback):
+        """事前準備中なら、UIを止めずに完了を待ってから callback を呼ぶ（待つ場合はTrue）"""
+        if not (self.prewarm_thread and self.prewarm_thread.is_alive()):
+            return False
+        # ワーカースレッドからの初期化は initialize_automation の中で待てる
+        if not self.ui_bridge.is_ui_thread():
+            return False
+        if self.awaiting_prewarm:
+            self.log("自動化クラスの事前準備の完了を待機中です")
+            return True
+
+        self.log("自動化クラスの事前準備の完了を待機しています...")
+        self.awaiting_prewarm = True
+        deadline = time.time() + 15
+
+        def check():
+            if self.prewarm_thread and self.prewarm_thread.is_alive():
+                if time.time() < deadline:
+                    self.root.after(100, check)
+                    return
+                # 終わらない事前準備は待たずに通常の初期化を行う（結果は使われずに破棄される）
+                self.log("自動化クラスの事前準備が終わらないため、待たずに初期化します")
+                self.prewarm_thread = None
+            self.awaiting_prewarm = False
+            callback()
+
+        self.root.after(100, check)
+        return True
+
     @gui_error_handler(operation="force_stop_automation")
     def force_stop_automation(self):
         """処理を強制的に停止する - 改良版"""
@@ -1391,6 +1827,7 @@ class MapCameraGUI:
                 self.root.after_cancel(self.force_stop_timer)
 
             # 設定ファイルから強制停止タイムアウト時間を取得（デフォルト2秒）
+            # 待機処理は停止イベントで即座に中断されるため、強制停止は応答しないコマンド用の保険
             force_stop_timeout = self.config.get('force_stop_timeout', 2000)
             self.force_stop_timer = self.root.after(
                 force_stop_timeout, self.force_stop_automation)
@@ -1401,6 +1838,32 @@ class MapCameraGUI:
         try:
             self.log("自動化クラスの初期化を開始します")
 
+            # 事前準備中であれば完了を待つ（二重初期化の防止）
+            # UIスレッドからの呼び出しは defer_until_prewarmed で完了後に呼ばれるため、ここではワーカースレッドのみ待つ
+            if (self.prewarm_thread and self.prewarm_thread.is_alive()
+                    and threading.current_thread() is not self.prewarm_thread
+                    and not self.ui_bridge.is_ui_thread()):
+                self.log("自動化クラスの事前準備の完了を待機しています...")
+                self.prewarm_thread.join(timeout=15)
+
+            # 事前準備済みのインスタンスは軽量なセッション確認のみで使用する
+            if self.automation is not None and self.prewarmed:
+                self.prewarmed = False
+                if self.automation.is_session_valid():
+                    password = self.password_entry.get()
+                    if not password:
+                        self.log("パスワードが設定されていません")
+                        self.update_status("パスワードが設定されていません", "error")
+                        self.dialog.show_error("パスワードを設定してください", "password_empty")
+                        return None
+
+                    self.automation.stop_requested = False
+                    self.automation.set_password(password)
+                    self.log("事前準備済みの自動化クラスを使用します")
+                    return self.automation
+
+                self.log("事前準備済みのセッションが無効なため、通常の初期化を行います")
+
             # セッション検証 - Chromeが再起動された場合のエラー対策
             if self.automation is not None:
                 # 状態のリセットを追加
@@ -1424,17 +1887,13 @@ class MapCameraGUI:
                         # URLがマップカメラのドメインを含むか確認
                         if "mapcamera.com" not in current_url:
                             self.log("現在マップカメラのページではありません。ページを切り替えます...")
-                            # マップカメラのドメインに移動
-                            self.automation.driver.get(
-                                "https://www.mapcamera.com/")
+                            # マップカメラのドメインに移動し、読み込み完了まで待つ
+                            loaded = self.automation.navigate("https://www.mapcamera.com/", "load")
                             self.log("マップカメラサイトに移動しました")
-                            time.sleep(0.5)  # 少し待機
 
                             # ページが正しく読み込まれたか確認
-                            loaded_state = self.automation.driver.execute_script(
-                                "return document.readyState")
-                            if loaded_state != "complete":
-                                self.log(f"ページの読み込みが完了していません: {loaded_state}")
+                            if not loaded:
+                                self.log("ページの読み込みが完了していません")
                                 raise Exception("ページの読み込みが完了していません")
                     except Exception as e:
                         # セッションは存在するが不安定な状態
@@ -1453,6 +1912,19 @@ class MapCameraGUI:
                     return self.automation
 
                 except Exception as e:
+                    # まずはインスタンスの状態を保ったまま起動中のChromeへの再接続を試みる
+                    self.log(f"セッションエラーが発生したため、Chromeへの再接続を試みます: {str(e)}")
+                    try:
+                        if self.automation.reattach():
+                            current_password = self.password_entry.get()
+                            if current_password:
+                                self.automation.set_password(current_password)
+                            self.task.automation = self.automation
+                            self.log("既存の自動化クラスのままChromeに再接続しました")
+                            return self.automation
+                    except Exception as reattach_error:
+                        self.log(f"再接続に失敗しました: {str(reattach_error)}")
+
                     # セッションが無効な場合はエラーが発生する
                     self.log(f"セッションエラーが発生したため、自動化クラスを再初期化します: {str(e)}")
                     self.update_status(
@@ -1507,6 +1979,33 @@ class MapCameraGUI:
             self.log(traceback.format_exc())
             return None
 
+    def get_core(self):
+        """非同期コアを取得する（設定で無効な場合はNone。自動化インスタンスが変わったら作り直す）"""
+        if not self.config.get('use_async_core', False) or not self.automation:
+            return None
+
+        if self.core is None or self.core.automation is not self.automation:
+            if self.core is not None:
+                self.core.shutdown()
+            from mapcamera_async import AutomationCore
+            self.core = AutomationCore(self.automation)
+            self.log("非同期コアを開始しました")
+        return self.core
+
+    def wait_for_product_click(self):
+        """商品クリックを待機する（非同期コアが有効ならコルーチンで実行）"""
+        core = self.get_core()
+        if core:
+            return core.run(core.wait_for_click())
+        return self.automation.wait_for_product_click()
+
+    def start_purchase(self):
+        """購入処理を実行する（非同期コアが有効ならコルーチンで実行）"""
+        core = self.get_core()
+        if core:
+            return core.run(core.start_automation())
+        return self.automation.start_automation()
+
     @gui_error_handler(operation="run_automation_task")
     def run_automation_task(self, task_func, *args):
         """自動化タスクをバックグラウンドで実行する"""
@@ -1515,6 +2014,10 @@ class MapCameraGUI:
             self.dialog.show_info("既に処理が実行中です。\n完了または停止するまでお待ちください。")
             return
 
+        # 事前準備中なら完了を待ってから開始する（UIは止めない）
+        if self.defer_until_prewarmed(lambda: self.run_automation_task(task_func, *args)):
+            return
+
         # 自動化クラスの初期化
         self.automation = self.initialize_automation()
         if not self.automation:
@@ -1555,7 +2058,7 @@ class MapCameraGUI:
 
         def run_task():
             # 自動化の実行
-            return self.automation.start_automation()
+            return self.start_purchase()
 
         self.run_automation_task(run_task)
 
@@ -1572,10 +2075,10 @@ class MapCameraGUI:
                 return False
 
             # 商品クリック待機
-            result = self.automation.wait_for_product_click()
+            result = self.wait_for_product_click()
             if result:
                 self.update_status("商品が選択されました。購入処理を続行します...", "info")
-                return self.automation.start_automation()
+                return self.start_purchase()
             else:
                 return False
 
@@ -1634,9 +2137,8 @@ class MapCameraGUI:
             else:
                 # 商品一覧ページでなければ移動
                 try:
-                    self.automation.driver.get(
-                        "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result")
-                    time.sleep(0.5)
+                    self.automation.navigate(
+                        "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result", "dom")
                     if self.automation.is_product_list_page(self.automation.driver.current_url):
                         self.automation.list_tab = current_tab
                     else:
@@ -1673,7 +2175,7 @@ class MapCameraGUI:
                             self.log(f"タブ参照更新中にエラー: {str(e)}")
 
                     # 商品クリックを待機
-                    if self.automation.wait_for_product_click():
+                    if self.wait_for_product_click():
                         # 商品が選択された場合
 
                         # SOLD OUT検出を先に行う
@@ -1690,7 +2192,7 @@ class MapCameraGUI:
                             # このタブでの処理を完了し、次のループへ
                             continue
                         # SOLD OUTでない場合は購入処理を実行
-                        result = self.automation.start_automation()
+                        result = self.start_purchase()
 
                         if result:
                             # 購入完了メッセージを表示
@@ -1779,6 +2281,10 @@ class MapCameraGUI:
             self.dialog.show_error("Chromeが起動していません。先にChromeを起動してください。")
             return
 
+        # 事前準備中なら完了を待ってから開始する（UIは止めない）
+        if self.defer_until_prewarmed(self.start_page_monitoring):
+            return
+
         # 既に監視中なら確実に停止してから開始する
         if hasattr(self, 'is_monitoring') and self.is_monitoring:
             # 既存の監視を完全に停止
@@ -1826,8 +2332,16 @@ class MapCameraGUI:
         # 監視開始 - URLはNoneを渡し、既存タブを優先使用
         # フォールバックとしてデフォルトURLを指定
         default_url = "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result"
-        result = self.automation.monitor_page_updates(
-            url=default_url, callback=on_update_detected)
+        core = self.get_core()
+        if core:
+            # 準備だけを同期的に行い、監視ループは非同期コアのタスクとして実行
+            result = core.run(core.call(
+                self.automation.monitor_page_updates, default_url, on_update_detected, False), timeout=30)
+            if result:
+                core.start_task("monitor", core.monitor())
+        else:
+            result = self.automation.monitor_page_updates(
+                url=default_url, callback=on_update_detected)
 
         if result:
             self.is_monitoring = True
@@ -1884,8 +2398,8 @@ class MapCameraGUI:
         # URLを中古商品検索結果ページに変更
         mapcamera_url = "https://www.mapcamera.com/search?sell=used&condition=other&sort=dateasc#result"
 
-        # すでにChromeが実行中の場合はそのままサイトを開く
-        if self.chrome_running:
+        # すでにChromeが実行中（起動中）の場合はそのままサイトを開く
+        if self.chrome_running or self.chrome_starting:
             webbrowser.open(mapcamera_url)
             self.log("マップカメラのウェブサイトを開きました")
             self.update_status("マップカメラサイトを開きました", "success")
@@ -1910,19 +2424,9 @@ class MapCameraGUI:
         # サブプロセスとして実行
         subprocess.Popen(command, shell=True)
         self.log("Chromeを起動し、マップカメラのウェブサイトを開きました")
-        self.update_status("Chromeを起動し、マップカメラサイトを開きました", "success")
-
-        # ステータスを更新
-        self.chrome_running = True
-        self.chrome_status.configure(text="実行中", text_color="green")
-
-        # 自動化関連のボタンを有効化
-        self.start_single_button.configure(state="normal")
-        self.start_list_button.configure(state="normal")
-        self.continuous_mode_button.configure(state="normal")
 
-        # Chromeの状態を定期的に確認するタイマーを開始
-        self.start_chrome_checker()
+        # デバッグポートが応答してからボタンを有効化
+        self.wait_for_chrome_ready(debug_port)
 
 
 # メインアプリケーションの実行
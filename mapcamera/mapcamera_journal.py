@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+# 記録する自動化クラスの属性（ポーリングのたびに変わる属性は含めない）
+JOURNALED_ATTRS = (
+    "list_tab", "product_tab", "last_product_list_url",
+    "purchase_in_progress", "prevent_tab_switch", "last_check_result", "monitor_url",
+)
+
+# タブのハンドル（再開時に開いているかを確認する）
+TAB_ATTRS = ("list_tab", "product_tab")
+
+# 実行中の処理を表すフラグ（再開時には処理が動いていないので復元しない）
+TRANSIENT_ATTRS = ("purchase_in_progress", "prevent_tab_switch")
+
+
+def journal_value(name, value):
+    """属性の値のうち記録する部分（商品一覧の結果は件数とダイジェストだけにする）
+
+    監視結果には毎サイクル変わるタイムスタンプと全商品が含まれるため、そのまま記録すると
+    毎サイクル書き込みが発生する。件数とダイジェストなら一覧が変わったときだけ書き込まれる。
+    """
+    if name == "last_check_result" and isinstance(value, dict):
+        return {"count": value.get("count", 0), "digest": value.get("digest")}
+    return value
+
+
+class SessionJournal:
+    """自動化の状態の切り替わり（監視・購入処理の開始と終了など）でファイルへ保存し、再起動時に復元できるようにする
+
+    書き込みは一時ファイルに書いてから置き換えるため、途中で終了しても壊れたファイルは残らない。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """保存された状態を読み込む（ファイルがない・壊れている場合は空）"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            state = data.get("state", {})
+            self.state = dict(state)
+            return state
+        except Exception as e:
+            print(f"セッション状態の読み込みに失敗しました: {str(e)}")
+            return {}
+
+    def save(self, state):
+        """状態全体を保存（前回保存した内容と同じなら書き込まない）"""
+        with self._lock:
+            if state == self.state:
+                return False
+            self.state = dict(state)
+            return self._write()
+
+    def clear(self):
+        """保存した状態をすべて消す"""
+        with self._lock:
+            self.state = {}
+            return self._write()
+
+    def _write(self):
+        temp_path = None
+        try:
+            data = json.dumps({"saved_at": time.time(), "pid": os.getpid(), "state": self.state},
+                              ensure_ascii=False)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".session_", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+            return True
+        except Exception as e:
+            print(f"セッション状態の保存に失敗しました: {str(e)}")
+            if temp_path and os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            return False
@@ -0,0 +1,187 @@
+import bisect
+import threading
+import time
+
+
+# ヒストグラムのバケット上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """増えるだけの値（コマンド数など）"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        # 更新はロックなし（GILの範囲で十分。まれに取りこぼしても表示用途なので問題ない）
+        self.value += amount
+
+
+class Gauge:
+    """現在値（監視サイクルの所要時間、待ち行列の長さなど）"""
+
+    def __init__(self):
+        self.value = 0
+        self.updated_at = None
+
+    def set(self, value):
+        self.value = value
+        self.updated_at = time.time()
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    """所要時間の分布（固定バケットに数えるだけなので記録のコストは小さい）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は上限超え
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def time(self):
+        """with文のブロックの所要時間を記録する"""
+        return _Timer(self)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """バケットから求めたおおよそのパーセンタイル（バケットの上限値）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """カウンター・ゲージ・ヒストグラムを名前（とラベル）で管理する"""
+
+    def __init__(self):
+        self.created_at = time.time()
+        self._metrics = {}
+        self._lock = threading.Lock()  # 作成時のみ使用（更新はロックなし）
+
+    def _get(self, kind, name, label):
+        key = (name, label)
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = kind()
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name, label=None):
+        return self._get(Counter, name, label)
+
+    def gauge(self, name, label=None):
+        return self._get(Gauge, name, label)
+
+    def histogram(self, name, label=None):
+        return self._get(Histogram, name, label)
+
+    def labels(self, name):
+        """指定した名前のラベルと値の一覧"""
+        return {label: metric for (n, label), metric in list(self._metrics.items()) if n == name}
+
+    def snapshot(self):
+        """表示・保存用の辞書"""
+        result = {}
+        for (name, label), metric in list(self._metrics.items()):
+            key = f"{name}[{label}]" if label is not None else name
+            if isinstance(metric, Histogram):
+                result[key] = {
+                    "count": metric.count,
+                    "mean": round(metric.mean, 4),
+                    "p50": metric.percentile(0.5),
+                    "p95": metric.percentile(0.95),
+                    "max": round(metric.max, 4),
+                }
+            else:
+                result[key] = metric.value
+        return result
+
+
+class RateMeter:
+    """カウンターの前回の読み取りからの1秒あたりの増加量"""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self._last_value = counter.value
+        self._last_time = time.time()
+
+    def read(self):
+        now = time.time()
+        value = self.counter.value
+        elapsed = now - self._last_time
+        rate = (value - self._last_value) / elapsed if elapsed > 0 else 0.0
+        self._last_value, self._last_time = value, now
+        return rate
+
+
+def instrument_driver(driver, registry):
+    """ドライバーのコマンド送信（execute）を計測するフックを付ける
+
+    SeleniumのWebDriverもCdpDriverも、すべてのコマンドが execute を通るため、
+    インスタンスの execute を置き換えるだけで両方のエンジンを計測できる。
+    """
+    original = getattr(driver, "execute", None)
+    if original is None or getattr(original, "_mc_instrumented", False):
+        return False
+
+    calls = registry.counter("driver_calls")
+    errors = registry.counter("driver_errors")
+    latency = registry.histogram("driver_call_seconds")
+    pending = registry.gauge("driver_pending")
+
+    def execute(*args, **kwargs):
+        calls.inc()
+        pending.inc()
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+            pending.dec()
+
+    execute._mc_instrumented = True
+    driver.execute = execute
+    return True
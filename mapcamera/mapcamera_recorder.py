@@ -0,0 +1,451 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+
+# 文字化け対策
+if hasattr(sys, 'stdout') and sys.stdout is not None:
+    if hasattr(sys.stdout, 'encoding') and sys.stdout.encoding != 'utf-8':
+        if hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(encoding='utf-8')
+
+
+# 実行後にページHTMLを記録するナビゲーション系のコマンド
+NAVIGATION_COMMANDS = {"get", "refresh", "back", "forward"}
+
+
+class ReplayExhausted(Exception):
+    """記録済みのコマンドを使い切った場合のエラー"""
+
+
+class SessionRecorder:
+    """WebDriverコマンドの呼び出し・結果・所要時間とページHTMLを記録する"""
+
+    def __init__(self, capture_pages=True):
+        self.capture_pages = capture_pages
+        self.started_at = time.time()
+        self.commands = []
+        self.marks = []
+        self.pages = []
+        self._captured_urls = set()
+        self._element_ids = {}
+        self._lock = threading.Lock()
+
+    def element_id(self, element):
+        """要素に記録用のIDを割り当てる"""
+        key = getattr(element, "id", None) or id(element)
+        with self._lock:
+            if key not in self._element_ids:
+                self._element_ids[key] = len(self._element_ids) + 1
+            return self._element_ids[key]
+
+    def serialize(self, value):
+        """記録用に値をJSON化できる形に変換する"""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [self.serialize(v) for v in value]
+        if isinstance(value, dict):
+            return {str(k): self.serialize(v) for k, v in value.items()}
+        if isinstance(value, RecordingElement):
+            return {"__element__": value.element_id}
+        if hasattr(value, "get_attribute") and hasattr(value, "click"):
+            return {"__element__": self.element_id(value)}
+        return repr(value)
+
+    def mark(self, name):
+        """処理の区切り（フローの開始など）を記録する"""
+        with self._lock:
+            self.marks.append({"name": name, "index": len(self.commands),
+                               "t": time.time() - self.started_at})
+
+    def record(self, target, name, kind, args, result=None, error=None, elapsed=0.0):
+        """1つのコマンドを記録する"""
+        entry = {
+            "target": target,
+            "name": name,
+            "kind": kind,
+            "args": self.serialize(list(args)),
+            "result": self.serialize(result),
+            "error": str(error) if error else None,
+            "error_type": type(error).__name__ if error else None,
+            "elapsed": elapsed,
+            "t": time.time() - self.started_at,
+        }
+        with self._lock:
+            entry["seq"] = len(self.commands)
+            self.commands.append(entry)
+
+    def capture_page(self, driver):
+        """現在のページのHTMLを記録する（同じURLは1回のみ）"""
+        if not self.capture_pages:
+            return
+        try:
+            url = driver.current_url
+            if url in self._captured_urls:
+                return
+            html = driver.page_source
+            with self._lock:
+                self._captured_urls.add(url)
+                self.pages.append({"seq": len(self.commands), "url": url, "html": html})
+        except Exception as e:
+            print(f"ページHTMLの記録に失敗しました: {str(e)}")
+
+    def wrap_call(self, target, name, func, driver=None):
+        """メソッド呼び出しを記録するラッパーを返す"""
+        recorder = self
+
+        def wrapper(*args, **kwargs):
+            start_time = time.time()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                recorder.record(target, name, "call", args, error=e,
+                                elapsed=time.time() - start_time)
+                raise
+            result = recorder.wrap_result(result, driver)
+            recorder.record(target, name, "call", args, result=result,
+                            elapsed=time.time() - start_time)
+            if driver is not None and (name in NAVIGATION_COMMANDS or name == "window"):
+                recorder.capture_page(driver)
+            return result
+
+        return wrapper
+
+    def wrap_result(self, result, driver):
+        """戻り値の要素を記録用のラッパーで包む"""
+        if isinstance(result, list):
+            return [self.wrap_result(r, driver) for r in result]
+        if hasattr(result, "get_attribute") and hasattr(result, "click") \
+                and not isinstance(result, RecordingElement):
+            return RecordingElement(result, self, driver)
+        return result
+
+    def to_dict(self):
+        """記録内容を辞書として返す"""
+        with self._lock:
+            return {
+                "version": 1,
+                "started": datetime.fromtimestamp(self.started_at).isoformat(),
+                "duration": time.time() - self.started_at,
+                "marks": list(self.marks),
+                "commands": list(self.commands),
+                "pages": list(self.pages),
+            }
+
+    def save(self, path):
+        """記録をJSONファイルに保存する"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        print(f"セッションの記録を保存しました: {path}（コマンド数: {len(self.commands)}）")
+        return path
+
+
+class RecordingElement:
+    """WebElementへの操作を記録するラッパー"""
+
+    def __init__(self, element, recorder, driver=None):
+        object.__setattr__(self, "wrapped_element", element)
+        object.__setattr__(self, "recorder", recorder)
+        object.__setattr__(self, "driver", driver)
+        object.__setattr__(self, "element_id", recorder.element_id(element))
+
+    def __getattr__(self, name):
+        start_time = time.time()
+        value = getattr(self.wrapped_element, name)
+        if callable(value):
+            return self.recorder.wrap_call("element", name, value, self.driver)
+        self.recorder.record("element", name, "property", (), result=value,
+                             elapsed=time.time() - start_time)
+        return value
+
+    def __eq__(self, other):
+        if isinstance(other, RecordingElement):
+            other = other.wrapped_element
+        return self.wrapped_element == other
+
+    def __hash__(self):
+        return hash(self.wrapped_element)
+
+
+class RecordingSwitchTo:
+    """driver.switch_to の操作を記録するラッパー"""
+
+    def __init__(self, switch_to, recorder, driver):
+        self._switch_to = switch_to
+        self._recorder = recorder
+        self._driver = driver
+
+    def __getattr__(self, name):
+        value = getattr(self._switch_to, name)
+        if callable(value):
+            func = value
+
+            # フレーム切り替えには記録用ラッパーではなく元の要素を渡す
+            def unwrap_call(*args, **kwargs):
+                args = [a.wrapped_element if isinstance(a, RecordingElement) else a for a in args]
+                return func(*args, **kwargs)
+
+            return self._recorder.wrap_call("switch_to", name, unwrap_call, self._driver)
+        return value
+
+
+class RecordingDriver:
+    """WebDriverへのコマンドをすべて記録するプロキシ"""
+
+    def __init__(self, driver, recorder):
+        object.__setattr__(self, "wrapped_driver", driver)
+        object.__setattr__(self, "recorder", recorder)
+
+    def __getattr__(self, name):
+        if name == "switch_to":
+            return RecordingSwitchTo(self.wrapped_driver.switch_to, self.recorder,
+                                     self.wrapped_driver)
+
+        start_time = time.time()
+        try:
+            value = getattr(self.wrapped_driver, name)
+        except Exception as e:
+            self.recorder.record("driver", name, "property", (), error=e,
+                                 elapsed=time.time() - start_time)
+            raise
+
+        if callable(value):
+            func = value
+
+            # 引数の記録用ラッパーは元の要素に戻してから渡す
+            def unwrap_call(*args, **kwargs):
+                args = [a.wrapped_element if isinstance(a, RecordingElement) else a for a in args]
+                return func(*args, **kwargs)
+
+            return self.recorder.wrap_call("driver", name, unwrap_call, self.wrapped_driver)
+
+        self.recorder.record("driver", name, "property", (), result=value,
+                             elapsed=time.time() - start_time)
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(self.wrapped_driver, name, value)
+
+
+def load_recording(path):
+    """記録ファイルを読み込む"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _restore_exception(entry):
+    """記録されたエラーを例外として復元する"""
+    message = entry.get("error") or ""
+    error_type = entry.get("error_type") or "Exception"
+    try:
+        from selenium.common import exceptions as selenium_exceptions
+        exception_class = getattr(selenium_exceptions, error_type, None)
+        if exception_class is not None:
+            return exception_class(message)
+    except ImportError:
+        pass
+    return Exception(f"{error_type}: {message}")
+
+
+class ReplayDriver:
+    """記録したセッションをWebDriverの代わりに再生する"""
+
+    def __init__(self, recording, speed=0.0):
+        self.recording = recording
+        self.speed = speed  # 記録時の所要時間に掛ける係数（0なら待機しない）
+        self.call_counts = defaultdict(int)
+        self.recorded_time = 0.0
+        self._queues = {}
+        self._known = {(e["target"], e["name"]) for e in recording.get("commands", [])}
+        self.use_segment(None)
+
+    def use_segment(self, mark=None, occurrence=0):
+        """指定した区切りから次の区切りまでのコマンドを再生対象にする（Noneなら全体）"""
+        commands = self.recording.get("commands", [])
+        marks = self.recording.get("marks", [])
+        start, end = 0, len(commands)
+
+        if mark is not None:
+            found = [i for i, m in enumerate(marks) if m["name"] == mark]
+            if len(found) <= occurrence:
+                raise ValueError(f"記録に区切り「{mark}」が見つかりません")
+            position = found[occurrence]
+            start = marks[position]["index"]
+            if position + 1 < len(marks):
+                end = marks[position + 1]["index"]
+
+        self._queues = defaultdict(deque)
+        for entry in commands[start:end]:
+            self._queues[(entry["target"], entry["name"])].append(entry)
+
+    def next_entry(self, target, name):
+        """次に再生するコマンドを取り出す"""
+        queue = self._queues.get((target, name))
+        if not queue:
+            raise ReplayExhausted(f"記録済みのコマンドがありません: {target}.{name}")
+        entry = queue.popleft()
+        self.call_counts[f"{target}.{name}"] += 1
+        self.recorded_time += entry.get("elapsed", 0.0)
+        if self.speed > 0:
+            time.sleep(entry.get("elapsed", 0.0) * self.speed)
+        return entry
+
+    def peek_kind(self, target, name):
+        """次に再生するコマンドの種類（property/call）を返す"""
+        queue = self._queues.get((target, name))
+        return queue[0]["kind"] if queue else None
+
+    def restore(self, entry):
+        """記録された結果を返す（エラーなら例外を送出）"""
+        if entry.get("error_type"):
+            raise _restore_exception(entry)
+        return self.restore_value(entry.get("result"))
+
+    def restore_value(self, value):
+        """要素を再生用のオブジェクトに戻す"""
+        if isinstance(value, list):
+            return [self.restore_value(v) for v in value]
+        if isinstance(value, dict) and "__element__" in value:
+            return ReplayElement(self, value["__element__"])
+        return value
+
+    def resolve(self, target, name):
+        """プロパティなら値を、メソッドなら再生用の関数を返す"""
+        kind = self.peek_kind(target, name)
+        if kind is None:
+            raise ReplayExhausted(f"記録済みのコマンドがありません: {target}.{name}")
+        if kind == "property":
+            return self.restore(self.next_entry(target, name))
+
+        def replay_call(*args, **kwargs):
+            return self.restore(self.next_entry(target, name))
+
+        return replay_call
+
+    @property
+    def switch_to(self):
+        return ReplaySwitchTo(self)
+
+    def __getattr__(self, name):
+        # 記録に一度も現れないコマンドは属性として存在しない扱い
+        if name.startswith("_") or ("driver", name) not in self._known:
+            raise AttributeError(name)
+        return self.resolve("driver", name)
+
+    def stats(self):
+        """再生したコマンドの統計を返す"""
+        return {
+            "calls": dict(self.call_counts),
+            "total_calls": sum(self.call_counts.values()),
+            "recorded_time": self.recorded_time,
+        }
+
+
+class ReplayElement:
+    """再生用の要素"""
+
+    def __init__(self, replay, element_id):
+        self._replay = replay
+        self.element_id = element_id
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._replay.resolve("element", name)
+
+
+class ReplaySwitchTo:
+    """再生用の driver.switch_to"""
+
+    def __init__(self, replay):
+        self._replay = replay
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._replay.resolve("switch_to", name)
+
+
+def summarize(recording):
+    """記録内容のコマンド別の回数と所要時間を集計する"""
+    summary = defaultdict(lambda: {"count": 0, "elapsed": 0.0})
+    for entry in recording.get("commands", []):
+        key = f"{entry['target']}.{entry['name']}"
+        summary[key]["count"] += 1
+        summary[key]["elapsed"] += entry.get("elapsed", 0.0)
+    return dict(summary)
+
+
+def replay_session(path, flow="start_automation", occurrence=0, speed=0.0, config_file=None):
+    """記録したセッションで指定したフローを再生し、結果と所要時間を返す"""
+    from mapcamera_automation import MapCameraAutomation
+
+    recording = load_recording(path)
+    driver = ReplayDriver(recording, speed=speed)
+
+    # 初期化部分を再生してからフローを再生
+    driver.use_segment("__init__")
+    automation = MapCameraAutomation("", config_file, driver=driver)
+    driver.use_segment(flow, occurrence)
+
+    start_time = time.time()
+    try:
+        result = getattr(automation, flow)()
+    except ReplayExhausted as e:
+        print(f"記録の範囲外のコマンドが実行されました: {str(e)}")
+        result = None
+    elapsed = time.time() - start_time
+
+    return {"flow": flow, "result": result, "elapsed": elapsed, **driver.stats()}
+
+
+def print_summary(recording):
+    """記録内容の集計を表示する"""
+    summary = summarize(recording)
+    total = sum(v["elapsed"] for v in summary.values())
+    print(f"記録日時: {recording.get('started')}  コマンド数: {len(recording.get('commands', []))}"
+          f"  ページ数: {len(recording.get('pages', []))}")
+    print(f"区切り: {', '.join(m['name'] for m in recording.get('marks', []))}")
+    for key, value in sorted(summary.items(), key=lambda kv: -kv[1]["elapsed"]):
+        print(f"  {key:<40} {value['count']:>6}回 {value['elapsed']:>8.3f}秒")
+    print(f"  {'合計':<40} {'':>7} {total:>8.3f}秒")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WebDriverセッションの記録を集計・再生します")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="記録内容を集計して表示")
+    summary_parser.add_argument("recording")
+
+    replay_parser = subparsers.add_parser("replay", help="記録したセッションでフローを再生")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--flow", default="start_automation")
+    replay_parser.add_argument("--occurrence", type=int, default=0)
+    replay_parser.add_argument("--speed", type=float, default=0.0,
+                               help="記録時の待ち時間を再現する係数（0なら待機しない）")
+    replay_parser.add_argument("--config", default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        print_summary(load_recording(args.recording))
+        return 0
+
+    report = replay_session(args.recording, flow=args.flow, occurrence=args.occurrence,
+                            speed=args.speed, config_file=args.config)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if report["result"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import base64
+import os
+
+from cryptography.fernet import Fernet
+
+
+# 鍵ファイルのパスを取得
+
+
+def get_key_path():
+    """暗号化キーのパスを取得"""
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, 'encryption.key')
+
+# 鍵の生成または読み込み
+
+
+def get_encryption_key():
+    """暗号化キーを取得または生成"""
+    key_path = get_key_path()
+
+    # キーファイルが存在しない場合は新しく生成
+    if not os.path.exists(key_path):
+        key = Fernet.generate_key()
+        with open(key_path, 'wb') as key_file:
+            key_file.write(key)
+        return key
+
+    # 既存のキーファイルから読み込み
+    with open(key_path, 'rb') as key_file:
+        return key_file.read()
+
+
+def encrypt_password(password):
+    """パスワードを暗号化"""
+    if not password:
+        return ""
+    try:
+        key = get_encryption_key()
+        cipher = Fernet(key)
+        encrypted_data = cipher.encrypt(password.encode())
+        return base64.urlsafe_b64encode(encrypted_data).decode()
+    except Exception as e:
+        print(f"暗号化エラー: {str(e)}")
+        return ""
+
+
+def decrypt_password(encrypted_data):
+    """暗号化されたパスワードを復号化"""
+    if not encrypted_data:
+        return ""
+    try:
+        key = get_encryption_key()
+        cipher = Fernet(key)
+        decrypted_data = cipher.decrypt(
+            base64.urlsafe_b64decode(encrypted_data.encode()))
+        return decrypted_data.decode()
+    except Exception as e:
+        print(f"復号化エラー: {str(e)}")
+        return ""
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+# 以前は一致していたセレクタが、この回数続けて他のセレクタに負けたら古くなったとみなす
+STALE_AFTER = 3
+
+
+class SelectorRegistry:
+    """要素ごとにどのセレクタで見つかったかを記録し、よく一致するセレクタから試す
+
+    統計は実行をまたいで保存する（path が None なら保存しない）。
+    サイトの構造が変わって一致しなくなったセレクタは後回しにし、警告を1回だけ出す。
+    """
+
+    def __init__(self, path=None, verbose_log=False):
+        self.path = path
+        self.verbose_log = verbose_log
+        # 要素のキー -> {"selectors": {セレクタ -> {"hits", "misses", "last_hit", "stale"}}, "not_found": 回数}
+        self.stats = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """保存された統計を読み込む"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.stats = json.load(f)
+        except Exception as e:
+            print(f"セレクタ統計の読み込みに失敗しました: {str(e)}")
+            self.stats = {}
+
+    def save(self):
+        """統計を保存する（一時ファイルに書いてから置き換える）"""
+        if not self.path:
+            self.dirty = False
+            return False
+        with self._lock:
+            data = json.dumps(self.stats, ensure_ascii=False, indent=2)
+            self.dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".selector_stats_", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+            return True
+        except Exception as e:
+            print(f"セレクタ統計の保存に失敗しました: {str(e)}")
+            return False
+
+    def save_if_dirty(self):
+        if self.dirty:
+            return self.save()
+        return False
+
+    def order(self, key, selectors):
+        """試す順番に並べ替えたセレクタ（一致回数の多い順、古くなったものは最後、同数なら元の順）"""
+        entries = self.stats.get(key, {}).get("selectors")
+        if not entries:
+            return list(selectors)
+
+        def rank(item):
+            index, selector = item
+            entry = entries.get(selector, {})
+            return (entry.get("stale", False), -entry.get("hits", 0), index)
+
+        return [selector for _, selector in sorted(enumerate(selectors), key=rank)]
+
+    def record_hit(self, key, selector, selectors):
+        """selector で要素が見つかったことを記録し、新たに古くなったセレクタを返す（selectors は試した順）"""
+        newly_stale = []
+        with self._lock:
+            entries = self._entries(key)
+            hit = entries.setdefault(selector, {"hits": 0, "misses": 0, "last_hit": None, "stale": False})
+            hit["hits"] += 1
+            hit["misses"] = 0
+            hit["last_hit"] = time.time()
+            hit["stale"] = False
+
+            # 先に試して見つからなかった、以前は一致していたセレクタを「負け」として数える
+            tried_before = selectors[:selectors.index(selector)] if selector in selectors else []
+            for other in tried_before:
+                entry = entries.get(other)
+                if not entry or not entry["hits"] or entry["stale"]:
+                    continue
+                entry["misses"] += 1
+                if entry["misses"] >= STALE_AFTER:
+                    entry["stale"] = True
+                    newly_stale.append(other)
+            self.dirty = True
+
+        for other in newly_stale:
+            print(f"セレクタが一致しなくなっています（{key}）: {other} -> 代わりに {selector} を使用")
+        if self.verbose_log:
+            print(f"セレクタが一致しました（{key}）: {selector}")
+        return newly_stale
+
+    def record_miss(self, key, selectors):
+        """どのセレクタでも見つからなかったことを記録"""
+        with self._lock:
+            self._entries(key)
+            self.stats[key]["not_found"] = self.stats[key].get("not_found", 0) + 1
+            self.dirty = True
+        print(f"どのセレクタでも見つかりませんでした（{key}）: {list(selectors)}")
+
+    def _entries(self, key):
+        return self.stats.setdefault(key, {"selectors": {}, "not_found": 0}).setdefault("selectors", {})
+
+    def stale_selectors(self):
+        """古くなったセレクタの一覧 {要素のキー: [セレクタ]}"""
+        result = {}
+        for key, data in self.stats.items():
+            stale = [s for s, e in data.get("selectors", {}).items() if e.get("stale")]
+            if stale:
+                result[key] = stale
+        return result
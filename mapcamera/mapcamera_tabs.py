@@ -0,0 +1,128 @@
+import threading
+import time
+
+
+# 1つだけ使われる役割（新しいタブが登録されたら古いタブは終了扱いにする）
+SINGLE_ROLES = {"list", "monitor"}
+TAB_ROLES = {"list", "product", "checkout", "monitor"}
+
+
+class TabManager:
+    """自動化が開いたタブの役割と経過時間を管理し、終了したタブを上限を超えたら閉じる
+
+    attach時に存在していたタブ（ユーザーが開いたタブ）は管理対象にせず、閉じることもない。
+    """
+
+    def __init__(self, max_tabs=5, verbose_log=False):
+        self.max_tabs = max_tabs
+        self.verbose_log = verbose_log
+        self.user_tabs = set()
+        self.tabs = {}  # ハンドル -> {"role", "opened_at", "finished_at"}
+        self._lock = threading.RLock()
+
+    def attach(self, handles):
+        """既存のタブをユーザーのタブとして記録する"""
+        with self._lock:
+            self.user_tabs = set(handles)
+            self.tabs = {}
+
+    def is_managed(self, handle):
+        """自動化が開いたタブかどうか"""
+        return handle in self.tabs
+
+    def register(self, handle, role):
+        """自動化が開いたタブを登録（ユーザーのタブは登録しない）"""
+        if role not in TAB_ROLES:
+            raise ValueError(f"不明なタブの役割: {role}")
+        with self._lock:
+            if handle is None or handle in self.user_tabs:
+                return False
+
+            now = time.time()
+            # 一覧タブ・監視タブは最新の1つだけを使う
+            if role in SINGLE_ROLES:
+                for other, info in self.tabs.items():
+                    if other != handle and info["role"] == role and info["finished_at"] is None:
+                        info["finished_at"] = now
+
+            info = self.tabs.setdefault(handle, {"role": role, "opened_at": now, "finished_at": None})
+            info["role"] = role
+            info["finished_at"] = None
+            return True
+
+    def set_role(self, handle, role):
+        """管理中のタブの役割を変更（商品 -> 購入手続きなど）"""
+        with self._lock:
+            if handle in self.tabs:
+                self.tabs[handle]["role"] = role
+
+    def finish(self, handle):
+        """タブを使い終わったものとして記録（閉じてよい候補になる）"""
+        with self._lock:
+            info = self.tabs.get(handle)
+            if info and info["finished_at"] is None:
+                info["finished_at"] = time.time()
+
+    def forget(self, handle):
+        """閉じられたタブを管理対象から外す"""
+        with self._lock:
+            self.tabs.pop(handle, None)
+            self.user_tabs.discard(handle)
+
+    def prune(self, open_handles):
+        """既に閉じられたタブを管理対象から外す"""
+        open_handles = set(open_handles)
+        with self._lock:
+            for handle in [h for h in self.tabs if h not in open_handles]:
+                del self.tabs[handle]
+            self.user_tabs &= open_handles
+
+    def age(self, handle):
+        """タブを開いてからの経過時間（秒）"""
+        info = self.tabs.get(handle)
+        return time.time() - info["opened_at"] if info else None
+
+    def closable(self, protected=()):
+        """上限を超えた分の閉じてよいタブ（終了済み・古い順）"""
+        with self._lock:
+            excess = len(self.tabs) - self.max_tabs
+            if excess <= 0:
+                return []
+            finished = [(info["finished_at"], handle) for handle, info in self.tabs.items()
+                        if info["finished_at"] is not None and handle not in protected]
+            finished.sort()
+            return [handle for _, handle in finished[:excess]]
+
+    def enforce(self, driver, protected=()):
+        """上限を超えた終了済みタブを閉じ、閉じたタブのハンドルを返す"""
+        handles = driver.window_handles
+        self.prune(handles)
+
+        current = driver.current_window_handle
+        targets = self.closable(set(protected) | {current})
+        closed = []
+        for handle in targets:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+                closed.append(handle)
+                if self.verbose_log:
+                    print(f"使い終わったタブを閉じました: {handle}")
+            except Exception as e:
+                print(f"タブを閉じる際にエラー: {str(e)}")
+            self.forget(handle)
+
+        if closed:
+            driver.switch_to.window(current)
+        return closed
+
+    def describe(self):
+        """管理中のタブの一覧（ログ用）"""
+        now = time.time()
+        with self._lock:
+            return [{
+                "handle": handle,
+                "role": info["role"],
+                "age": round(now - info["opened_at"], 1),
+                "finished": info["finished_at"] is not None,
+            } for handle, info in self.tabs.items()]
@@ -0,0 +1,248 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import urllib.request
+
+
+# DevToolsのトレースで記録するカテゴリ（ナビゲーション・ロングタスク・通信・ページのスクリプト）
+TRACE_CATEGORIES = (
+    "devtools.timeline",
+    "disabled-by-default-devtools.timeline",
+    "blink.user_timing",
+    "loading",
+    "toplevel",
+    "v8.execute",
+)
+
+# DevToolsのトレースが使えない場合に、ページのPerformance APIのエントリを並べる疑似プロセス
+PAGE_PID = 1
+PAGE_MAIN_TID = 1
+PAGE_NETWORK_TID = 2
+
+
+class TraceSession:
+    """Python側の処理の区間とブラウザのトレースを1つのトレースイベントJSONにまとめる
+
+    ブラウザ側はDevToolsのTracingドメインで記録する（ChromeDriverとは別の接続を使う）。
+    接続できない場合はページのPerformance API（ナビゲーション・通信・ロングタスク）で代用する。
+    書き出したファイルは chrome://tracing や Perfetto で開ける。
+    """
+
+    def __init__(self, debug_address=None, categories=TRACE_CATEGORIES):
+        self.debug_address = debug_address
+        self.categories = list(categories)
+        self.pid = os.getpid()
+        self.events = []            # Python側のイベント（時刻は perf_counter のマイクロ秒）
+        self.browser_events = []    # DevToolsのトレースイベント
+        self.page_entries = {}      # ドキュメント（timeOrigin）ごとのPerformance APIのエントリ
+        self.connection = None
+        self.started_at = None
+        self._epoch_offset = time.time() - time.perf_counter()
+        self._sync_id = None
+        self._sync_perf = None
+        self._threads = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    # ===== 開始・終了 =====
+
+    def start(self):
+        """トレースを開始する（DevToolsに接続できなければPerformance APIで代用）"""
+        self.started_at = time.time()
+        if self.debug_address:
+            try:
+                self._start_devtools()
+            except Exception as e:
+                print(f"DevToolsのトレースを開始できませんでした（ページのPerformance APIで代用します）: {str(e)}")
+                self._close()
+        return self
+
+    def _start_devtools(self):
+        from mapcamera_cdp import CdpConnection
+
+        with urllib.request.urlopen(f"http://{self.debug_address}/json/version", timeout=5) as response:
+            version = json.loads(response.read().decode("utf-8"))
+
+        self.connection = CdpConnection(version["webSocketDebuggerUrl"])
+        self.connection.listeners.setdefault("Tracing.dataCollected", []).append(self._on_data_collected)
+        self.connection.send("Tracing.start", {
+            "traceConfig": {"includedCategories": self.categories, "recordMode": "recordUntilFull"},
+            "transferMode": "ReportEvents",
+        })
+
+        # ブラウザのトレースの時刻とPythonの時刻を対応付ける目印
+        self._sync_id = f"mapcamera-{self.pid}-{int(self.started_at * 1000)}"
+        before = time.perf_counter()
+        self.connection.send("Tracing.recordClockSyncMarker", {"syncId": self._sync_id})
+        self._sync_perf = (before + time.perf_counter()) / 2
+
+    def _on_data_collected(self, params, session_id):
+        self.browser_events.extend(params.get("value", []))
+
+    def stop(self):
+        """トレースを終了し、ドライバーのフックを外す"""
+        for driver, original, hook, had_instance_attr in reversed(self._hooks):
+            if driver.__dict__.get("execute") is hook:
+                if had_instance_attr:
+                    driver.execute = original
+                else:
+                    del driver.execute
+        self._hooks = []
+
+        if self.connection is not None:
+            try:
+                self.connection.send("Tracing.end")
+                self.connection.wait_for_event("Tracing.tracingComplete", timeout=60)
+            except Exception as e:
+                print(f"DevToolsのトレースの取得に失敗しました: {str(e)}")
+            finally:
+                self._close()
+
+    def _close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @property
+    def uses_devtools(self):
+        return self.connection is not None
+
+    # ===== Python側の記録 =====
+
+    @contextlib.contextmanager
+    def span(self, name, cat="python", **args):
+        """with文のブロックを1つの区間として記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._add({"name": name, "cat": cat, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6,
+                       "args": args})
+
+    def instant(self, name, cat="python", **args):
+        """区切りとなる時点を記録する"""
+        self._add({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": time.perf_counter() * 1e6, "args": args})
+
+    def _add(self, event):
+        thread = threading.current_thread()
+        event["pid"] = self.pid
+        event["tid"] = thread.ident
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    def instrument(self, driver):
+        """ドライバーのコマンド（execute）を区間として記録する（stop で元に戻す）"""
+        original = getattr(driver, "execute", None)
+        if original is None:
+            return False
+        had_instance_attr = "execute" in driver.__dict__
+
+        def execute(command, *args, **kwargs):
+            details = {}
+            params = args[0] if args else kwargs.get("params")
+            if isinstance(params, dict) and "url" in params:
+                details["url"] = params["url"]
+            with self.span(str(command), cat="driver", **details):
+                return original(command, *args, **kwargs)
+
+        driver.execute = execute
+        self._hooks.append((driver, original, execute, had_instance_attr))
+        return True
+
+    def add_page_entries(self, entries):
+        """ページ側ヘルパーの perfEntries の結果を追加（同じドキュメントは新しい方で置き換える）"""
+        if not entries or entries.get("timeOrigin") is None:
+            return
+        self.page_entries[entries["timeOrigin"]] = entries
+
+    # ===== 書き出し =====
+
+    def _clock_offset(self):
+        """perf_counter のマイクロ秒をブラウザのトレースの時刻に変換するための差分"""
+        if self._sync_id is not None:
+            for event in self.browser_events:
+                if event.get("name") == "clock_sync" and event.get("args", {}).get("sync_id") == self._sync_id:
+                    return event["ts"] - self._sync_perf * 1e6
+        # 目印が見つからない場合も、Chromeのトレースの時刻はOSの単調増加クロック（perf_counterと同じ）を使う
+        return 0.0
+
+    def _page_events(self):
+        """Performance APIのエントリをトレースイベントに変換（時刻は perf_counter のマイクロ秒）"""
+        events = []
+
+        def ts(time_origin, start):
+            return ((time_origin + start) / 1000 - self._epoch_offset) * 1e6
+
+        for time_origin, entries in sorted(self.page_entries.items()):
+            url = entries.get("url", "")
+            navigation = entries.get("navigation")
+            if navigation:
+                events.append({"name": "navigation", "cat": "page", "ph": "X", "tid": PAGE_MAIN_TID,
+                               "ts": ts(time_origin, navigation.get("start", 0)),
+                               "dur": (navigation.get("duration") or 0) * 1000,
+                               "args": {"url": url, "transferSize": navigation.get("transferSize")}})
+                for mark in ("responseStart", "domContentLoaded", "load"):
+                    if navigation.get(mark):
+                        events.append({"name": mark, "cat": "page", "ph": "i", "s": "p", "tid": PAGE_MAIN_TID,
+                                       "ts": ts(time_origin, navigation[mark]), "args": {"url": url}})
+
+            for task in entries.get("longTasks", []):
+                events.append({"name": "longtask", "cat": "page", "ph": "X", "tid": PAGE_MAIN_TID,
+                               "ts": ts(time_origin, task["start"]), "dur": task["duration"] * 1000,
+                               "args": {"attribution": task.get("name")}})
+
+            for index, resource in enumerate(entries.get("resources", [])):
+                request_id = f"{time_origin}-{index}"
+                common = {"name": resource["name"], "cat": "network", "id": request_id, "tid": PAGE_NETWORK_TID}
+                events.append(dict(common, ph="b", ts=ts(time_origin, resource["start"]),
+                                   args={"type": resource.get("type"), "transferSize": resource.get("transferSize")}))
+                events.append(dict(common, ph="e", ts=ts(time_origin, resource["start"] + resource["duration"])))
+
+        for event in events:
+            event["pid"] = PAGE_PID
+        return events
+
+    def to_trace(self):
+        """トレースイベント形式の辞書"""
+        offset = self._clock_offset()
+        with self._lock:
+            python_events = self.events + self._page_events()
+            threads = dict(self._threads)
+
+        merged = []
+        for event in python_events:
+            event = dict(event)
+            event["ts"] = event["ts"] + offset
+            merged.append(event)
+
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "MapCameraAutomation (Python)"}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": ident, "args": {"name": name}}
+                     for ident, name in threads.items()]
+        if self.page_entries:
+            metadata += [
+                {"name": "process_name", "ph": "M", "pid": PAGE_PID, "args": {"name": "ページ（Performance API）"}},
+                {"name": "thread_name", "ph": "M", "pid": PAGE_PID, "tid": PAGE_MAIN_TID, "args": {"name": "メインスレッド"}},
+                {"name": "thread_name", "ph": "M", "pid": PAGE_PID, "tid": PAGE_NETWORK_TID, "args": {"name": "通信"}},
+            ]
+
+        return {
+            "traceEvents": metadata + merged + self.browser_events,
+            "displayTimeUnit": "ms",
+            "metadata": {
+                "started_at": self.started_at,
+                "browser_source": "devtools" if self.browser_events else ("performance_api" if self.page_entries else None),
+                "clock_synced": offset != 0.0,
+            },
+        }
+
+    def save(self, path):
+        """トレースをJSONファイルに保存してパスを返す"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_trace(), f, ensure_ascii=False)
+        return path
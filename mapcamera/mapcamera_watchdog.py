@@ -0,0 +1,272 @@
+import itertools
+import json
+import threading
+import time
+import urllib.request
+
+from selenium.common.exceptions import TimeoutException
+
+
+# ページの読み込みを止めれば戻るコマンド（それ以外はスクリプトの実行も止める）
+# WebDriverのコマンド名とDevToolsプロトコルのメソッド名の両方で指定する
+NAVIGATION_COMMANDS = ("get", "refresh", "goBack", "Page.navigate", "Page.reload", "Page.navigateToHistoryEntry")
+
+# 期限をドライバー自身のタイムアウト（ページ読み込み・スクリプト）より後にする余裕（秒）
+DEADLINE_MARGIN = 5
+
+
+def command_deadlines(page_load_timeout=10, margin=DEADLINE_MARGIN):
+    """ナビゲーションのコマンドごとの期限（秒）
+
+    ドライバー自身のページ読み込みのタイムアウトが先に発生するよう、それより margin 秒だけ長くする。
+    """
+    return {command: page_load_timeout + margin for command in NAVIGATION_COMMANDS}
+
+
+DEFAULT_COMMAND_DEADLINES = command_deadlines()
+
+
+class CommandDeadlineExceeded(TimeoutException):
+    """WebDriverのコマンドが期限内に終わらず、中断された"""
+
+    def __init__(self, command, deadline, reattached=False):
+        message = f"コマンド {command} が{deadline}秒以内に終わらなかったため中断しました"
+        if reattached:
+            message += "（Chromeに再接続しました）"
+        super().__init__(message)
+        self.command = command
+        self.deadline = deadline
+        self.reattached = reattached
+
+
+class _Call:
+    """実行中のコマンド1件"""
+
+    def __init__(self, command, deadline, target):
+        self.command = command
+        self.deadline = deadline
+        self.expires_at = time.monotonic() + deadline
+        self.target = target
+        self.expired = False           # 期限を過ぎて中断した
+        self.sever_at = None           # 中断しても戻らない場合に接続を切る時刻
+        self.severed = False
+        self.interrupt_requested = False
+
+
+class CommandWatchdog:
+    """ドライバーのコマンドに期限を設け、止まったコマンドを中断する
+
+    1. 期限を過ぎたら、別のDevTools接続からタブのページ読み込み（とスクリプトの実行）を止める
+    2. それでも戻らなければ sever（ChromeDriverの終了など）で接続を切り、待っているスレッドを解放する
+    呼び出し側には CommandDeadlineExceeded を送出し、接続を切った場合は on_severed（再接続）を先に呼ぶ。
+    中断するのはコマンドを送ったタブだけで、タブが分からない場合は中断せずに接続を切るのを待つ。
+    監視スレッドは一番早い期限にだけ起きるため、通常のコマンドにはほとんど負担がない。
+    """
+
+    def __init__(self, debug_address, default_deadline=10, deadlines=None, grace=3,
+                 sever=None, on_severed=None, registry=None, verbose_log=False):
+        self.debug_address = debug_address
+        self.default_deadline = default_deadline
+        self.deadlines = dict(DEFAULT_COMMAND_DEADLINES if deadlines is None else deadlines)
+        self.grace = grace                  # 中断してから接続を切るまでの猶予（秒）
+        self.sever = sever                  # sever(driver): 接続を切る
+        self.on_severed = on_severed        # on_severed(driver): 接続を切ったドライバーの再接続
+        self.registry = registry
+        self.verbose_log = verbose_log
+        self.driver = None
+        self.target = None                  # コマンドを送るタブ（ターゲットID、最後に切り替えたタブ）
+        self.connection = None              # 中断用のDevTools接続（必要になったときに接続）
+        self._inflight = {}
+        self._tokens = itertools.count()
+        self._wake_at = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def install(self, driver):
+        """ドライバーの execute に期限の監視を付ける（再接続後の新しいドライバーにも付け直す）"""
+        original = getattr(driver, "execute", None)
+        if original is None or getattr(original, "_mc_watchdog", False):
+            return False
+
+        self.driver = driver
+        # 最初のタブ切り替えより前のコマンド（接続直後の get など）も中断できるよう、現在のタブから始める
+        self.target = self._current_target(driver)
+        watched_driver = driver
+
+        def execute(command, *args, **kwargs):
+            params = args[0] if args else kwargs.get("params")
+            if isinstance(params, dict):
+                self._track_target(command, params)
+
+            token, call = self._begin(command)
+            try:
+                result = original(command, *args, **kwargs)
+            except Exception as e:
+                if call.expired:
+                    raise self._deadline_exceeded(call, watched_driver) from e
+                raise
+            finally:
+                self._end(token)
+            if call.expired:
+                raise self._deadline_exceeded(call, watched_driver)
+            return result
+
+        execute._mc_watchdog = True
+        execute._mc_instrumented = getattr(original, "_mc_instrumented", False)
+        driver.execute = execute
+        return True
+
+    @staticmethod
+    def _current_target(driver):
+        try:
+            return driver.current_window_handle
+        except Exception:
+            return None
+
+    def _track_target(self, command, params):
+        if command == "switchToWindow":
+            self.target = params.get("handle")
+        elif command == "Target.activateTarget":
+            self.target = params.get("targetId")
+
+    # ===== 実行中のコマンドの管理 =====
+
+    def _begin(self, command):
+        call = _Call(command, self.deadlines.get(command, self.default_deadline), self.target)
+        token = next(self._tokens)
+        with self._cond:
+            self._inflight[token] = call
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mapcamera-watchdog", daemon=True)
+                self._thread.start()
+            # 監視スレッドが予定より早く起きる必要がある場合だけ起こす
+            if self._wake_at is None or call.expires_at < self._wake_at:
+                self._cond.notify()
+        return token, call
+
+    def _end(self, token):
+        with self._cond:
+            self._inflight.pop(token, None)
+
+    def interrupt(self):
+        """停止リクエスト時に、実行中のナビゲーション（ページ読み込み）を止める"""
+        with self._cond:
+            calls = [call for call in self._inflight.values() if call.command in NAVIGATION_COMMANDS]
+            for call in calls:
+                call.interrupt_requested = True
+            if calls:
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = []
+                self._wake_at = None
+                for call in self._inflight.values():
+                    if call.interrupt_requested:
+                        due.append(call)
+                        continue
+                    when = call.sever_at if call.expired else (None if call.severed else call.expires_at)
+                    if when is None:
+                        continue
+                    if when <= now:
+                        due.append(call)
+                    elif self._wake_at is None or when < self._wake_at:
+                        self._wake_at = when
+                if not due:
+                    self._cond.wait(None if self._wake_at is None else self._wake_at - now)
+                    continue
+
+            for call in due:
+                self._handle(call)
+
+    def _handle(self, call):
+        if call.interrupt_requested:
+            call.interrupt_requested = False
+            self._abort(call, scripts=False)
+            return
+
+        if not call.expired:
+            call.expired = True
+            call.sever_at = time.monotonic() + self.grace
+            print(f"コマンド {call.command} が{call.deadline}秒以内に終わらないため中断します")
+            if self.registry is not None:
+                self.registry.counter("driver_deadline_exceeded").inc()
+            self._abort(call, scripts=call.command not in NAVIGATION_COMMANDS)
+            return
+
+        # 中断しても戻らない場合は接続を切って、待っているスレッドを解放する
+        call.sever_at = None
+        call.severed = True
+        print(f"コマンド {call.command} が中断後も戻らないため、接続を切ります")
+        if self.sever is not None:
+            try:
+                self.sever(self.driver)
+            except Exception as e:
+                print(f"接続を切れませんでした: {str(e)}")
+
+    def _deadline_exceeded(self, call, driver):
+        """呼び出し側に送出する例外（接続を切った場合は先に再接続する）"""
+        reattached = False
+        if call.severed and self.on_severed is not None and self.driver is driver:
+            try:
+                reattached = bool(self.on_severed(driver))
+            except Exception as e:
+                print(f"コマンドの中断後の再接続に失敗しました: {str(e)}")
+        return CommandDeadlineExceeded(call.command, call.deadline, reattached)
+
+    # ===== DevToolsからの中断 =====
+
+    def _connection(self):
+        if self.connection is None:
+            from mapcamera_cdp import CdpConnection
+
+            with urllib.request.urlopen(f"http://{self.debug_address}/json/version", timeout=2) as response:
+                version = json.loads(response.read().decode("utf-8"))
+            self.connection = CdpConnection(version["webSocketDebuggerUrl"], timeout=5)
+        return self.connection
+
+    def _abort(self, call, scripts):
+        """コマンドを実行中のタブのページ読み込み（scripts ならスクリプトの実行も）を止める
+
+        止めるのはコマンドを送ったタブだけ。タブが分からない場合はユーザーのタブに触れないよう何もしない
+        （期限を過ぎたコマンドは猶予の後に接続を切って解放する）。
+        """
+        if not call.target:
+            if self.verbose_log:
+                print(f"コマンド {call.command} のタブが分からないため、タブの処理は中断しません")
+            return
+        try:
+            connection = self._connection()
+            targets = [t for t in connection.send("Target.getTargets")["targetInfos"] if t["type"] == "page"]
+            wanted = call.target.replace("CDwindow-", "")
+            chosen = [t for t in targets if t["targetId"] == wanted]
+
+            for target in chosen:
+                session_id = connection.send("Target.attachToTarget",
+                                             {"targetId": target["targetId"], "flatten": True})["sessionId"]
+                try:
+                    if scripts:
+                        connection.send("Runtime.terminateExecution", session_id=session_id)
+                    connection.send("Page.stopLoading", session_id=session_id)
+                finally:
+                    connection.send("Target.detachFromTarget", {"sessionId": session_id})
+            if self.verbose_log:
+                print(f"タブの処理を中断しました（{call.command}）: {[t['targetId'] for t in chosen]}")
+        except Exception as e:
+            print(f"DevToolsからコマンドを中断できませんでした: {str(e)}")
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,32 @@
+from mapcamera_async import AutomationCore
+from mapcamera_bench import create_automation, quiet, scenario_monitor_loop
+
+
+def test_core_monitor_runs_sync_cycle_under_driver_lock():
+    driver, config, setup, _, _ = scenario_monitor_loop(0.0)
+    automation = create_automation(driver, config)
+    setup()
+    locked = []
+    check_monitor_updates = automation._check_monitor_updates
+
+    def record_lock(*cycle):
+        # 比較の時点でも再接続（ドライバーの差し替え）を待たせている
+        locked.append(automation.driver_lock._is_owned())
+        return check_monitor_updates(*cycle)
+
+    automation._check_monitor_updates = record_lock
+    automation.monitor_tab = driver.tab_order[0]
+    automation.monitor_callback = lambda: None
+    automation.stop_requested = False
+    automation.last_check_result = automation._get_product_list_info()
+
+    core = AutomationCore(automation)
+    try:
+        with quiet():
+            assert core.run(core.monitor(), timeout=10) is True
+    finally:
+        core.shutdown()
+
+    assert driver.tabs[automation.monitor_tab].page.refresh_count == 3
+    assert locked == [True, True, True]
+    assert automation.stop_requested
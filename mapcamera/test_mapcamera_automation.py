@@ -0,0 +1,187 @@
+import threading
+
+import pytest
+
+from mapcamera_bench import (LIST_URL, PRODUCT_URL, SCENARIOS, create_automation, list_items, quiet,
+                             scenario_handle_element_action, scenario_monitor_loop,
+                             scenario_wait_for_product_click)
+from mapcamera_fake_driver import FakeDriver, FakePage
+
+
+# 各シナリオの往復数の上限（ベンチマークと同じフェイクドライバー・同じ準備で計測）
+ROUND_TRIP_BUDGETS = {
+    "find_best_tab": 60,
+    "handle_element_action": 7,
+    "wait_for_product_click": 45,
+    "_monitor_loop": 30,
+}
+
+
+def run_once(name, config=None):
+    """ベンチマークのシナリオを1回実行して (automation, driver, 結果) を返す"""
+    driver, scenario_config, setup, run, check = SCENARIOS[name](0.0)
+    automation = create_automation(driver, dict(scenario_config, **(config or {})))
+    setup()
+    with quiet():
+        result = run(automation)
+    assert check(automation, result)
+    return automation, driver, result
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_scenario_within_round_trip_budget(name):
+    _, driver, _ = run_once(name)
+    assert driver.total_calls <= ROUND_TRIP_BUDGETS[name], dict(driver.calls)
+
+
+def test_find_best_tab_enumerates_tabs_once():
+    automation, driver, _ = run_once("find_best_tab")
+    assert driver.current_url == PRODUCT_URL
+    assert driver.calls["window_handles"] == 1
+
+
+def test_handle_element_action_prefers_learned_selector():
+    driver, config, setup, _, _ = scenario_handle_element_action(0.0)
+    automation = create_automation(driver, config)
+    selectors = ["#cartPut", "button.next", "input.submit"]
+
+    counts = []
+    for _ in range(2):
+        setup()
+        with quiet():
+            assert automation.handle_element_action(selectors, "click", key="cart_button") is True
+        counts.append(dict(driver.calls))
+
+    # 1回目は3番目のセレクタまで探し、2回目は成功したセレクタから探す
+    assert counts[0]["find_element"] == 3
+    assert counts[1]["find_element"] == 1
+    assert all(count["element.click"] == 1 for count in counts)
+
+
+def test_wait_for_product_click_linkifies_once():
+    automation, driver, _ = run_once("wait_for_product_click")
+    assert automation.list_tab != automation.product_tab
+    # リンク変換はページ側で継続するため、待機中にスクリプトを送り直さない
+    assert driver.calls["execute_script"] == 2
+
+
+def test_wait_for_product_click_stop_restores_links():
+    driver, config, _, _, _ = scenario_wait_for_product_click(0.0)
+    automation = create_automation(driver, config)
+    helpers = []
+    call_helper = driver._call_helper
+
+    def record_helper(page, name, *args):
+        helpers.append(name)
+        return call_helper(page, name, *args)
+
+    driver._call_helper = record_helper
+    timer = threading.Timer(0.2, lambda: setattr(automation, "stop_requested", True))
+    timer.start()
+    try:
+        with quiet():
+            assert automation.wait_for_product_click() is False
+    finally:
+        timer.cancel()
+
+    assert helpers == ["linkify", "unlinkify"]
+    assert not automation._linkified_tabs
+
+
+def test_monitor_loop_detects_change_with_digest_only_cycles():
+    automation, driver, detected = run_once("_monitor_loop")
+    assert detected == 1
+    assert driver.calls["refresh"] == 3
+    # 変化のないサイクルはダイジェストだけを取得する（商品の詳細は取得しない）
+    assert driver.calls["execute_script"] <= 4 * driver.calls["refresh"]
+
+
+def test_monitor_update_ignores_items_missing_from_list_items():
+    items = list_items(3)
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url, list_info=lambda page: items)},
+                        start_urls=[LIST_URL])
+    automation = create_automation(driver)
+    with quiet():
+        previous = automation._get_product_list_info()
+
+    # 詳細の取得中に商品が変わり、listItems がその商品を返さなかった場合
+    items["items"][1] = dict(items["items"][1], price="9,000円")
+    call_helper = driver._call_helper
+    driver._call_helper = lambda page, name, *args: {} if name == "listItems" else call_helper(page, name, *args)
+    with quiet():
+        current = automation._get_product_list_info()
+
+    assert current["items"][1] == previous["items"][1]
+    assert automation._list_snapshot["digest"] is None  # 次のサイクルで取得し直す
+    previous["timestamp"] -= 10
+    assert automation._detect_product_changes(previous, current) is False
+
+
+def test_monitor_loop_stops_on_request():
+    driver, config, setup, _, _ = scenario_monitor_loop(0.0)
+    automation = create_automation(driver, dict(config, monitoring_interval=5))
+    setup()
+    automation.monitor_tab = driver.tab_order[0]
+    automation.stop_requested = False
+    timer = threading.Timer(0.2, lambda: setattr(automation, "stop_requested", True))
+    timer.start()
+    try:
+        with quiet():
+            automation._monitor_loop()
+    finally:
+        timer.cancel()
+    assert driver.calls["refresh"] == 1
+
+
+def test_click_step_marks_document_before_action():
+    from mapcamera_automation import CheckoutStep
+
+    driver = FakeDriver(pages={PRODUCT_URL: lambda url: FakePage(url)}, start_urls=[PRODUCT_URL])
+    automation = create_automation(driver)
+    scripts = []
+    driver.script_handlers.append(("__mcNavigating;", lambda d, page, *args: scripts.append("clear")))
+    driver.script_handlers.append(("__mcNavigating = true", lambda d, page, *args: scripts.append("mark")))
+    automation.step_timings = []
+
+    def click():
+        scripts.append("action")
+        return True
+
+    def click_failed():
+        scripts.append("action")
+        return False
+
+    # クリックで遷移するステップは処理の前に目印を付け、次のステップは新しいページを待つ
+    step = CheckoutStep("product", "商品詳細", matches=lambda url: True, action=click, next_step="cart")
+    with quiet():
+        assert automation._run_checkout_step(step) is None
+    assert scripts == ["mark", "action"]
+
+    # 処理が失敗した（遷移しなかった）場合は目印を外す
+    scripts.clear()
+    step.action = click_failed
+    with quiet():
+        assert automation._run_checkout_step(step) is False
+    assert scripts == ["mark", "action", "clear"]
+
+    # 最終ステップは遷移しないので目印を付けない
+    scripts.clear()
+    with quiet():
+        assert automation._run_checkout_step(CheckoutStep("confirm", "最終確認", lambda url: True, click)) is True
+    assert scripts == ["action"]
+
+
+def test_watchdog_deadlines_follow_driver_timeouts(tmp_path):
+    import json
+    from mapcamera_automation import MapCameraAutomation
+
+    config_path = tmp_path / "mapcamera_config.json"
+    config_path.write_text(json.dumps({"page_load_timeout": 20, "script_timeout": 15}), encoding="utf-8")
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url)}, start_urls=[LIST_URL])
+    with quiet():
+        automation = MapCameraAutomation("", config_file=str(config_path), driver=driver)
+
+    # ドライバー自身のタイムアウトが先に発生するよう、期限はそれより長くする
+    assert automation.watchdog.deadlines["get"] > 20
+    assert automation.watchdog.deadlines["Page.navigate"] > 20
+    assert automation.watchdog.default_deadline > 15
@@ -0,0 +1,92 @@
+import io
+import json
+import signal
+
+import pytest
+
+import mapcamera_cli
+
+
+class StubAutomation:
+    """main の終了処理を確認するための自動化クラスの代わり"""
+
+    def __init__(self, events):
+        self.events = events
+        self.config = {}
+        self.watchdog = self
+        self.selector_registry = self
+        self.driver = self
+        self.window_handles = ["T1"]
+
+    def monitor_page_updates(self, url, callback, start_thread=True):
+        self.events.append(("monitor", url))
+        return False
+
+    def request_stop(self):
+        self.events.append("request_stop")
+
+    def save_if_dirty(self):
+        self.events.append("save_selectors")
+
+    def close(self):
+        self.events.append("close_watchdog")
+
+    def release_driver(self):
+        self.events.append("release_driver")
+
+
+def read_events(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_event_writer_emits_json_lines():
+    stream = io.StringIO()
+    handler = mapcamera_cli.CliHandler(mapcamera_cli.EventWriter(stream))
+    handler.update_status("監視中", "info")
+    handler.log("ログ")
+
+    events = read_events(stream.getvalue())
+    assert [(e["event"], e.get("level"), e["message"]) for e in events] == [
+        ("status", "info", "監視中"), ("log", None, "ログ")]
+    assert all("time" in e for e in events)
+
+
+def test_main_dispatches_on_subcommand_and_releases_driver(monkeypatch, capsys):
+    events = []
+    monkeypatch.setattr(mapcamera_cli, "create_automation", lambda args, writer, password="": StubAutomation(events))
+    monkeypatch.setattr(mapcamera_cli, "install_signal_handlers", lambda automation, writer: {"signal": None})
+
+    # オプションの値が "bench" でもベンチマークとして扱わない
+    url = "https://www.mapcamera.com/search?q=bench"
+    assert mapcamera_cli.main(["--config", "bench", "monitor", "--url", url]) == 1
+
+    assert events == [("monitor", url), "save_selectors", "close_watchdog", "release_driver"]
+    assert [e["event"] for e in read_events(capsys.readouterr().out)] == ["connected", "error", "exit"]
+
+
+def test_main_passes_bench_arguments_through(monkeypatch):
+    import mapcamera_bench
+
+    received = []
+    monkeypatch.setattr(mapcamera_bench, "main", lambda argv: received.append(argv) or 0)
+    assert mapcamera_cli.main(["bench", "loops", "--repeat", "1"]) == 0
+    assert mapcamera_cli.main(["bench", "--help"]) == 0
+    assert received == [["loops", "--repeat", "1"], ["--help"]]
+
+
+def test_second_signal_exits_without_waiting(monkeypatch):
+    events = []
+    installed = {}
+    monkeypatch.setattr(signal, "signal", lambda signum, handler: installed.setdefault(signum, handler))
+    stream = io.StringIO()
+    stop = mapcamera_cli.install_signal_handlers(StubAutomation(events), mapcamera_cli.EventWriter(stream))
+    handler = installed[signal.SIGTERM]
+
+    handler(signal.SIGTERM, None)
+    assert stop["signal"] == signal.SIGTERM
+    assert events == ["request_stop"]
+
+    # 停止が終わらないまま2回目を受け取ったら終了処理へ進む
+    with pytest.raises(SystemExit):
+        handler(signal.SIGTERM, None)
+    assert [e["signal"] for e in read_events(stream.getvalue())] == ["SIGTERM", "SIGTERM"]
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from mapcamera_governor import PollGovernor
+
+
+def test_interval_by_state():
+    governor = PollGovernor(idle_after=60, idle_factor=3, paused_factor=5)
+    # GUIが操作を報告しない間（CLI・テスト）はアイドルにならない
+    assert governor.state == "normal"
+    assert governor.interval("wait", 0.1) == 0.1
+
+    governor.note_user_activity()
+    governor._last_activity -= 61
+    assert governor.state == "idle"
+    assert governor.interval("wait", 0.1) == 0.1 * 3
+    assert governor.interval("wait", 0.4) == 0.5          # 種類ごとの上限
+    assert governor.interval("chrome_check", 2.0) == 5.0
+    # 購入処理・監視・商品クリック待機は状態に関係なく指定どおり
+    assert governor.interval("checkout", 0.05) == 0.05
+    assert governor.interval("monitor", 10) == 10
+    assert governor.interval("click", 0.05) == 0.05
+
+    with governor.active():
+        assert governor.state == "active"
+        assert governor.interval("wait", 0.1) == 0.1
+    assert governor.state == "idle"
+
+
+def test_paused_stops_gui_polling_until_resume():
+    governor = PollGovernor()
+    resumed = []
+    governor.set_paused(True)
+    assert governor.state == "paused"
+    assert governor.interval("metrics", 1.0) is None       # GUIだけのポーリングは止める
+    assert governor.interval("wait", 0.1) == 0.5           # 自動化側は止めずに長めに待つ
+
+    governor.on_resume(lambda: resumed.append(True))
+    governor.set_paused(False)
+    assert resumed == [True]
+    assert governor.state == "normal"
+
+
+def test_wait_returns_on_event_and_counts_wakeups():
+    governor = PollGovernor()
+    event = threading.Event()
+    event.set()
+    start = time.time()
+    assert governor.wait(event, "monitor", 5) is True
+    assert time.time() - start < 1
+    governor.note_wakeup("click")
+
+    total, by_kind = governor.wakeups_per_minute()
+    assert total == 2
+    assert by_kind == {"monitor": 1, "click": 1}
@@ -0,0 +1,120 @@
+import json
+
+from mapcamera_bench import LIST_URL, list_items, quiet
+from mapcamera_fake_driver import FakeDriver, FakePage
+
+
+def create_resumed_automation(tmp_path, driver, state):
+    """保存済みのセッション状態から再開する自動化クラスを作成"""
+    from mapcamera_automation import MapCameraAutomation
+
+    config_path = tmp_path / "mapcamera_config.json"
+    config_path.write_text(json.dumps({"session_journal_file": "session.json"}), encoding="utf-8")
+    (tmp_path / "session.json").write_text(json.dumps({"state": state}), encoding="utf-8")
+    with quiet():
+        return MapCameraAutomation("", config_file=str(config_path), driver=driver)
+
+
+def test_restored_baseline_detects_same_count_change(tmp_path):
+    # 停止中に商品が入れ替わった（件数は同じ）一覧
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url, list_info=list_items(3, offset=10))},
+                        start_urls=[LIST_URL])
+    automation = create_resumed_automation(
+        tmp_path, driver, {"monitor_url": LIST_URL, "last_check_result": {"count": 3, "digest": "0000000a"}})
+    assert automation.last_check_result == {"count": 3, "digest": "0000000a"}
+
+    with quiet():
+        assert automation.monitor_page_updates(start_thread=False)
+        assert automation._check_monitor_updates(driver.current_window_handle, True) is True
+
+
+def test_journal_save_skips_unchanged_state(tmp_path):
+    from mapcamera_journal import SessionJournal
+
+    path = tmp_path / "session.json"
+    journal = SessionJournal(str(path))
+    assert journal.save({"monitor_url": LIST_URL}) is True
+    assert journal.save({"monitor_url": LIST_URL}) is False
+    assert json.loads(path.read_text(encoding="utf-8"))["state"] == {"monitor_url": LIST_URL}
+    # 一時ファイルは置き換え後に残らない
+    assert [p.name for p in tmp_path.iterdir()] == ["session.json"]
+
+    restored = SessionJournal(str(path))
+    assert restored.load() == {"monitor_url": LIST_URL}
+    assert restored.save({"monitor_url": LIST_URL}) is False
+
+    assert journal.clear() is True
+    assert json.loads(path.read_text(encoding="utf-8"))["state"] == {}
+
+
+def test_journal_load_ignores_broken_file(tmp_path):
+    from mapcamera_journal import SessionJournal
+
+    path = tmp_path / "session.json"
+    path.write_text("{", encoding="utf-8")
+    journal = SessionJournal(str(path))
+    with quiet():
+        assert journal.load() == {}
+    assert SessionJournal(str(tmp_path / "missing.json")).load() == {}
+
+
+def test_journal_value_keeps_only_count_and_digest():
+    from mapcamera_journal import journal_value
+
+    result = dict(list_items(2), timestamp=123.0, digest="0000000a")
+    assert journal_value("last_check_result", result) == {"count": 2, "digest": "0000000a"}
+    assert journal_value("monitor_url", LIST_URL) == LIST_URL
+
+
+def test_resume_skips_transient_flags_and_closed_tabs(tmp_path):
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url, list_info=list_items(3))},
+                        start_urls=[LIST_URL])
+    list_tab = driver.tab_order[0]
+    automation = create_resumed_automation(tmp_path, driver, {
+        "list_tab": list_tab, "product_tab": "closed-tab", "monitor_url": LIST_URL,
+        "purchase_in_progress": True, "prevent_tab_switch": True})
+
+    assert automation.list_tab == list_tab
+    assert getattr(automation, "product_tab", None) != "closed-tab"
+    assert automation.monitor_url == LIST_URL
+    assert not getattr(automation, "purchase_in_progress", False)
+    assert not getattr(automation, "prevent_tab_switch", False)
+
+
+def test_end_checkout_keeps_flag_but_journals_end(tmp_path):
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url, list_info=list_items(3))},
+                        start_urls=[LIST_URL])
+    automation = create_resumed_automation(tmp_path, driver, {})
+    automation.purchase_in_progress = True
+    automation.checkout_step = "confirm"
+    with quiet():
+        automation._end_checkout(True)
+
+    # 最終確認画面での誤メッセージを防ぐためフラグは維持し、記録だけ終了にする
+    assert automation.purchase_in_progress is True
+    saved = json.loads((tmp_path / "session.json").read_text(encoding="utf-8"))["state"]
+    assert saved["purchase_in_progress"] is False
+
+
+def test_journal_untouched_until_opened(tmp_path):
+    from mapcamera_automation import MapCameraAutomation
+
+    driver = FakeDriver(pages={LIST_URL: lambda url: FakePage(url, list_info=list_items(3))},
+                        start_urls=[LIST_URL])
+    config_path = tmp_path / "mapcamera_config.json"
+    config_path.write_text(json.dumps({"session_journal_file": "session.json"}), encoding="utf-8")
+    session_path = tmp_path / "session.json"
+    session_path.write_text(json.dumps({"state": {"monitor_url": LIST_URL}}), encoding="utf-8")
+    saved = session_path.read_text(encoding="utf-8")
+
+    # 事前準備のインスタンスは、使うと決まるまで前回の状態を読み込まず書き換えもしない
+    with quiet():
+        automation = MapCameraAutomation("", config_file=str(config_path), driver=driver, journal=False)
+        automation._journal_state()
+    assert automation.journal is None
+    assert not hasattr(automation, "monitor_url")
+    assert session_path.read_text(encoding="utf-8") == saved
+
+    with quiet():
+        automation.open_journal()
+    assert automation.monitor_url == LIST_URL
@@ -0,0 +1,53 @@
+from mapcamera_bench import quiet
+from mapcamera_selectors import STALE_AFTER, SelectorRegistry
+
+
+SELECTORS = ["#cartPut", "button.next", "input.submit"]
+
+
+def test_order_prefers_hits_and_keeps_original_order_on_ties():
+    registry = SelectorRegistry()
+    assert registry.order("cart_button", SELECTORS) == SELECTORS
+
+    with quiet():
+        registry.record_hit("cart_button", "input.submit", SELECTORS)
+    assert registry.order("cart_button", SELECTORS) == ["input.submit", "#cartPut", "button.next"]
+    assert registry.order("other_button", SELECTORS) == SELECTORS
+
+
+def test_selector_that_keeps_losing_becomes_stale():
+    registry = SelectorRegistry()
+    with quiet():
+        registry.record_hit("cart_button", "#cartPut", SELECTORS)
+        # サイトの構造が変わり、以前の一致したセレクタが先に試されて見つからなくなった
+        stale = [registry.record_hit("cart_button", "button.next", SELECTORS) for _ in range(STALE_AFTER)]
+
+    assert stale[:-1] == [[]] * (STALE_AFTER - 1)
+    assert stale[-1] == ["#cartPut"]
+    assert registry.stale_selectors() == {"cart_button": ["#cartPut"]}
+    assert registry.order("cart_button", SELECTORS)[-1] == "#cartPut"
+
+
+def test_stats_persist_across_runs(tmp_path):
+    path = tmp_path / "selector_stats.json"
+    registry = SelectorRegistry(str(path))
+    assert registry.save_if_dirty() is False
+
+    with quiet():
+        registry.record_hit("cart_button", "button.next", SELECTORS)
+        registry.record_miss("next_button", SELECTORS)
+    assert registry.save_if_dirty() is True
+    assert registry.save_if_dirty() is False
+
+    restored = SelectorRegistry(str(path))
+    assert restored.order("cart_button", SELECTORS)[0] == "button.next"
+    assert restored.stats["next_button"]["not_found"] == 1
+
+
+def test_broken_stats_file_is_ignored(tmp_path):
+    path = tmp_path / "selector_stats.json"
+    path.write_text("{", encoding="utf-8")
+    with quiet():
+        registry = SelectorRegistry(str(path))
+    assert registry.stats == {}
+    assert registry.order("cart_button", SELECTORS) == SELECTORS
@@ -0,0 +1,68 @@
+import pytest
+
+from mapcamera_bench import LIST_URL, PRODUCT_URL
+from mapcamera_fake_driver import FakeDriver, FakePage
+from mapcamera_tabs import TabManager
+
+
+def create_driver():
+    pages = {LIST_URL: lambda url: FakePage(url), PRODUCT_URL: lambda url: FakePage(url)}
+    return FakeDriver(pages=pages, start_urls=[LIST_URL])
+
+
+def test_user_tabs_are_never_managed():
+    driver = create_driver()
+    manager = TabManager(max_tabs=1)
+    manager.attach(driver.window_handles)
+    user_tab = driver.tab_order[0]
+
+    assert manager.register(user_tab, "list") is False
+    assert not manager.is_managed(user_tab)
+    with pytest.raises(ValueError):
+        manager.register("TAB-X", "unknown")
+
+
+def test_single_role_finishes_previous_tab():
+    manager = TabManager()
+    manager.register("A", "list")
+    manager.register("B", "list")
+    manager.register("C", "product")
+    finished = {tab["handle"]: tab["finished"] for tab in manager.describe()}
+    # 一覧タブは最新の1つだけを使い、商品タブは複数あってよい
+    assert finished == {"A": True, "B": False, "C": False}
+
+
+def test_enforce_closes_oldest_finished_tabs_beyond_cap():
+    driver = create_driver()
+    manager = TabManager(max_tabs=2)
+    manager.attach(driver.window_handles)
+    user_tab = driver.tab_order[0]
+    products = [driver.open_tab(PRODUCT_URL) for _ in range(4)]
+    for handle in products:
+        manager.register(handle, "product")
+    manager.finish(products[1])
+    manager.finish(products[0])
+    manager.finish(products[3])
+    driver.switch_to.window(products[3])
+
+    # 上限を超えた2つを、終了した順に閉じる（表示中のタブと保護したタブは閉じない）
+    closed = manager.enforce(driver, protected={products[1]})
+    assert closed == [products[0]]
+    assert driver.current_window_handle == products[3]
+    assert user_tab in driver.window_handles
+
+    manager.finish(products[2])
+    driver.switch_to.window(user_tab)
+    assert manager.enforce(driver) == [products[1]]
+    assert sorted(driver.window_handles) == sorted([user_tab, products[2], products[3]])
+
+
+def test_prune_forgets_closed_tabs():
+    driver = create_driver()
+    manager = TabManager()
+    manager.attach([])
+    handle = driver.open_tab(PRODUCT_URL)
+    manager.register(handle, "product")
+    manager.prune([])
+    assert not manager.is_managed(handle)
+    assert manager.closable() == []
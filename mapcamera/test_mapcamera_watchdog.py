@@ -0,0 +1,142 @@
+import io
+import threading
+
+import pytest
+
+import mapcamera_watchdog
+from mapcamera_metrics import MetricsRegistry
+from mapcamera_watchdog import CommandDeadlineExceeded, CommandWatchdog
+
+
+class StubDriver:
+    """get だけが release されるまで戻らないドライバー"""
+
+    def __init__(self, handle=None):
+        self.release = threading.Event()
+        self.handle = handle
+
+    @property
+    def current_window_handle(self):
+        if self.handle is None:
+            raise RuntimeError("no such window")
+        return self.handle
+
+    def execute(self, command, params=None):
+        if command == "get":
+            if not self.release.wait(10):
+                return {"value": "late"}
+            raise ConnectionResetError("closed")
+        return {"value": command}
+
+
+class StubConnection:
+    """中断用のDevTools接続（Page.stopLoading で止まっているコマンドを戻す）"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.sent = []
+
+    def send(self, method, params=None, session_id=None):
+        self.sent.append((method, (params or {}).get("targetId")))
+        if method == "Target.getTargets":
+            return {"targetInfos": [{"targetId": "T1", "type": "page"}, {"targetId": "T2", "type": "page"}]}
+        if method == "Target.attachToTarget":
+            return {"sessionId": "S"}
+        if method == "Page.stopLoading":
+            self.driver.release.set()
+        return {}
+
+    def close(self):
+        pass
+
+
+def create_watchdog(driver, **kwargs):
+    watchdog = CommandWatchdog("127.0.0.1:9222", **kwargs)
+    watchdog.install(driver)
+    return watchdog
+
+
+def test_deadline_severs_and_reattaches():
+    driver = StubDriver()
+    registry = MetricsRegistry()
+    events = []
+
+    def sever(severed):
+        events.append("sever")
+        severed.release.set()
+
+    def on_severed(severed):
+        events.append("reattach")
+        return severed is driver
+
+    watchdog = create_watchdog(driver, deadlines={"get": 0.2}, grace=0.2, sever=sever,
+                               on_severed=on_severed, registry=registry)
+    try:
+        assert driver.execute("findElement", {"using": "css selector"}) == {"value": "findElement"}
+        with pytest.raises(CommandDeadlineExceeded) as excinfo:
+            driver.execute("get", {"url": "https://www.mapcamera.com/"})
+    finally:
+        watchdog.close()
+
+    # タブが分からないため中断はせず、猶予の後に接続を切って再接続する
+    assert events == ["sever", "reattach"]
+    assert excinfo.value.reattached
+    assert watchdog.connection is None
+    assert registry.counter("driver_deadline_exceeded").value == 1
+
+
+def test_deadline_aborts_only_the_command_tab(monkeypatch):
+    driver = StubDriver(handle="CDwindow-T1")
+    connection = StubConnection(driver)
+    monkeypatch.setattr(mapcamera_watchdog.urllib.request, "urlopen",
+                        lambda *args, **kwargs: io.BytesIO(b'{"webSocketDebuggerUrl": "ws://stub"}'))
+    monkeypatch.setattr("mapcamera_cdp.CdpConnection", lambda *args, **kwargs: connection)
+    severed = []
+
+    # 最初のタブ切り替えより前の get も、接続時のタブを対象に中断できる
+    watchdog = create_watchdog(driver, deadlines={"get": 0.2}, grace=5, sever=severed.append)
+    try:
+        with pytest.raises(CommandDeadlineExceeded) as excinfo:
+            driver.execute("get", {"url": "https://www.mapcamera.com/"})
+    finally:
+        watchdog.close()
+
+    assert not excinfo.value.reattached
+    assert not severed
+    assert ("Target.attachToTarget", "T1") in connection.sent
+    assert ("Target.attachToTarget", "T2") not in connection.sent
+    assert ("Page.stopLoading", None) in connection.sent
+
+
+def test_switch_to_window_changes_abort_target(monkeypatch):
+    driver = StubDriver(handle="CDwindow-T1")
+    connection = StubConnection(driver)
+    monkeypatch.setattr(mapcamera_watchdog.urllib.request, "urlopen",
+                        lambda *args, **kwargs: io.BytesIO(b'{"webSocketDebuggerUrl": "ws://stub"}'))
+    monkeypatch.setattr("mapcamera_cdp.CdpConnection", lambda *args, **kwargs: connection)
+
+    watchdog = create_watchdog(driver, deadlines={"get": 30})
+    result = []
+
+    def navigate():
+        try:
+            result.append(driver.execute("get", {"url": "https://www.mapcamera.com/"}))
+        except Exception as e:
+            result.append(type(e).__name__)
+
+    try:
+        driver.execute("switchToWindow", {"handle": "CDwindow-T2"})
+        assert watchdog.target == "CDwindow-T2"
+        thread = threading.Thread(target=navigate)
+        thread.start()
+        # 停止リクエストでは期限を待たずにページ読み込みを止める
+        while not watchdog._inflight:
+            threading.Event().wait(0.01)
+        watchdog.interrupt()
+        thread.join(2)
+    finally:
+        watchdog.close()
+
+    assert result == ["ConnectionResetError"]
+    assert ("Target.attachToTarget", "T2") in connection.sent
+    assert ("Target.attachToTarget", "T1") not in connection.sent